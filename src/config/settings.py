@@ -36,9 +36,123 @@ class Settings:
         # Configurações do banco de dados
         self.MONGO_URI: str = os.getenv("MONGO_URI", "")
         self.DATABASE_NAME: str = os.getenv("DATABASE_NAME", "personalai_db")
+        # Sincroniza os índices do registro (database/indices.py) em segundo plano
+        # ao iniciar a API; por padrão só sob demanda (scripts.sincronizar_indices)
+        self.MONGO_SINCRONIZAR_INDICES: bool = os.getenv("MONGO_SINCRONIZAR_INDICES", "False").lower() == "true"
+        # Conexão: atraso até sondar a próxima estratégia de TLS em paralelo e
+        # arquivo onde a estratégia vencedora é lembrada entre reinícios
+        # (vazio = arquivo no diretório temporário do sistema)
+        self.MONGO_SONDA_ATRASO_MS: int = int(os.getenv("MONGO_SONDA_ATRASO_MS", "250"))
+        self.MONGO_ESTRATEGIA_ARQUIVO: str = os.getenv("MONGO_ESTRATEGIA_ARQUIVO", "")
+        # Pool de conexões (por cliente: pymongo e Motor têm pools separados).
+        # MONGO_WAIT_QUEUE_TIMEOUT_MS limita a espera por uma conexão livre
+        # (0 = espera indefinida); MONGO_MAX_IDLE_TIME_MS=0 não fecha ociosas
+        self.MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+        self.MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+        self.MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+        self.MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+        # Compressão do protocolo, em ordem de preferência (negociada com o
+        # servidor; zstd precisa de `zstandard` e snappy de `python-snappy`)
+        self.MONGO_COMPRESSORES: str = os.getenv("MONGO_COMPRESSORES", "zstd,snappy,zlib")
+        # Comandos do MongoDB acima deste tempo vão para o log com a forma do
+        # filtro (valores ocultos); 0 desativa o log de consultas lentas
+        self.MONGO_LENTO_MS: int = int(os.getenv("MONGO_LENTO_MS", "100"))
+        # Conta os bytes (BSON) de comandos e respostas em mongo_command_bytes_total;
+        # desligado por padrão porque reserializa cada comando e resposta
+        self.MONGO_CONTAR_BYTES: bool = os.getenv("MONGO_CONTAR_BYTES", "False").lower() == "true"
+        # Preferência de leitura por método de repositório (repositories/leitura.py):
+        # "treinos.listar_pagina=primary,..." sobrescreve o padrão. Leituras em
+        # secundários aceitam no máximo esta defasagem (mínimo do MongoDB: 90s;
+        # valores menores são elevados a 90 em repositories/leitura.py)
+        self.MONGO_PREFERENCIAS_LEITURA: str = os.getenv("MONGO_PREFERENCIAS_LEITURA", "")
+        self.MONGO_MAX_STALENESS_SECONDS: int = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "90"))
 
         # Configurações da API do Gemini
         self.GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+        self.GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-lite")
+
+        # Backend do Gemini: "google" (SDK real) ou "fake" (stand-in local para testes de carga)
+        self.GEMINI_BACKEND: str = os.getenv("GEMINI_BACKEND", "google").lower()
+        self.FAKE_GEMINI_LATENCIA_MEDIANA_MS: float = float(os.getenv("FAKE_GEMINI_LATENCIA_MEDIANA_MS", "800"))
+        self.FAKE_GEMINI_LATENCIA_P99_MS: float = float(os.getenv("FAKE_GEMINI_LATENCIA_P99_MS", "4000"))
+        self.FAKE_GEMINI_TOKENS_POR_SEGUNDO: float = float(os.getenv("FAKE_GEMINI_TOKENS_POR_SEGUNDO", "80"))
+        self.FAKE_GEMINI_TAXA_429: float = float(os.getenv("FAKE_GEMINI_TAXA_429", "0"))
+        self.FAKE_GEMINI_TAXA_500: float = float(os.getenv("FAKE_GEMINI_TAXA_500", "0"))
+        _seed = os.getenv("FAKE_GEMINI_SEED", "")
+        self.FAKE_GEMINI_SEED = int(_seed) if _seed else None
+
+        # Cache de respostas do Gemini: "memory", "mongo" ou "off".
+        # Em testes o padrão é "off" para que mocks diferentes não se misturem.
+        _cache_padrao = "off" if os.getenv("ENVIRONMENT", "").lower() == "test" else "memory"
+        self.GEMINI_CACHE_BACKEND: str = os.getenv("GEMINI_CACHE_BACKEND", _cache_padrao)
+        self.GEMINI_CACHE_TTL_SECONDS: int = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "3600"))
+        self.GEMINI_CACHE_MAX_ENTRIES: int = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "1024"))
+        self.GEMINI_CACHE_COLLECTION: str = os.getenv("GEMINI_CACHE_COLLECTION", "gemini_cache")
+
+        # Cache de contexto do provedor para as instruções de sistema (CachedContent)
+        self.GEMINI_CONTEXT_CACHE: bool = os.getenv("GEMINI_CONTEXT_CACHE", "False").lower() == "true"
+        self.GEMINI_CONTEXT_CACHE_TTL_SECONDS: int = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+        self.GEMINI_CONTEXT_CACHE_MARGEM_SECONDS: int = int(os.getenv("GEMINI_CONTEXT_CACHE_MARGEM_SECONDS", "300"))
+
+        # Limite adaptativo de chamadas simultâneas ao Gemini (AIMD) e fila de espera
+        self.GEMINI_LIMITE_INICIAL: int = int(os.getenv("GEMINI_LIMITE_INICIAL", "8"))
+        self.GEMINI_LIMITE_MIN: int = int(os.getenv("GEMINI_LIMITE_MIN", "1"))
+        self.GEMINI_LIMITE_MAX: int = int(os.getenv("GEMINI_LIMITE_MAX", "64"))
+        self.GEMINI_FILA_MAX: int = int(os.getenv("GEMINI_FILA_MAX", "100"))
+        self.GEMINI_FILA_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_FILA_TIMEOUT_SECONDS", "10"))
+
+        # Retentativas com backoff exponencial + jitter para 429/500/503/504
+        self.GEMINI_MAX_RETRIES: int = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+        self.GEMINI_RETRY_BASE_SECONDS: float = float(os.getenv("GEMINI_RETRY_BASE_SECONDS", "0.5"))
+        self.GEMINI_RETRY_MAX_SECONDS: float = float(os.getenv("GEMINI_RETRY_MAX_SECONDS", "8"))
+
+        # Circuit breaker do Gemini e cache da lista de modelos (mensagens de erro)
+        self.GEMINI_BREAKER_FALHAS: int = int(os.getenv("GEMINI_BREAKER_FALHAS", "5"))
+        self.GEMINI_BREAKER_ABERTO_SECONDS: float = float(os.getenv("GEMINI_BREAKER_ABERTO_SECONDS", "30"))
+        self.GEMINI_BREAKER_SONDAS: int = int(os.getenv("GEMINI_BREAKER_SONDAS", "1"))
+        self.GEMINI_MODELOS_TTL_SECONDS: float = float(os.getenv("GEMINI_MODELOS_TTL_SECONDS", "3600"))
+
+        # Hedge: segunda chamada se a principal passar do percentil de latência
+        self.GEMINI_HEDGE: bool = os.getenv("GEMINI_HEDGE", "False").lower() == "true"
+        self.GEMINI_HEDGE_MODELO: str = os.getenv("GEMINI_HEDGE_MODELO", "")
+        self.GEMINI_HEDGE_PERCENTIL: float = float(os.getenv("GEMINI_HEDGE_PERCENTIL", "95"))
+        self.GEMINI_HEDGE_ATRASO_MIN_SECONDS: float = float(os.getenv("GEMINI_HEDGE_ATRASO_MIN_SECONDS", "1"))
+        self.GEMINI_HEDGE_ATRASO_MAX_SECONDS: float = float(os.getenv("GEMINI_HEDGE_ATRASO_MAX_SECONDS", "10"))
+
+        # GET /treinos/: tamanho padrão/máximo da página e compatibilidade com a lista completa
+        self.TREINOS_PAGINA_PADRAO: int = int(os.getenv("TREINOS_PAGINA_PADRAO", "20"))
+        self.TREINOS_PAGINA_MAX: int = int(os.getenv("TREINOS_PAGINA_MAX", "100"))
+        self.TREINOS_LISTA_COMPLETA: bool = os.getenv("TREINOS_LISTA_COMPLETA", "False").lower() == "true"
+
+        # Compressão do texto dos planos salvos em `treinos` ("off", "zlib" ou "zstd")
+        self.PLANO_COMPRESSAO: str = os.getenv("PLANO_COMPRESSAO", "off").lower()
+        self.PLANO_COMPRESSAO_MIN_BYTES: int = int(os.getenv("PLANO_COMPRESSAO_MIN_BYTES", "1024"))
+
+        # Orçamento (em tokens estimados) do resumo de histórico enviado ao Gemini
+        self.HISTORICO_MAX_TOKENS: int = int(os.getenv("HISTORICO_MAX_TOKENS", "400"))
+
+        # Contexto do usuário (perfil + resumo do histórico) pré-carregado no login.
+        # O cache é por processo e só o processo que salva um treino o invalida:
+        # com várias réplicas/workers, as outras podem usar o resumo antigo por
+        # até CONTEXTO_USUARIO_TTL_SECONDS (reduza o TTL ou desative o cache)
+        _contexto_padrao = "false" if os.getenv("ENVIRONMENT", "").lower() == "test" else "true"
+        self.CONTEXTO_USUARIO_CACHE: bool = os.getenv("CONTEXTO_USUARIO_CACHE", _contexto_padrao).lower() == "true"
+        self.CONTEXTO_USUARIO_TTL_SECONDS: int = int(os.getenv("CONTEXTO_USUARIO_TTL_SECONDS", "900"))
+        self.CONTEXTO_USUARIO_MAX_ENTRIES: int = int(os.getenv("CONTEXTO_USUARIO_MAX_ENTRIES", "10000"))
+
+        # Uso de tokens por usuário/dia (collection `uso_tokens`)
+        self.USO_TOKENS_FLUSH_SECONDS: float = float(os.getenv("USO_TOKENS_FLUSH_SECONDS", "10"))
+        self.USO_TOKENS_RETENCAO_DIAS: int = int(os.getenv("USO_TOKENS_RETENCAO_DIAS", "90"))
+
+        # Fila de jobs de geração de plano (collection `jobs`)
+        self.JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "2"))
+        self.JOBS_LEASE_SECONDS: int = int(os.getenv("JOBS_LEASE_SECONDS", "180"))
+        self.JOBS_MAX_TENTATIVAS: int = int(os.getenv("JOBS_MAX_TENTATIVAS", "3"))
+        self.JOBS_POLL_SECONDS: float = float(os.getenv("JOBS_POLL_SECONDS", "1"))
+
+        # Pré-geração em lote dos planos semanais (scripts/pregerar_planos.py)
+        self.PREGERACAO_PARALELISMO: int = int(os.getenv("PREGERACAO_PARALELISMO", "4"))
+        self.PREGERACAO_TAMANHO_PAGINA: int = int(os.getenv("PREGERACAO_TAMANHO_PAGINA", "100"))
 
         # Chave para Tokens JWT (Lida do .env)
         self.SECRET_KEY: str = os.getenv("SECRET_KEY", "")
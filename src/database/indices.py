@@ -0,0 +1,110 @@
+"""Registro declarativo dos índices de cada collection.
+
+Todo índice que as consultas dos serviços usam fica declarado em `INDICES`.
+`sincronizar_indices` compara o registro com o que existe no banco:
+
+- cria os índices que faltam;
+- recria os que têm o mesmo nome mas opções diferentes (ex: TTL, unique);
+- lista os que existem no banco e não estão no registro (obsoletos), e só
+  os remove com `remover_obsoletos=True`.
+
+A sincronização é idempotente e roda sob demanda: no `setup_mongodb`
+(chamado em segundo plano ao iniciar a API com MONGO_SINCRONIZAR_INDICES)
+ou pela linha de comando:
+
+    cd src && python -m scripts.sincronizar_indices [--remover-obsoletos]
+
+Os nomes são os gerados pelo pymongo a partir das chaves, os mesmos dos
+índices criados antes deste registro.
+"""
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from config.settings import settings
+
+# Opções comparadas para decidir se um índice existente precisa ser recriado
+_OPCOES = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+INDICES: Dict[str, List[IndexModel]] = {
+    "usuarios": [
+        # Login e cadastro: get_user_by_email
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "treinos": [
+        # Listagem do usuário ordenada por data: find({usuario_id}).sort(criado_em desc)
+        # e a paginação por keyset em (criado_em, _id). O prefixo usuario_id
+        # também atende as buscas só por usuário (ex: pré-geração do lote).
+        IndexModel([("usuario_id", ASCENDING), ("criado_em", DESCENDING), ("_id", DESCENDING)]),
+        # Treino salvo por um job da fila (reprocessamento não duplica)
+        IndexModel([("job_id", ASCENDING)], partialFilterExpression={"job_id": {"$exists": True}}),
+    ],
+    "historico_acessos": [
+        IndexModel([("usuario_id", ASCENDING), ("treino_id", ASCENDING)]),
+    ],
+    "jobs": [
+        # Próximo job pendente (ou com lease vencido) pela ordem de chegada
+        IndexModel([("status", ASCENDING), ("criado_em", ASCENDING)]),
+    ],
+    "uso_tokens": [
+        # Upsert por usuário/dia e soma dos últimos dias
+        IndexModel([("usuario_id", ASCENDING), ("dia", ASCENDING)], unique=True),
+        # Expiração automática após USO_TOKENS_RETENCAO_DIAS
+        IndexModel([("expira_em", ASCENDING)], expireAfterSeconds=0),
+    ],
+    settings.GEMINI_CACHE_COLLECTION: [
+        # Cache de respostas do Gemini (MongoCacheBackend): expira em `expira_em`
+        IndexModel([("expira_em", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+def _mesma_definicao(existente: dict, desejado: dict) -> bool:
+    if list(existente.get("key", [])) != list(desejado["key"].items()):
+        return False
+    return all(existente.get(opcao) == desejado.get(opcao) for opcao in _OPCOES)
+
+
+def sincronizar_collection(collection, modelos: List[IndexModel], remover_obsoletos: bool = False) -> dict:
+    """Alinha os índices de uma collection com `modelos`. Retorna o que foi feito."""
+    relatorio = {"criados": [], "recriados": [], "obsoletos": [], "removidos": []}
+    existentes = collection.index_information()
+
+    for modelo in modelos:
+        desejado = dict(modelo.document)
+        nome = desejado["name"]
+        chaves = list(desejado.pop("key").items())
+        opcoes = {k: v for k, v in desejado.items() if k != "name"}
+
+        if nome in existentes:
+            if _mesma_definicao(existentes[nome], modelo.document):
+                continue
+            collection.drop_index(nome)
+            relatorio["recriados"].append(nome)
+        else:
+            relatorio["criados"].append(nome)
+        collection.create_index(chaves, name=nome, **opcoes)
+
+    declarados = {modelo.document["name"] for modelo in modelos}
+    for nome in existentes:
+        if nome == "_id_" or nome in declarados:
+            continue
+        relatorio["obsoletos"].append(nome)
+        if remover_obsoletos:
+            collection.drop_index(nome)
+            relatorio["removidos"].append(nome)
+    return relatorio
+
+
+def sincronizar_indices(collections: Dict[str, object], remover_obsoletos: bool = False) -> Dict[str, dict]:
+    """Sincroniza o registro com as collections informadas (nome -> collection).
+
+    Collections ausentes (None) são ignoradas. Erros de conexão propagam.
+    """
+    relatorios = {}
+    for nome, modelos in INDICES.items():
+        collection = collections.get(nome)
+        if collection is None:
+            continue
+        relatorios[nome] = sincronizar_collection(collection, modelos, remover_obsoletos)
+    return relatorios
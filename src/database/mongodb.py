@@ -1,14 +1,42 @@
+"""
+Conexão síncrona (pymongo) com o MongoDB, estabelecida sob demanda.
+
+Importar este módulo não faz I/O de rede: `client`, `db` e as collections
+são resolvidos na primeira vez que são acessados (`mongodb.treinos_collection`)
+ou quando `conectar()` é chamado — a API faz isso em segundo plano no
+lifespan. Em ambiente de teste ou sem MONGO_URI, todos ficam None.
+
+As estratégias de TLS são sondadas em paralelo, escalonadas: a próxima
+começa quando a anterior falha ou após MONGO_SONDA_ATRASO_MS. A estratégia
+vencedora fica registrada em MONGO_ESTRATEGIA_ARQUIVO e é tentada primeiro
+no próximo start. Índices e o documento `meta` só são criados sob demanda
+(`setup_mongodb`, `scripts.sincronizar_indices` ou MONGO_SINCRONIZAR_INDICES).
+
+Pool de conexões e compressão do protocolo vêm de `settings` (`opcoes_pool`)
+e valem também para o cliente Motor; as métricas do pool são exportadas
+pelos listeners de `database/monitoramento.py`, junto com a latência por
+comando/collection e o log de consultas lentas.
+"""
+import hashlib
+import importlib.util
+import json
 import multiprocessing
 import os
 import ssl
 import sys
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
+from typing import List, Optional
 import certifi
 from pymongo.errors import ConnectionFailure
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 
 from config.settings import settings
+from database.indices import sincronizar_indices
+from database.monitoramento import MonitorComandos, MonitorPool
 
 # Carregar configurações da aplicação
 # Para facilitar testes que usam patch.dict(os.environ, ...)
@@ -22,80 +50,207 @@ is_main_process = multiprocessing.current_process().name == "MainProcess"
 
 # Flags para evitar inicialização dupla
 _mongodb_initialized = False
-_connection_created = False
+_conexao_resolvida = False
+_conexao_lock = threading.Lock()
+
+# `client`, `db` e as collections: resolvidos por `conectar()` no primeiro
+# acesso ao atributo do módulo (ver `__getattr__`)
+_conexao: dict = dict.fromkeys((
+    "client",
+    "db",
+    "usuarios_collection",
+    "treinos_collection",
+    "historico_collection",
+    "jobs_collection",
+    "uso_tokens_collection",
+))
+
+# Opções da estratégia de conexão que funcionou (reaproveitadas pelo cliente
+# assíncrono em database/mongodb_async.py)
+opcoes_conexao: dict = {}
 
-# Variáveis globais para conexão
-client = None
-db = None
-usuarios_collection = None
-treinos_collection = None
-historico_collection = None
+# Estratégias de TLS, na ordem padrão de tentativa
+ESTRATEGIAS = ("padrao", "certifi", "minima")
+_ROTULOS = {"padrao": "padrão", "certifi": "com certificados certifi", "minima": "mínima"}
+
+# Arquivo com a estratégia vencedora (None nos testes: nada é lido nem gravado)
+arquivo_estrategia: Optional[str] = None if is_testing else (
+    settings.MONGO_ESTRATEGIA_ARQUIVO
+    or os.path.join(tempfile.gettempdir(), "personalai_mongo_estrategia.json")
+)
 
 if not uri and not is_testing:
     raise ValueError(
         "❌ MONGO_URI não configurada no arquivo .env! Por favor, configure a variável de ambiente."
     )
 
-def create_mongodb_client():
-    """Cria cliente MongoDB com diferentes estratégias de conexão"""
 
+# Pacote Python que o pymongo exige para cada compressor (zlib é da biblioteca padrão)
+_PACOTES_COMPRESSOR = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
 
-    # Detectar contexto do processo para logs mais informativos
-    process_info = f"(PID: {os.getpid()})"
+
+def compressores_disponiveis(preferencia: str) -> List[str]:
+    """Compressores de `preferencia` ("zstd,snappy,zlib") suportados neste ambiente.
+
+    A ordem é a de preferência: o servidor usa o primeiro que também suportar.
+    """
+    disponiveis = []
+    for nome in (c.strip().lower() for c in (preferencia or "").split(",")):
+        if not nome or nome in disponiveis:
+            continue
+        if nome not in _PACOTES_COMPRESSOR:
+            print(f"⚠️ Compressor desconhecido ignorado: {nome}")
+            continue
+        pacote = _PACOTES_COMPRESSOR[nome]
+        if pacote is not None and importlib.util.find_spec(pacote) is None:
+            print(f"⚠️ Compressor {nome} indisponível (instale o pacote {pacote})")
+            continue
+        disponiveis.append(nome)
+    return disponiveis
+
+
+def opcoes_pool() -> dict:
+    """Pool de conexões e compressão do protocolo, a partir de `settings`."""
+    opcoes = dict(
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+    )
+    # 0 = padrão do driver (sem limite de ociosidade / espera indefinida)
+    if settings.MONGO_MAX_IDLE_TIME_MS > 0:
+        opcoes["maxIdleTimeMS"] = settings.MONGO_MAX_IDLE_TIME_MS
+    if settings.MONGO_WAIT_QUEUE_TIMEOUT_MS > 0:
+        opcoes["waitQueueTimeoutMS"] = settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    compressores = compressores_disponiveis(settings.MONGO_COMPRESSORES)
+    if compressores:
+        opcoes["compressors"] = compressores
+    return opcoes
+
+
+def _opcoes_estrategia(nome: str, pool: dict) -> dict:
+    opcoes = dict(
+        server_api=ServerApi("1"),
+        serverSelectionTimeoutMS=10000,
+        connectTimeoutMS=10000,
+        **pool,
+    )
+    if nome == "padrao":
+        # Certificados do sistema
+        opcoes.update(tlsAllowInvalidCertificates=False)
+    elif nome == "certifi":
+        # Certificados do certifi (padrão para muitos ambientes)
+        opcoes.update(tlsCAFile=certifi.where(), tlsAllowInvalidCertificates=False)
+    else:
+        # Sem verificação SSL (apenas para desenvolvimento/teste)
+        opcoes.update(ssl=True, ssl_cert_reqs=ssl.CERT_NONE, tlsAllowInvalidCertificates=True)
+    return opcoes
 
 
-    # Estratégia 1: Conexão padrão com certificados do sistema
+def _chave_uri() -> str:
+    # A URI tem credenciais: o arquivo guarda só um hash dela
+    return hashlib.sha256((uri or "").encode()).hexdigest()[:16]
+
+
+def _ler_estrategia() -> Optional[str]:
+    if not arquivo_estrategia:
+        return None
     try:
-        print(f"🔄 Tentando conexão padrão... {process_info}")
-        client = MongoClient(
-            uri,
-            server_api=ServerApi("1"),
-            serverSelectionTimeoutMS=10000,
-            connectTimeoutMS=10000,
-            tlsAllowInvalidCertificates=False,
-        )
-        # Teste de conexão
-        client.admin.command("ping")
-        print("✅ Conexão padrão bem-sucedida!")
-        return client, database_name
-    except Exception as e:
-        print(f"❌ Conexão padrão falhou: {type(e).__name__}")
+        with open(arquivo_estrategia, encoding="utf-8") as f:
+            nome = json.load(f).get(_chave_uri())
+    except (OSError, ValueError, AttributeError):
+        return None
+    return nome if nome in ESTRATEGIAS else None
 
 
-    # Estratégia 2: Usar certificados do certifi (padrão para muitos ambientes)
+def _salvar_estrategia(nome: str) -> None:
+    if not arquivo_estrategia or _ler_estrategia() == nome:
+        return
     try:
-        print("🔄 Tentando com certificados certifi...")
-        client = MongoClient(
-            uri,
-            server_api=ServerApi("1"),
-            serverSelectionTimeoutMS=10000,
-            connectTimeoutMS=10000,
-            tlsCAFile=certifi.where(),
-            tlsAllowInvalidCertificates=False,
-        )
-        client.admin.command("ping")
-        print("✅ Conexão com certificados certifi bem-sucedida!")
-        return client, database_name
+        try:
+            with open(arquivo_estrategia, encoding="utf-8") as f:
+                registro = json.load(f)
+        except (OSError, ValueError):
+            registro = {}
+        registro[_chave_uri()] = nome
+        with open(arquivo_estrategia, "w", encoding="utf-8") as f:
+            json.dump(registro, f)
     except Exception as e:
-        print(f"❌ Conexão com certificados certifi falhou: {type(e).__name__}")
+        print(f"⚠️ Não foi possível registrar a estratégia de conexão: {e}")
+
 
-    # Estratégia 3: Sem verificação SSL (apenas para desenvolvimento/teste)
+def ordem_estrategias() -> List[str]:
+    """Estratégias na ordem de tentativa: a última vencedora primeiro."""
+    preferida = _ler_estrategia()
+    if preferida is None:
+        return list(ESTRATEGIAS)
+    return [preferida] + [nome for nome in ESTRATEGIAS if nome != preferida]
+
+
+def _sondar(nome: str, pool: dict):
+    """Cria o cliente da estratégia e confirma com `ping`. Fecha o cliente se falhar."""
+    opcoes = _opcoes_estrategia(nome, pool)
+    client = MongoClient(uri, event_listeners=[MonitorPool("sync"), MonitorComandos("sync")], **opcoes)
     try:
-        print("🔄 Tentando conexão mínima...")
-        client = MongoClient(
-            uri,
-            server_api=ServerApi("1"),
-            serverSelectionTimeoutMS=10000,
-            connectTimeoutMS=10000,
-            ssl=True,
-            ssl_cert_reqs=ssl.CERT_NONE,
-            tlsAllowInvalidCertificates=True,
-        )
         client.admin.command("ping")
-        print("✅ Conexão mínima bem-sucedida!")
+    except Exception:
+        client.close()
+        raise
+    return client, opcoes
+
+
+def _fechar_perdedor(futuro) -> None:
+    # Sondas que terminam depois da vencedora: o cliente não será usado
+    if not futuro.cancelled() and futuro.exception() is None:
+        futuro.result()[0].close()
+
+
+def create_mongodb_client():
+    """Cria cliente MongoDB sondando as estratégias de conexão em paralelo.
+
+    A próxima estratégia começa assim que a anterior falha ou após
+    MONGO_SONDA_ATRASO_MS sem resposta; a primeira que responder ao `ping`
+    vence e as demais são descartadas.
+    """
+    global opcoes_conexao
+
+    # Detectar contexto do processo para logs mais informativos
+    process_info = f"(PID: {os.getpid()})"
+    atraso = settings.MONGO_SONDA_ATRASO_MS / 1000
+
+    proximas = ordem_estrategias()
+    pool = opcoes_pool()
+    executor = ThreadPoolExecutor(max_workers=len(proximas), thread_name_prefix="mongo-sonda")
+    pendentes = {}
+    vencedor = None
+    try:
+        while vencedor is None and (proximas or pendentes):
+            if proximas:
+                nome = proximas.pop(0)
+                print(f"🔄 Tentando conexão {_ROTULOS[nome]}... {process_info}")
+                pendentes[executor.submit(_sondar, nome, pool)] = nome
+
+            feitos, _ = wait(pendentes, timeout=atraso if proximas else None, return_when=FIRST_COMPLETED)
+            for futuro in feitos:
+                nome = pendentes.pop(futuro)
+                try:
+                    client, opcoes = futuro.result()
+                except Exception as e:
+                    print(f"❌ Conexão {_ROTULOS[nome]} falhou: {type(e).__name__}")
+                    continue
+                if vencedor is None:
+                    vencedor = (nome, client, opcoes)
+                else:
+                    client.close()
+    finally:
+        for futuro in pendentes:
+            futuro.add_done_callback(_fechar_perdedor)
+        executor.shutdown(wait=False)
+
+    if vencedor is not None:
+        nome, client, opcoes = vencedor
+        print(f"✅ Conexão {_ROTULOS[nome]} bem-sucedida!")
+        opcoes_conexao = opcoes
+        _salvar_estrategia(nome)
         return client, database_name
-    except Exception as e:
-        print(f"❌ Conexão mínima falhou: {type(e).__name__}")
 
     # Se todas falharam
     raise ConnectionError(
@@ -109,10 +264,94 @@ def create_mongodb_client():
     )
 
 
+def conexao_resolvida() -> bool:
+    """True depois que `conectar()` terminou (com ou sem banco)."""
+    return _conexao_resolvida
+
+
+def conectar():
+    """Estabelece a conexão uma única vez por processo e retorna o `db` (ou None).
+
+    Seguro para chamar de várias threads: quem chegar durante a conexão
+    espera por ela. Em ambiente de teste ou sem MONGO_URI, não conecta.
+    """
+    global _conexao_resolvida
+
+    if _conexao_resolvida:
+        return _conexao["db"]
+    with _conexao_lock:
+        if _conexao_resolvida:
+            return _conexao["db"]
+
+        if is_testing or not uri:
+            # Ambiente de teste ou sem URI - usar mocks
+            print(f"🧪 Ambiente de teste detectado - usando mocks (PID: {os.getpid()})")
+        else:
+            try:
+                process_info = f"(PID: {os.getpid()}, Main: {is_main_process})"
+                client, db_name = create_mongodb_client()
+                db = client[db_name]
+                print(f"🎯 Conectado ao banco: {db_name} {process_info}")
+
+                # Collections principais
+                _conexao.update(
+                    client=client,
+                    db=db,
+                    usuarios_collection=db["usuarios"],
+                    treinos_collection=db["treinos"],
+                    historico_collection=db["historico_acessos"],
+                    jobs_collection=db["jobs"],
+                    uso_tokens_collection=db["uso_tokens"],
+                )
+            except Exception as e:
+                print(f"💥 Erro fatal: {e}")
+                # Para desenvolvimento, seguimos sem MongoDB
+                print("⚠️  Usando modo de desenvolvimento sem MongoDB")
+
+        _conexao_resolvida = True
+    return _conexao["db"]
+
+
+def __getattr__(nome: str):
+    # Primeiro acesso a `client`, `db` ou a uma collection: conecta
+    if nome in _conexao:
+        conectar()
+        return _conexao[nome]
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+
+def _modulo():
+    # Acesso pelo módulo: passa pelo `__getattr__` (e respeita patches nos testes)
+    return sys.modules[__name__]
+
+
+def fechar() -> None:
+    """Fecha o cliente síncrono (shutdown da aplicação)."""
+    if _conexao["client"] is not None:
+        _conexao["client"].close()
+
+
+def collections_registradas() -> dict:
+    """Collections com índices declarados em `database.indices.INDICES`."""
+    modulo = _modulo()
+    return {
+        "usuarios": modulo.usuarios_collection,
+        "treinos": modulo.treinos_collection,
+        "historico_acessos": modulo.historico_collection,
+        "jobs": modulo.jobs_collection,
+        "uso_tokens": modulo.uso_tokens_collection,
+        settings.GEMINI_CACHE_COLLECTION: (
+            modulo.db[settings.GEMINI_CACHE_COLLECTION] if modulo.db is not None else None
+        ),
+    }
+
+
 def setup_mongodb():
-    """Configura o MongoDB, cria collections e índices iniciais."""
+    """Configura o MongoDB, cria collections e índices iniciais (sob demanda)."""
     global _mongodb_initialized
 
+    db = _modulo().db
+
     if _mongodb_initialized:
         print("✅ MongoDB já foi inicializado anteriormente")
         return
@@ -126,10 +365,14 @@ def setup_mongodb():
             print("⚠️ DB não disponível, pulando dependência do client real (usuário de testes/mocks)")
             return
 
-        # --- Índices úteis ---
-        usuarios_collection.create_index("email", unique=True)
-        treinos_collection.create_index("usuario_id")
-        historico_collection.create_index([("usuario_id", 1), ("treino_id", 1)])
+        # --- Índices (registro declarativo em database/indices.py) ---
+        relatorio = sincronizar_indices(collections_registradas())
+        criados = [nome for r in relatorio.values() for nome in r["criados"] + r["recriados"]]
+        obsoletos = [f"{c}.{nome}" for c, r in relatorio.items() for nome in r["obsoletos"]]
+        if criados:
+            print(f"🗂️ Índices criados/atualizados: {', '.join(criados)}")
+        if obsoletos:
+            print(f"⚠️ Índices fora do registro (use scripts.sincronizar_indices --remover-obsoletos): {', '.join(obsoletos)}")
 
         # --- Documento de inicialização opcional ---
         if "meta" not in db.list_collection_names():
@@ -154,50 +397,3 @@ def setup_mongodb():
     except Exception as e:
         print("⚠️ Erro durante a configuração:")
         print(e)
-
-
-# Criar conexão apenas se não estivermos em ambiente de teste E se for processo apropriado
-if not is_testing and uri and not _connection_created:
-    try:
-        _connection_created = True
-        process_info = f"(PID: {os.getpid()}, Main: {is_main_process})"
-
-        # Só conectar se for o processo worker ou se não estivermos em modo reload
-        if not is_main_process or not any("reload" in str(arg) for arg in sys.argv):
-            client, db_name = create_mongodb_client()
-            db = client[db_name]
-            print(f"🎯 Conectado ao banco: {db_name} {process_info}")
-
-            # Criar as collections principais
-            usuarios_collection = db["usuarios"]
-            treinos_collection = db["treinos"]
-            historico_collection = db["historico_acessos"]
-
-            # Preparar collections e índices
-            setup_mongodb()
-        else:
-            print(f"⏸️ Pulando conexão DB no processo reloader {process_info}")
-            client = None
-            db = None
-            usuarios_collection = None
-            treinos_collection = None
-            historico_collection = None
-
-    except Exception as e:
-        print(f"💥 Erro fatal: {e}")
-        # Para desenvolvimento, vamos criar um cliente mock
-        print("⚠️  Usando modo de desenvolvimento sem MongoDB")
-        client = None
-        db = None
-        usuarios_collection = None
-        treinos_collection = None
-        historico_collection = None
-elif is_testing or not uri:
-    # Ambiente de teste ou sem URI - usar mocks
-    if not _connection_created:
-        print(f"🧪 Ambiente de teste detectado - usando mocks (PID: {os.getpid()})")
-        _connection_created = True
-else:
-    # Conexão já foi criada anteriormente
-    if _connection_created:
-        print(f"✅ Conexão MongoDB já estabelecida anteriormente (PID: {os.getpid()})")
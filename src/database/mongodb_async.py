@@ -0,0 +1,58 @@
+"""
+Cliente assíncrono (Motor) usado pelas rotas através de `repositories/`.
+
+As collections síncronas de `database/mongodb.py` continuam existindo para
+scripts, workers e serviços síncronos. Este módulo cria, sob demanda, um
+`AsyncIOMotorClient` com as mesmas opções da estratégia de conexão que
+funcionou no cliente síncrono. Sem conexão síncrona (testes, sem
+MONGO_URI), `obter_collection` retorna None e os repositórios se comportam
+como os serviços síncronos sem banco.
+
+A conexão síncrona é resolvida sob demanda; `conectar()` a aguarda numa
+thread para não bloquear o event loop durante a sondagem das estratégias.
+"""
+import asyncio
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except Exception:
+    # Sem motor instalado os repositórios ficam sem banco (mesmo comportamento dos mocks)
+    AsyncIOMotorClient = None
+
+from database import mongodb
+from database.monitoramento import MonitorComandos, MonitorPool
+
+client = None
+
+
+async def conectar() -> None:
+    """Garante que a conexão síncrona foi resolvida, sem bloquear o event loop."""
+    if not mongodb.conexao_resolvida():
+        await asyncio.to_thread(mongodb.conectar)
+
+
+def obter_db():
+    """Banco do Motor, criado na primeira chamada (o Motor só conecta na primeira operação)."""
+    global client
+    if mongodb.db is None or AsyncIOMotorClient is None:
+        return None
+    if client is None:
+        client = AsyncIOMotorClient(
+            mongodb.uri,
+            event_listeners=[MonitorPool("async"), MonitorComandos("async")],
+            **mongodb.opcoes_conexao,
+        )
+    return client[mongodb.db.name]
+
+
+def obter_collection(nome: str):
+    db = obter_db()
+    return db[nome] if db is not None else None
+
+
+def fechar() -> None:
+    """Fecha o cliente assíncrono (shutdown da aplicação)."""
+    global client
+    if client is not None:
+        client.close()
+        client = None
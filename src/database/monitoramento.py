@@ -0,0 +1,197 @@
+"""Métricas do MongoDB a partir dos listeners do pymongo.
+
+`MonitorPool` e `MonitorComandos` são registrados em cada cliente
+(`cliente="sync"` para o pymongo, `"async"` para o Motor).
+
+Pool de conexões (`MonitorPool`), exportado em `/metrics`:
+
+- `mongo_pool_checkout_wait_seconds`: espera para obter uma conexão do pool;
+- `mongo_pool_connections` e `mongo_pool_checked_out`: conexões abertas e em uso;
+- `mongo_pool_checkout_failures_total`: checkouts que falharam, por motivo
+  (ex: `timeout` quando MONGO_WAIT_QUEUE_TIMEOUT_MS estoura).
+
+Comandos (`MonitorComandos`):
+
+- `mongo_command_duration_seconds` e `mongo_commands_total`, por comando e collection;
+- `mongo_documents_returned_total`: documentos devolvidos em cursores;
+- `mongo_command_bytes_total`: tamanho BSON do comando (enviado) e da resposta
+  (recebido), só com MONGO_CONTAR_BYTES (reserializar cada comando e resposta
+  custa CPU no caminho de todas as consultas);
+- comandos acima de MONGO_LENTO_MS vão para o log com a forma do filtro,
+  com os valores literais trocados por "?" (ver `forma_do_filtro`).
+"""
+import json
+import threading
+
+import bson
+from pymongo import monitoring
+
+from config.settings import settings
+from utils.metrics import registry as metrics
+
+# Buckets em segundos: a espera normal é sub-milissegundo; filas aparecem acima de 10ms
+BUCKETS_ESPERA = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+pool_espera = metrics.histogram(
+    "mongo_pool_checkout_wait_seconds", "Espera para obter uma conexão do pool do MongoDB", buckets=BUCKETS_ESPERA
+)
+pool_conexoes = metrics.gauge("mongo_pool_connections", "Conexões abertas no pool do MongoDB")
+pool_em_uso = metrics.gauge("mongo_pool_checked_out", "Conexões do pool do MongoDB em uso")
+pool_falhas = metrics.counter("mongo_pool_checkout_failures_total", "Falhas ao obter conexão do pool do MongoDB por motivo")
+
+
+class MonitorPool(monitoring.ConnectionPoolListener):
+    """Converte os eventos do pool de um cliente em métricas."""
+
+    def __init__(self, cliente: str) -> None:
+        self.cliente = cliente
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        pool_conexoes.inc(cliente=self.cliente)
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        pool_conexoes.dec(cliente=self.cliente)
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event) -> None:
+        pool_falhas.inc(cliente=self.cliente, motivo=event.reason)
+        if event.duration is not None:
+            pool_espera.observe(event.duration, cliente=self.cliente)
+
+    def connection_checked_out(self, event) -> None:
+        pool_em_uso.inc(cliente=self.cliente)
+        if event.duration is not None:
+            pool_espera.observe(event.duration, cliente=self.cliente)
+
+    def connection_checked_in(self, event) -> None:
+        pool_em_uso.dec(cliente=self.cliente)
+
+
+# --- Comandos -----------------------------------------------------------------
+
+comando_duracao = metrics.histogram(
+    "mongo_command_duration_seconds", "Latência dos comandos do MongoDB por comando e collection", buckets=BUCKETS_ESPERA
+)
+comandos_total = metrics.counter("mongo_commands_total", "Comandos do MongoDB por comando, collection e status")
+comando_documentos = metrics.counter("mongo_documents_returned_total", "Documentos devolvidos pelo MongoDB em cursores")
+comando_bytes = metrics.counter("mongo_command_bytes_total", "Bytes (BSON) de comandos enviados e respostas recebidas")
+comandos_lentos = metrics.counter("mongo_slow_commands_total", "Comandos do MongoDB acima de MONGO_LENTO_MS")
+
+# Comandos de conexão/autenticação: não dizem nada sobre as consultas da aplicação
+_IGNORADOS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "authenticate", "endSessions"}
+
+# Onde cada comando guarda o filtro
+_CAMPO_FILTRO = {"find": "filter", "count": "query", "findAndModify": "query", "distinct": "query"}
+
+
+def forma_do_filtro(valor):
+    """Estrutura do filtro com os valores literais trocados por "?".
+
+    Mantém campos e operadores (`$in`, `$or`...) para identificar a consulta
+    sem levar para o log e-mails, ids ou outros dados dos usuários.
+    """
+    if isinstance(valor, dict):
+        return {chave: forma_do_filtro(v) for chave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        formas = []
+        for item in valor:
+            forma = forma_do_filtro(item)
+            if forma not in formas:
+                formas.append(forma)
+        return formas
+    return "?"
+
+
+def _collection(comando_nome: str, comando: dict) -> str:
+    nome = comando.get("collection") if comando_nome == "getMore" else comando.get(comando_nome)
+    return nome if isinstance(nome, str) else "-"
+
+
+def _filtro(comando_nome: str, comando: dict):
+    if comando_nome in _CAMPO_FILTRO:
+        return comando.get(_CAMPO_FILTRO[comando_nome])
+    if comando_nome in ("update", "delete"):
+        operacoes = comando.get("updates" if comando_nome == "update" else "deletes") or []
+        return operacoes[0].get("q") if operacoes else None
+    if comando_nome == "aggregate":
+        return comando.get("pipeline")
+    return None
+
+
+def _tamanho_bson(documento) -> int:
+    try:
+        return len(bson.encode(documento))
+    except Exception:
+        return 0
+
+
+class MonitorComandos(monitoring.CommandListener):
+    """Latência, volume e log de consultas lentas dos comandos de um cliente."""
+
+    def __init__(self, cliente: str) -> None:
+        self.cliente = cliente
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+
+    def started(self, event) -> None:
+        if event.command_name in _IGNORADOS:
+            return
+        comando = event.command
+        info = (_collection(event.command_name, comando), _filtro(event.command_name, comando))
+        if settings.MONGO_CONTAR_BYTES:
+            comando_bytes.inc(_tamanho_bson(comando), cliente=self.cliente, direcao="enviado")
+        with self._lock:
+            self._em_andamento[(event.request_id, event.connection_id)] = info
+
+    def _finalizar(self, event, status: str):
+        with self._lock:
+            info = self._em_andamento.pop((event.request_id, event.connection_id), None)
+        if info is None:
+            return None
+        collection, filtro = info
+        segundos = event.duration_micros / 1_000_000
+        labels = {"cliente": self.cliente, "comando": event.command_name, "collection": collection}
+        comando_duracao.observe(segundos, **labels)
+        comandos_total.inc(status=status, **labels)
+
+        limite_ms = settings.MONGO_LENTO_MS
+        if limite_ms > 0 and segundos * 1000 >= limite_ms:
+            comandos_lentos.inc(**labels)
+            forma = json.dumps(forma_do_filtro(filtro), ensure_ascii=False, default=str) if filtro is not None else "-"
+            print(
+                f"🐢 MongoDB lento ({self.cliente}): {event.command_name} {collection} "
+                f"{segundos * 1000:.0f}ms status={status} filtro={forma}"
+            )
+        return labels
+
+    def succeeded(self, event) -> None:
+        labels = self._finalizar(event, "ok")
+        if labels is None:
+            return
+        resposta = event.reply
+        cursor = resposta.get("cursor") if isinstance(resposta, dict) else None
+        if isinstance(cursor, dict):
+            lote = cursor.get("firstBatch", cursor.get("nextBatch")) or []
+            comando_documentos.inc(len(lote), **labels)
+        if settings.MONGO_CONTAR_BYTES:
+            comando_bytes.inc(_tamanho_bson(resposta), cliente=self.cliente, direcao="recebido")
+
+    def failed(self, event) -> None:
+        self._finalizar(event, "erro")
@@ -1,3 +1,4 @@
+import asyncio
 import warnings
 import uvicorn
 
@@ -10,8 +11,10 @@ warnings.filterwarnings(
     category=DeprecationWarning,
     module=r".*passlib.*",
 )
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,11 +22,66 @@ load_dotenv()
 from routes.treino_routes import treino_router
 from routes.auth_routes import auth_router 
 from config.settings import settings 
+from database import mongodb, mongodb_async
+from services import gemini_service, job_service, uso_service
+from utils.metrics import registry as metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicialização/finalização da aplicação."""
+    # Configura o SDK do Gemini uma única vez e cria os modelos reutilizáveis
+    try:
+        await asyncio.to_thread(gemini_service.model_registry.aquecer)
+    except Exception as e:
+        print(f"⚠️ Não foi possível pré-configurar o Gemini: {e}")
+
+    # Conexão com o MongoDB em segundo plano: a API sobe sem esperar a
+    # sondagem das estratégias de TLS (a primeira consulta aguarda a conexão)
+    parar_workers = asyncio.Event()
+    workers = []
+
+    async def iniciar_banco():
+        await mongodb_async.conectar()
+
+        # Workers da fila de geração de planos (JOBS_WORKERS=0 desativa)
+        workers.extend(job_service.iniciar_workers(settings.JOBS_WORKERS, parar_workers))
+        if workers:
+            print(f"🧵 {len(workers)} worker(s) da fila de jobs iniciados")
+
+        # Índices só sob demanda (padrão: scripts.sincronizar_indices)
+        if settings.MONGO_SINCRONIZAR_INDICES:
+            await asyncio.to_thread(mongodb.setup_mongodb)
+
+    inicializacao_banco = asyncio.create_task(iniciar_banco())
+
+    yield
+
+    if not inicializacao_banco.done():
+        inicializacao_banco.cancel()
+    await asyncio.gather(inicializacao_banco, return_exceptions=True)
+
+    parar_workers.set()
+    if workers:
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    # Grava o uso de tokens ainda em memória
+    await asyncio.to_thread(uso_service.descarregar)
+
+    # Apaga os handles de cache de contexto criados por este processo
+    if gemini_service.model_registry.contexto is not None:
+        await asyncio.to_thread(gemini_service.model_registry.contexto.limpar)
+
+    # Fecha os clientes Motor (repositórios) e pymongo
+    mongodb_async.fechar()
+    mongodb.fechar()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     description=settings.APP_DESCRIPTION,
     version=settings.APP_VERSION,
+    lifespan=lifespan,
 )
 
 # CONFIGURAÇÃO DO CORS
@@ -53,6 +111,12 @@ def root():
     return {"message": "PersonalIA Backend is running! 🚀"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    """Métricas do processo no formato texto do Prometheus"""
+    return metrics.render_prometheus()
+
+
 @app.get("/health")
 def health_check():
     """Endpoint detalhado de health check"""
@@ -0,0 +1,79 @@
+"""Base dos repositórios assíncronos (Motor)."""
+from typing import List, Optional
+
+from database import mongodb_async
+from repositories import leitura
+
+
+class RepositorioAsync:
+    """Operações assíncronas sobre uma collection.
+
+    Sem banco (testes, sem MONGO_URI) as leituras retornam None/[] e
+    `disponivel()` é False, como as collections síncronas com valor None.
+    A primeira operação aguarda a conexão (resolvida fora do event loop).
+
+    Leituras que informam `metodo` usam a preferência de leitura configurada
+    para "<collection>.<metodo>" (ver `repositories/leitura.py`).
+    """
+
+    def __init__(self, nome_collection: str) -> None:
+        self.nome_collection = nome_collection
+
+    async def obter_collection(self, metodo: Optional[str] = None):
+        await mongodb_async.conectar()
+        collection = mongodb_async.obter_collection(self.nome_collection)
+        preferencia = leitura.preferencia(f"{self.nome_collection}.{metodo}") if metodo else None
+        if collection is None or preferencia is None:
+            return collection
+        return collection.with_options(read_preference=preferencia)
+
+    async def disponivel(self) -> bool:
+        return await self.obter_collection() is not None
+
+    async def find_one(
+        self, filtro: dict, projecao: Optional[dict] = None, metodo: Optional[str] = None
+    ) -> Optional[dict]:
+        collection = await self.obter_collection(metodo)
+        if collection is None:
+            return None
+        return await collection.find_one(filtro, projecao)
+
+    async def find(
+        self,
+        filtro: dict,
+        projecao: Optional[dict] = None,
+        sort: Optional[list] = None,
+        limit: int = 0,
+        metodo: Optional[str] = None,
+    ) -> List[dict]:
+        collection = await self.obter_collection(metodo)
+        if collection is None:
+            return []
+        cursor = collection.find(filtro, projecao)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def find_one_and_update(
+        self, filtro: dict, atualizacao: dict, projecao: Optional[dict] = None
+    ) -> Optional[dict]:
+        """Atualiza atomicamente um documento e o retorna como estava antes (None se não houver)."""
+        collection = await self.obter_collection()
+        if collection is None:
+            return None
+        return await collection.find_one_and_update(filtro, atualizacao, projecao)
+
+    async def insert_one(self, doc: dict):
+        """Insere o documento e retorna o `_id` gerado."""
+        result = await (await self.obter_collection()).insert_one(doc)
+        return result.inserted_id
+
+    async def update_one(self, filtro: dict, atualizacao: dict, upsert: bool = False) -> int:
+        """Atualiza um documento e retorna quantos foram modificados (0 sem banco)."""
+        collection = await self.obter_collection()
+        if collection is None:
+            return 0
+        result = await collection.update_one(filtro, atualizacao, upsert=upsert)
+        return result.modified_count
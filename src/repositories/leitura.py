@@ -0,0 +1,87 @@
+"""Preferência de leitura por método de repositório.
+
+Leituras pesadas de histórico e detalhe podem ir para secundários
+(`secondaryPreferred`), limitadas por MONGO_MAX_STALENESS_SECONDS; o resto
+fica no primário. O padrão está em `PADRAO` e cada método pode ser
+sobrescrito em MONGO_PREFERENCIAS_LEITURA, por exemplo:
+
+    MONGO_PREFERENCIAS_LEITURA=treinos.buscar_por_id=primary,treinos.listar_pagina=nearest
+
+Read-your-writes, válido entre processos e réplicas da API:
+
+- cada treino salvo grava `usuarios.treinos_escritos_em` (`CAMPO_ESCRITA`).
+  O documento do usuário é lido do primário em toda requisição
+  autenticada; enquanto esse horário estiver dentro da staleness máxima,
+  as listagens do usuário também vão para o primário (`escrito_recentemente`);
+- a busca por id que não encontra o documento num secundário é refeita no
+  primário (o treino pode ter acabado de ser criado).
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from pymongo.read_preferences import Nearest, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from config.settings import settings
+
+PRIMARIO = "primary"
+
+# Campo de `usuarios` com o horário do último treino salvo
+CAMPO_ESCRITA = "treinos_escritos_em"
+
+# Menor maxStalenessSeconds aceito pelo MongoDB
+STALENESS_MINIMO = 90
+
+# Modos aceitos (o primário é o padrão da collection: sem `with_options`)
+_MODOS = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Métodos (collection.metodo) que leem de secundários por padrão
+PADRAO: Dict[str, str] = {
+    "treinos.listar_por_usuario": "secondaryPreferred",
+    "treinos.listar_pagina": "secondaryPreferred",
+    "treinos.buscar_por_id": "secondaryPreferred",
+}
+
+
+def carregar_modos(config: str) -> Dict[str, str]:
+    """`PADRAO` com as substituições de `config` ("metodo=modo,...")."""
+    modos = dict(PADRAO)
+    for item in (config or "").split(","):
+        if not item.strip():
+            continue
+        metodo, _, modo = item.partition("=")
+        metodo, modo = metodo.strip(), modo.strip()
+        if modo != PRIMARIO and modo not in _MODOS:
+            print(f"⚠️ Preferência de leitura inválida ignorada: {item.strip()}")
+            continue
+        modos[metodo] = modo
+    return modos
+
+
+def carregar_staleness(segundos: int) -> int:
+    """Staleness máxima configurada, elevada ao mínimo do MongoDB se menor."""
+    if segundos < STALENESS_MINIMO:
+        print(f"⚠️ MONGO_MAX_STALENESS_SECONDS={segundos} abaixo do mínimo do MongoDB; usando {STALENESS_MINIMO}")
+        return STALENESS_MINIMO
+    return segundos
+
+
+modos = carregar_modos(settings.MONGO_PREFERENCIAS_LEITURA)
+max_staleness = carregar_staleness(settings.MONGO_MAX_STALENESS_SECONDS)
+
+
+def preferencia(metodo: str):
+    """Read preference do método, ou None para ler do primário."""
+    modo = modos.get(metodo, PRIMARIO)
+    if modo == PRIMARIO:
+        return None
+    return _MODOS[modo](max_staleness=max_staleness)
+
+
+def escrito_recentemente(escrito_em: Optional[datetime]) -> bool:
+    """True se `escrito_em` (ex: `user[CAMPO_ESCRITA]`) ainda está dentro da staleness máxima."""
+    return escrito_em is not None and datetime.utcnow() - escrito_em < timedelta(seconds=max_staleness)
@@ -0,0 +1,68 @@
+"""Repositório assíncrono da collection `treinos`."""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+
+from repositories import leitura
+from repositories.base import RepositorioAsync
+
+# Ordem da listagem e da paginação por keyset (índice usuario_id, criado_em, _id)
+ORDEM_PAGINA = [("criado_em", -1), ("_id", -1)]
+
+
+def filtro_pagina(usuario_id: ObjectId, posicao: Optional[Tuple[datetime, ObjectId]] = None) -> dict:
+    """Filtro dos treinos do usuário depois da posição (criado_em, _id) do cursor."""
+    filtro = {"usuario_id": usuario_id}
+    if posicao is not None:
+        criado_em, ultimo_id = posicao
+        filtro["$or"] = [
+            {"criado_em": {"$lt": criado_em}},
+            {"criado_em": criado_em, "_id": {"$lt": ultimo_id}},
+        ]
+    return filtro
+
+
+class TreinoRepository(RepositorioAsync):
+    """Leituras de treinos; `primario=True` ignora a preferência de leitura
+    (read-your-writes logo após salvar, ver `repositories/leitura.py`)."""
+
+    def __init__(self) -> None:
+        super().__init__("treinos")
+
+    async def buscar_por_id(self, treino_id) -> Optional[dict]:
+        filtro = {"_id": ObjectId(str(treino_id))}
+        doc = await self.find_one(filtro, metodo="buscar_por_id")
+        if doc is None and leitura.preferencia("treinos.buscar_por_id") is not None:
+            # Pode ter acabado de ser criado e ainda não ter chegado ao secundário
+            doc = await self.find_one(filtro)
+        return doc
+
+    async def listar_por_usuario(
+        self, usuario_id: ObjectId, projecao: Optional[dict] = None, primario: bool = False
+    ) -> List[dict]:
+        return await self.find(
+            {"usuario_id": usuario_id},
+            projecao,
+            sort=[("criado_em", -1)],
+            metodo=None if primario else "listar_por_usuario",
+        )
+
+    async def listar_pagina(
+        self,
+        usuario_id: ObjectId,
+        limit: int,
+        posicao: Optional[Tuple[datetime, ObjectId]] = None,
+        projecao: Optional[dict] = None,
+        primario: bool = False,
+    ) -> List[dict]:
+        return await self.find(
+            filtro_pagina(usuario_id, posicao),
+            projecao,
+            sort=ORDEM_PAGINA,
+            limit=limit,
+            metodo=None if primario else "listar_pagina",
+        )
+
+
+treino_repo = TreinoRepository()
@@ -0,0 +1,33 @@
+"""Repositório assíncrono da collection `usuarios`."""
+from typing import Optional
+
+from bson import ObjectId
+
+from repositories.base import RepositorioAsync
+
+
+def _object_id(usuario_id):
+    return usuario_id if isinstance(usuario_id, ObjectId) else ObjectId(str(usuario_id))
+
+
+class UsuarioRepository(RepositorioAsync):
+    def __init__(self) -> None:
+        super().__init__("usuarios")
+
+    async def buscar_por_email(self, email: str, projecao: Optional[dict] = None) -> Optional[dict]:
+        return await self.find_one({"email": email}, projecao)
+
+    async def buscar_por_id(self, usuario_id, projecao: Optional[dict] = None) -> Optional[dict]:
+        return await self.find_one({"_id": _object_id(usuario_id)}, projecao)
+
+    async def existe_com_token(self, email: str, token: str) -> bool:
+        return await self.find_one({"email": email, "token": token}, {"_id": 1}) is not None
+
+    async def atualizar_por_email(self, email: str, atualizacao: dict) -> int:
+        return await self.update_one({"email": email}, atualizacao)
+
+    async def atualizar_por_id(self, usuario_id, atualizacao: dict) -> int:
+        return await self.update_one({"_id": _object_id(usuario_id)}, atualizacao)
+
+
+usuario_repo = UsuarioRepository()
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 # Importações absolutas (sem '..')
 from models.user import UserCreate, UserLogin, TokenResponse, UserResponse
 from services import auth_service, security
@@ -10,11 +11,10 @@ auth_router = APIRouter(prefix="/auth", tags=["Autenticação"])
 @auth_router.post("/register", 
              response_model=TokenResponse, 
              status_code=status.HTTP_201_CREATED)
-def register_user(user_data: UserCreate): # <-- SÍNCRONO
-    """ Rota síncrona para registrar usuário """
+async def register_user(user_data: UserCreate):
+    """ Rota para registrar usuário (repositório assíncrono) """
     try:
-        # Chamada síncrona
-        new_user = auth_service.create_user(user_data)
+        new_user = await auth_service.create_user_async(user_data)
     except HTTPException as e:
         raise e 
     
@@ -26,9 +26,9 @@ def register_user(user_data: UserCreate): # <-- SÍNCRONO
     return TokenResponse(access_token=access_token, user=user_resp)
 
 @auth_router.post("/login", response_model=TokenResponse)
-def login_user(form_data: UserLogin, background_tasks: BackgroundTasks): # <-- SÍNCRONO
-    """ Rota síncrona para login """
-    user = auth_service.authenticate(form_data.email, form_data.senha)
+async def login_user(form_data: UserLogin, background_tasks: BackgroundTasks):
+    """ Rota para login (repositório assíncrono; o hash roda no threadpool) """
+    user = await auth_service.authenticate_async(form_data.email, form_data.senha)
     
     if not user:
         raise HTTPException(
@@ -63,13 +63,13 @@ class EmailCheckRequest(BaseModel):
     email: EmailStr
 
 @auth_router.post("/check-email", status_code=status.HTTP_200_OK)
-def check_email_exists(data: EmailCheckRequest):
+async def check_email_exists(data: EmailCheckRequest):
     """
     Verifica se um e-mail já está cadastrado no sistema.
     Retorna 200 OK se o e-mail estiver disponível.
     Retorna 409 Conflict se o e-mail já estiver em uso.
     """
-    user = auth_service.get_user_by_email(data.email)
+    user = await auth_service.get_user_by_email_async(data.email)
     if user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -78,20 +78,21 @@ def check_email_exists(data: EmailCheckRequest):
     return {"message": "E-mail disponível"}
 
 @auth_router.post("/forgot-password")
-def forgot_password(email: str):
-    user = auth_service.get_user_by_email(email)
+async def forgot_password(email: str):
+    user = await auth_service.get_user_by_email_async(email)
     if not user:
         return {"message": "Se o e-mail estiver cadastrado, um link de recuperação será enviado."}
     reset_token = security.create_recovery_token(email)
-    auth_service.update_token(email, reset_token)
-    email_service.send_email(email, reset_token)
+    await auth_service.update_token_async(email, reset_token)
+    # Envio SMTP é bloqueante
+    await run_in_threadpool(email_service.send_email, email, reset_token)
     return {"message": "Se o e-mail estiver cadastrado, um link de recuperação será enviado."}
 
 @auth_router.post("/reset-password")
-def reset_password(token: str, password: str):
+async def reset_password(token: str, password: str):
     email = security.verify_recovery_token(token)
     if not email:
         return {"message": "não foi possivel alterar"}
-    senha_hash = security.hash_password(password)
-    msg = auth_service.update_user_password(email, senha_hash, token)
+    senha_hash = await run_in_threadpool(security.hash_password, password)
+    msg = await auth_service.update_user_password_async(email, senha_hash, token)
     return {"message": msg}
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import json
+from typing import Optional
+from config.settings import settings
 # Importações absolutas (sem '..')
 from models.schemas import MensagemChat   
 from services import gemini_service
 from services import security          
 from services import auth_service       
 from services import treino_service 
+from services import contexto_usuario_service
+from services import job_service
+from services import pregeracao_service
 
 treino_router = APIRouter(prefix="/treinos", tags=["Treinos"])
 
@@ -13,48 +21,57 @@ treino_router = APIRouter(prefix="/treinos", tags=["Treinos"])
 # `routes.treino_routes.listar_treinos_por_usuario`.
 salvar_treino = treino_service.salvar_treino
 listar_treinos_por_usuario = treino_service.listar_treinos_por_usuario
+# Versões assíncronas (repositórios Motor) usadas pelas rotas autenticadas
+salvar_treino_async = treino_service.salvar_treino_async
+
+
+def _evento_sse(evento: str, payload: dict) -> str:
+    """Formata um evento Server-Sent Events com payload JSON."""
+    return f"event: {evento}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
 
 @treino_router.post("/")
-def criar_treino(
+async def criar_treino(
     data: MensagemChat, 
-    # Dependência SÍNCRONA
+    # Dependência SÍNCRONA (executada pelo FastAPI no threadpool)
     email: str = Depends(security.get_current_user_email) 
-): # <-- MUDANÇA: SÍNCRONO
+):
     """
-    Cria um novo plano de treino para o usuário LOGADO (SÍNCRONO).
+    Cria um novo plano de treino para o usuário LOGADO (ASSÍNCRONO).
+
+    A chamada ao Gemini e as consultas ao MongoDB (repositórios Motor) são
+    aguardadas no event loop, sem ocupar o threadpool.
     """
-    user = auth_service.get_user_by_email(email)
-    if not user:
+    # Perfil e resumo do histórico (tamanho limitado por HISTORICO_MAX_TOKENS):
+    # vêm do cache aquecido no login ou, se não houver, do MongoDB
+    contexto = await contexto_usuario_service.obter_async(email)
+    if not contexto:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    user = contexto["user"]
     
     try:
-        # 1. Pega o histórico de treinos (síncrono)
-        treinos_anteriores = treino_service.listar_treinos_por_usuario(str(user["_id"]))
-        historico_str = "\n\n---\n\n".join([t.get("plano_gerado", "") for t in treinos_anteriores])
+        # 0. Pedido do plano semanal: entrega o pré-gerado no lote, sem chamar a IA
+        pregerado = await pregeracao_service.servir_pregerado(user, data)
+        if pregerado:
+            return {"status": "ok", "treino": pregerado}
+
+        # 1. Resumo do histórico de treinos
+        historico_str = contexto["historico"]
 
-        # 2. Rota chama a IA (síncrono) — passamos o objeto MensagemChat, o
+        # 2. Rota aguarda a IA (assíncrono) — passamos o objeto MensagemChat, o
         # contexto do usuário e o histórico para que a IA possa personalizar
         # o plano com base nos dados cadastrados.
-        plano_de_treino = gemini_service.gerar_plano_de_treino(
+        plano_de_treino = await gemini_service.gerar_plano_de_treino_async(
             data, user=user, historico=historico_str
         )
         
         # 3. Prepara o contexto
-        user_context = {
-            "email": user.get("email"),
-            "idade": user.get("idade"),
-            "peso": user.get("peso"),
-            "altura": user.get("altura"),
-            "objetivo": user.get("objetivo"),
-            "frequencia": user.get("frequencia"),
-            "limitacoes": user.get("limitacoes"),
-            "mensagem_usuario": data.mensagem_usuario, # Salva a pergunta também
-        }
+        user_context = treino_service.montar_user_context(user, data)
         
-        # 4. Rota salva no DB (síncrono)
-        # Use alias `salvar_treino` para permitir patching em testes
-        treino_salvo = salvar_treino(
-            usuario_id=str(user["_id"]), 
+        # 4. Rota salva no DB
+        # Use alias `salvar_treino_async` para permitir patching em testes
+        treino_salvo = await salvar_treino_async(
+            usuario_id=str(user["_id"]),
             plano_gerado=plano_de_treino,
             user_context=user_context,
         )
@@ -65,20 +82,149 @@ def criar_treino(
         print(f"!!!!!!!!!!!! ERRO DETALHADO !!!!!!!!!!!!\n{e}\n!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
         raise HTTPException(status_code=500, detail=str(e))
 
+@treino_router.post("/stream")
+async def criar_treino_stream(
+    data: MensagemChat,
+    email: str = Depends(security.get_current_user_email)
+):
+    """
+    Cria um plano de treino enviando o texto via Server-Sent Events (SSE).
+
+    Eventos emitidos:
+    - `chunk`: `{"texto": "..."}` para cada trecho gerado pelo Gemini;
+    - `fim`: `{"treino_id": "...", "treino": {...}}` após salvar o plano completo;
+    - `erro`: `{"detail": "..."}` se a geração ou a persistência falhar. Um
+      plano interrompido no meio não é salvo.
+    """
+    contexto = await contexto_usuario_service.obter_async(email)
+    if not contexto:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    user = contexto["user"]
+    historico_str = contexto["historico"]
+
+    pregerado = await pregeracao_service.servir_pregerado(user, data)
+
+    async def eventos():
+        if pregerado:
+            # Plano semanal pré-gerado: um único trecho e o `fim`, sem chamar a IA
+            yield _evento_sse("chunk", {"texto": pregerado["plano_gerado"]})
+            yield _evento_sse("fim", {"treino_id": pregerado["_id"], "treino": pregerado})
+            return
+
+        partes = []
+        try:
+            async for texto in gemini_service.gerar_plano_de_treino_stream(
+                data, user=user, historico=historico_str
+            ):
+                partes.append(texto)
+                yield _evento_sse("chunk", {"texto": texto})
+        except gemini_service.ErroNoStream as e:
+            yield _evento_sse("erro", {"detail": str(e)})
+            return
+
+        try:
+            treino_salvo = await salvar_treino_async(
+                usuario_id=str(user["_id"]),
+                plano_gerado="".join(partes),
+                user_context=treino_service.montar_user_context(user, data),
+            )
+        except Exception as e:
+            print(f"Erro ao salvar treino do stream: {e}")
+            yield _evento_sse("erro", {"detail": str(e)})
+            return
+
+        yield _evento_sse("fim", {"treino_id": str(treino_salvo.get("_id")), "treino": treino_salvo})
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        # Evita que proxies (ex: nginx) acumulem a resposta antes de repassar
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@treino_router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def criar_job_treino(
+    data: MensagemChat,
+    email: str = Depends(security.get_current_user_email)
+):
+    """
+    Enfileira a geração de um plano e responde imediatamente (202).
+
+    O plano é gerado por um worker da fila; acompanhe em `GET /treinos/jobs/{job_id}`.
+    """
+    user = await auth_service.get_user_by_email_async(email)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+
+    try:
+        # A fila é compartilhada com os workers (pymongo síncrono)
+        job = await run_in_threadpool(job_service.criar_job, str(user["_id"]), email, data)
+    except Exception as e:
+        print(f"Erro ao enfileirar job: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {"job_id": job["_id"], "status": job["status"]}
+
+
+@treino_router.get("/jobs/{job_id}")
+async def get_job_treino(
+    job_id: str,
+    email: str = Depends(security.get_current_user_email)
+):
+    """Retorna o status de um job e, quando concluído, o treino gerado."""
+    job = await run_in_threadpool(job_service.buscar_job, job_id)
+    # Jobs de outros usuários são tratados como inexistentes
+    if not job or job.get("email") != email:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+
+    return {
+        "job_id": job["_id"],
+        "status": job.get("status"),
+        "tentativas": job.get("tentativas", 0),
+        "criado_em": job.get("criado_em"),
+        "atualizado_em": job.get("atualizado_em"),
+        "resultado": job.get("resultado"),
+        "erro": job.get("erro"),
+    }
+
 @treino_router.get("/")
-def get_treinos(
+async def get_treinos(
+    limit: Optional[int] = Query(None, ge=1, le=settings.TREINOS_PAGINA_MAX),
+    cursor: Optional[str] = None,
+    view: Optional[str] = Query(None, description="summary: só _id, criado_em, objetivo e titulo"),
+    fields: Optional[str] = Query(None, description="Campos separados por vírgula (ex: titulo,criado_em)"),
     email: str = Depends(security.get_current_user_email)
-): # <-- MUDANÇA: SÍNCRONO
+):
     """
-    Lista os treinos salvos do usuário LOGADO (SÍNCRONO).
+    Lista os treinos salvos do usuário LOGADO, paginados.
+
+    Retorna `{"itens": [...], "next_cursor": ...}`; para a próxima página,
+    repita a chamada com `cursor=next_cursor`. Com TREINOS_LISTA_COMPLETA
+    ativo e sem `limit`/`cursor`, retorna a lista completa (formato antigo).
+
+    `view=summary` ou `fields=...` limitam os campos lidos do banco (a
+    listagem do histórico não precisa do `plano_gerado`).
     """
-    user = auth_service.get_user_by_email(email)
+    user = await auth_service.get_user_by_email_async(email)
     if not user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
-        
-    # Use alias `listar_treinos_por_usuario` para permitir patching em testes
-    treinos = listar_treinos_por_usuario(str(user["_id"]))
-    return treinos
+
+    try:
+        campos = treino_service.resolver_campos(view, fields)
+        # Logo após salvar um treino, lê do primário para a lista já trazê-lo
+        primario = treino_service.ler_do_primario(user)
+
+        if settings.TREINOS_LISTA_COMPLETA and limit is None and cursor is None:
+            return await treino_service.listar_treinos_por_usuario_async(
+                str(user["_id"]), campos=campos, primario=primario
+            )
+
+        return await treino_service.listar_treinos_paginado_async(
+            str(user["_id"]), limit=limit or settings.TREINOS_PAGINA_PADRAO, cursor=cursor, campos=campos,
+            primario=primario,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # -------------------------
@@ -9,7 +9,7 @@ user_router = APIRouter(prefix="/usuario", tags=["Usr"])
 @user_router.post("/cadastro")
 async def post_usuario(data: DadosUsr):
     try:
-        status, usr = criar_usuario(data)
+        status, usr = await criar_usuario(data)
         # Retornar 201 quando criado, 409 quando já existe
         from fastapi.responses import JSONResponse
 
@@ -23,13 +23,13 @@ async def post_usuario(data: DadosUsr):
 
 @user_router.get("/cadastro")
 async def get_usuario(email: str):
-    return ler_usuario(email)
+    return await ler_usuario(email)
 
 
 @user_router.post("/solicitar-nova-senha")
 async def post_solicitacao(email: str):
     try:
-        status, usr = solicitar_recuperacao(email)
+        status, usr = await solicitar_recuperacao(email)
         return {"status": status, "usuario": usr}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -38,7 +38,7 @@ async def post_solicitacao(email: str):
 @user_router.post("/mudar-senha")
 async def post_alterar(token: str, senha_nova: str):
     try:
-        status = mudar_senha(token, senha_nova)
+        status = await mudar_senha(token, senha_nova)
         return {"status": status}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
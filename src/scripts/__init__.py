@@ -0,0 +1,3 @@
+"""
+Scripts utilitários (benchmarks, manutenção) executados com `python -m scripts.<nome>` a partir de `src/`.
+"""
@@ -0,0 +1,60 @@
+"""
+Micro-benchmark do custo de preparação de uma chamada ao Gemini.
+
+Compara o caminho antigo (`genai.configure` + novo `GenerativeModel` a cada
+requisição) com o `model_registry`, que reutiliza as instâncias. Nenhuma
+requisição é enviada à API: medimos apenas a preparação do cliente.
+
+Uso (a partir de `src/`):
+    python -m scripts.bench_gemini_setup [iteracoes]
+"""
+import sys
+import time
+
+from services import gemini_service
+from services.gemini_service import SYSTEM_INSTRUCTION_BASE, SYSTEM_INSTRUCTION_PLANO
+
+
+def _medir(funcao, iteracoes: int) -> float:
+    """Retorna o tempo médio por chamada em microssegundos."""
+    inicio = time.perf_counter()
+    for i in range(iteracoes):
+        funcao(i)
+    return (time.perf_counter() - inicio) / iteracoes * 1e6
+
+
+def main(iteracoes: int = 2000) -> None:
+    genai = gemini_service.genai
+    if genai is None:
+        print("❌ google-generativeai não instalado")
+        return
+
+    settings = gemini_service.settings
+    if not settings.GEMINI_API_KEY:
+        # A chave não é usada (nenhuma chamada remota), só precisa existir
+        settings.GEMINI_API_KEY = "benchmark-key"
+    api_key = settings.GEMINI_API_KEY
+    model_name = gemini_service._resolver_modelo()
+    instrucoes = (SYSTEM_INSTRUCTION_BASE, SYSTEM_INSTRUCTION_PLANO)
+
+    def antes(i: int):
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(model_name=model_name, system_instruction=instrucoes[i % 2])
+
+    registry = gemini_service.ModelRegistry()
+
+    def depois(i: int):
+        return registry.obter(model_name, instrucoes[i % 2])
+
+    us_antes = _medir(antes, iteracoes)
+    us_depois = _medir(depois, iteracoes)
+
+    print(f"🔬 Preparação por chamada ({iteracoes} iterações, modelo {model_name})")
+    print(f"   configure + GenerativeModel a cada chamada: {us_antes:10.1f} µs")
+    print(f"   model_registry.obter (reuso):               {us_depois:10.1f} µs")
+    if us_depois > 0:
+        print(f"   ganho: {us_antes / us_depois:.0f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,103 @@
+"""
+Benchmark do roteador local de intenção.
+
+Classifica um corpus de mensagens de exemplo com o roteador compilado e
+com a detecção antiga (busca de substrings), mostrando o tempo por
+mensagem e a parcela de mensagens respondida sem chamar o Gemini.
+
+Uso (a partir de `src/`):
+    python -m scripts.bench_intent_router [repeticoes]
+"""
+import sys
+import time
+from collections import Counter
+
+from services import intent_router
+
+CORPUS = [
+    "oi",
+    "Olá!",
+    "bom dia",
+    "boa noite, tudo bem?",
+    "e aí",
+    "valeu!",
+    "obrigada pela ajuda",
+    "quero um treino",
+    "Quero um treino para casa",
+    "Monte um plano de treino de 4 dias para hipertrofia na academia",
+    "preciso de uma rotina de exercícios para fazer na praça com barras",
+    "me passa um treino completo de pernas e glúteos para iniciante em casa",
+    "gostaria de um plano focado em emagrecimento com 3 treinos por semana",
+    "Quero uma ficha de musculação para ganhar massa muscular, treino 5x por semana",
+    "como é a execução correta do agachamento?",
+    "qual alternativa para a flexão se eu não consigo fazer?",
+    "o que é drop set?",
+    "quantas séries de prancha devo fazer?",
+    "sinto dor no joelho quando faço agachamento",
+    "como faço supino sem banco?",
+    "posso substituir o halter por garrafa de água?",
+    "qual a postura certa no levantamento terra?",
+    "me ajuda com o descanso entre as séries",
+    "quanto tempo de cardio antes da musculação?",
+    "me passa uma receita de bolo de chocolate",
+    "qual o melhor filme de 2024?",
+    "quem vai ganhar o jogo de futebol hoje?",
+    "me conta uma piada",
+    "como programar em python?",
+    "qual meu signo se nasci em março?",
+    "vale a pena investir em bitcoin?",
+    "qual a previsão do tempo para amanhã?",
+    "me indica uma música para ouvir",
+    "o que você acha da política atual?",
+    "foi difícil ontem",
+    "depois eu volto",
+    "quero ficar sarado até o verão",
+    "tenho 40 anos e quero começar a malhar",
+    "abdominal todo dia faz mal?",
+    "treino de braço com elástico",
+]
+
+PALAVRAS_PLANO_ANTIGAS = ["treino", "plano", "foco"]
+PALAVRAS_DUVIDA_ANTIGAS = ["olá", "oi", "dúvida", "como é", "execução", "alternativa", "o que é", "ajuda", "diga"]
+
+
+def classificar_antigo(mensagem: str) -> str:
+    """Detecção anterior do gemini_service (substrings, sem respostas locais)."""
+    m = mensagem.lower().strip()
+    is_plan = any(k in m for k in PALAVRAS_PLANO_ANTIGAS)
+    is_doubt = any(k in m for k in PALAVRAS_DUVIDA_ANTIGAS) or len(m.split()) < 6
+    return intent_router.PLANO if is_plan and not is_doubt else intent_router.DUVIDA
+
+
+def _medir(funcao, repeticoes: int) -> float:
+    """Tempo médio por mensagem em microssegundos."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for mensagem in CORPUS:
+            funcao(mensagem)
+    return (time.perf_counter() - inicio) / (repeticoes * len(CORPUS)) * 1e6
+
+
+def main(repeticoes: int = 500) -> None:
+    us_antigo = _medir(classificar_antigo, repeticoes)
+    us_router = _medir(intent_router.classificar, repeticoes)
+
+    distribuicao = Counter(intent_router.classificar(m) for m in CORPUS)
+    locais = sum(distribuicao[i] for i in intent_router.RESPOSTAS_LOCAIS)
+
+    print(f"🔬 Roteador de intenção ({len(CORPUS)} mensagens x {repeticoes} repetições)")
+    print(f"   detecção antiga (substrings): {us_antigo:8.2f} µs/mensagem")
+    print(f"   roteador compilado:           {us_router:8.2f} µs/mensagem")
+    print("   distribuição:")
+    for intencao, total in sorted(distribuicao.items()):
+        print(f"     {intencao:<13} {total:3d}")
+    print(f"   respondidas localmente (sem Gemini): {locais}/{len(CORPUS)} ({locais / len(CORPUS):.0%})")
+
+    if "-v" in sys.argv:
+        for m in CORPUS:
+            print(f"   [{intent_router.classificar(m):<12}] {m}")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "-v"]
+    main(int(args[0]) if args else 500)
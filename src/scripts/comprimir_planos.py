@@ -0,0 +1,34 @@
+"""
+Converte os planos já salvos em `treinos` para o codec de PLANO_COMPRESSAO.
+
+A leitura (`listar_treinos_por_usuario`, `buscar_treino_por_id`) entende os
+dois formatos, então a migração pode rodar com a API no ar e ser
+interrompida a qualquer momento.
+
+Uso (a partir de `src/`):
+    python -m scripts.comprimir_planos [--codec zlib|zstd|off] [--min-bytes 1024] [--lote 500] [--limite N]
+
+`--codec off` descomprime os documentos de volta para texto; planos já
+comprimidos com outro codec (ex: zlib com `--codec zstd`) são recodificados.
+"""
+import argparse
+
+from services import treino_service
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compressão dos planos salvos em treinos")
+    parser.add_argument("--codec", choices=["zlib", "zstd", "off"], help="Codec (padrão: PLANO_COMPRESSAO)")
+    parser.add_argument("--min-bytes", type=int, help="Tamanho mínimo para comprimir (padrão: PLANO_COMPRESSAO_MIN_BYTES)")
+    parser.add_argument("--lote", type=int, default=500, help="Documentos por lote de bulk_write")
+    parser.add_argument("--limite", type=int, help="Processa no máximo N documentos nesta execução")
+    args = parser.parse_args()
+
+    totais = treino_service.migrar_compressao(
+        codec=args.codec, min_bytes=args.min_bytes, tamanho_lote=args.lote, limite=args.limite,
+    )
+    print(f"🗜️ {totais['convertidos']} de {totais['lidos']} treinos convertidos")
+
+
+if __name__ == "__main__":
+    main()
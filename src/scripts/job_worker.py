@@ -0,0 +1,42 @@
+"""
+Executa workers da fila de geração de planos num processo separado da API.
+
+Útil para escalar a geração (limitada pelo Gemini) independentemente dos
+workers HTTP: rode a API com JOBS_WORKERS=0 e quantos processos deste
+script forem necessários.
+
+Uso (a partir de `src/`):
+    python -m scripts.job_worker [quantidade_de_workers]
+"""
+import asyncio
+import signal
+import sys
+
+from config.settings import settings
+from database import mongodb
+from services import job_service
+
+
+async def main(quantidade: int) -> None:
+    if mongodb.jobs_collection is None:
+        print("❌ MongoDB não disponível: nenhum worker iniciado")
+        return
+
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sinal, parar.set)
+        except NotImplementedError:
+            # Windows: Ctrl+C ainda interrompe via KeyboardInterrupt
+            pass
+
+    workers = job_service.iniciar_workers(quantidade, parar)
+    print(f"🧵 {len(workers)} worker(s) aguardando jobs... (Ctrl+C para sair)")
+    await asyncio.gather(*workers)
+    print("👋 Workers finalizados")
+
+
+if __name__ == "__main__":
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else max(1, settings.JOBS_WORKERS)
+    asyncio.run(main(quantidade))
@@ -0,0 +1,25 @@
+"""
+Grava o campo `titulo` nos treinos salvos antes da listagem resumida.
+
+O título vem do cabeçalho "Plano de Treino: ..." do plano. Treinos novos já
+são salvos com ele; este script só precisa rodar uma vez (é idempotente).
+
+Uso (a partir de `src/`):
+    python -m scripts.preencher_titulos [--lote 500]
+"""
+import argparse
+
+from services import treino_service
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Preenche o título dos treinos antigos")
+    parser.add_argument("--lote", type=int, default=500, help="Documentos por lote de bulk_write")
+    args = parser.parse_args()
+
+    atualizados = treino_service.preencher_titulos(tamanho_lote=args.lote)
+    print(f"🏷️ {atualizados} treinos com título preenchido")
+
+
+if __name__ == "__main__":
+    main()
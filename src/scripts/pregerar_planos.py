@@ -0,0 +1,40 @@
+"""
+Pré-gera os planos da próxima semana para todos os usuários ativos.
+
+Pode ser interrompido e executado de novo: o lote continua do último
+checkpoint. Agende antes do pico (ex: domingo à noite).
+
+Uso (a partir de `src/`):
+    python -m scripts.pregerar_planos [--lote 2025-W06] [--paralelismo 4] [--pagina 100] [--limite N]
+"""
+import argparse
+import asyncio
+
+from services import pregeracao_service, uso_service
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pré-geração em lote dos planos semanais")
+    parser.add_argument("--lote", help="Identificador do lote (padrão: semana ISO seguinte)")
+    parser.add_argument("--paralelismo", type=int, help="Gerações simultâneas (padrão: PREGERACAO_PARALELISMO)")
+    parser.add_argument("--pagina", type=int, help="Usuários por página (padrão: PREGERACAO_TAMANHO_PAGINA)")
+    parser.add_argument("--limite", type=int, help="Processa no máximo N usuários nesta execução")
+    args = parser.parse_args()
+
+    try:
+        checkpoint = asyncio.run(pregeracao_service.pregerar_planos(
+            lote=args.lote, paralelismo=args.paralelismo, tamanho_pagina=args.pagina, limite=args.limite,
+        ))
+    finally:
+        uso_service.descarregar()
+
+    situacao = "concluído" if checkpoint.get("concluido") else "parcial (execute de novo para continuar)"
+    print(
+        f"🏁 Lote {checkpoint['_id'].split(':', 1)[1]} {situacao}: "
+        f"{checkpoint.get('gerado', 0)} gerados, {checkpoint.get('pulado', 0)} pulados, "
+        f"{checkpoint.get('falha', 0)} falhas ({len(checkpoint.get('falhas_ids') or [])} pendentes)"
+    )
+
+
+if __name__ == "__main__":
+    main()
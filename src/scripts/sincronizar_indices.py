@@ -0,0 +1,36 @@
+"""
+Sincroniza os índices do MongoDB com o registro de `database/indices.py`.
+
+Idempotente: só cria os índices que faltam e recria os que mudaram de
+opções. Índices fora do registro são listados e só são removidos com
+`--remover-obsoletos`.
+
+Uso (a partir de `src/`):
+    python -m scripts.sincronizar_indices [--remover-obsoletos]
+"""
+import argparse
+import sys
+
+from database import mongodb
+from database.indices import sincronizar_indices
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sincronização dos índices do MongoDB")
+    parser.add_argument("--remover-obsoletos", action="store_true", help="Remove índices fora do registro")
+    args = parser.parse_args()
+
+    if mongodb.db is None:
+        print("❌ Conexão com banco de dados não disponível")
+        sys.exit(1)
+
+    relatorio = sincronizar_indices(mongodb.collections_registradas(), remover_obsoletos=args.remover_obsoletos)
+    for collection, r in relatorio.items():
+        print(
+            f"🗂️ {collection}: {len(r['criados'])} criados, {len(r['recriados'])} recriados, "
+            f"{len(r['removidos'])} removidos, obsoletos: {', '.join(r['obsoletos']) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,18 @@
 """
 Lida com a lógica de criar e autenticar usuários.
-Versão SÍNCRONA para funcionar com mongodb.py
+Versão SÍNCRONA para funcionar com mongodb.py; as funções *_async usam o
+repositório assíncrono (Motor) e são as chamadas pelas rotas.
 """
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime, timezone
 
 # Importa o serviço de segurança
 from services.security import hash_password, verify_password
 # Importa a coleção SÍNCRONA do seu arquivo mongodb.py
-from database.mongodb import usuarios_collection
+from database import mongodb
+# Repositório assíncrono (Motor) usado pelas versões *_async das rotas
+from repositories.usuario_repository import usuario_repo
 # Importa o "contrato" do seu 'models/user.py'
 from models.user import UserCreate
 
@@ -21,9 +25,9 @@ def get_user_by_email_raw(email: str):
 
     Use esta função quando for necessário verificar a senha.
     """
-    if usuarios_collection is None:
+    if mongodb.usuarios_collection is None:
         raise HTTPException(status_code=503, detail="Conexão com banco de dados não disponível")
-    return usuarios_collection.find_one({"email": email})
+    return mongodb.usuarios_collection.find_one({"email": email})
 
 
 def get_user_by_email(email: str, safe: bool = True):
@@ -37,7 +41,7 @@ def get_user_by_email(email: str, safe: bool = True):
 
 def create_user(user_data: UserCreate) -> dict:
     """Cria um novo usuário no banco de dados (síncrono)."""
-    if usuarios_collection is None:
+    if mongodb.usuarios_collection is None:
         raise HTTPException(status_code=503, detail="Conexão com banco de dados não disponível")
 
     existing_user = get_user_by_email_raw(user_data.email)
@@ -54,15 +58,15 @@ def create_user(user_data: UserCreate) -> dict:
     del new_user_data["senha"]  # NUNCA salve a senha em texto puro
     new_user_data["created_at"] = datetime.now(timezone.utc)
 
-    result = usuarios_collection.insert_one(new_user_data)
-    created_user = usuarios_collection.find_one({"_id": result.inserted_id})
+    result = mongodb.usuarios_collection.insert_one(new_user_data)
+    created_user = mongodb.usuarios_collection.find_one({"_id": result.inserted_id})
 
     return normalize_user(created_user, safe=True)
 
 
 def authenticate(email: str, senha: str):
     """Autentica um usuário e retorna a versão safe do documento se válido."""
-    if usuarios_collection is None:
+    if mongodb.usuarios_collection is None:
         return None
 
     user_raw = get_user_by_email_raw(email)
@@ -76,14 +80,14 @@ def authenticate(email: str, senha: str):
 
 
 def update_token(email:str, token: str):
-    usuarios_collection.update_one({"email": email}, {"$set": {"token": token}})
+    mongodb.usuarios_collection.update_one({"email": email}, {"$set": {"token": token}})
 
 def update_user_password(email: str, senha: str, token: str):
-    if usuarios_collection is None:
+    if mongodb.usuarios_collection is None:
         return None
-    if usuarios_collection.find_one({"email": email, "token": token}):
+    if mongodb.usuarios_collection.find_one({"email": email, "token": token}):
         senha_nova = (senha)
-        usuarios_collection.update_one(
+        mongodb.usuarios_collection.update_one(
             {"email": email}, {"$set": {"senha_hash": senha_nova}, "$unset": {"token": token}}
         )
         return "Senha alterada com sucesso"
@@ -92,3 +96,67 @@ def update_user_password(email: str, senha: str, token: str):
 # Backwards compatibility: antiga função ainda disponível
 # note: removed legacy `authenticate_user` wrapper; use `authenticate` directly
 
+
+# --- Versões ASSÍNCRONAS (Motor) usadas pelas rotas ---
+# O hash/verificação de senha (PBKDF2) usa CPU: roda no threadpool para
+# não travar o event loop.
+
+async def _exigir_banco() -> None:
+    if not await usuario_repo.disponivel():
+        raise HTTPException(status_code=503, detail="Conexão com banco de dados não disponível")
+
+
+async def get_user_by_email_raw_async(email: str):
+    await _exigir_banco()
+    return await usuario_repo.buscar_por_email(email)
+
+
+async def get_user_by_email_async(email: str, safe: bool = True):
+    raw = await get_user_by_email_raw_async(email)
+    return normalize_user(raw, safe=safe)
+
+
+async def create_user_async(user_data: UserCreate) -> dict:
+    await _exigir_banco()
+    if await usuario_repo.buscar_por_email(user_data.email, {"_id": 1}):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Este email já está cadastrado.",
+        )
+
+    new_user_data = user_data.model_dump()
+    new_user_data["hashed_password"] = await run_in_threadpool(hash_password, user_data.senha)
+    del new_user_data["senha"]  # NUNCA salve a senha em texto puro
+    new_user_data["created_at"] = datetime.now(timezone.utc)
+
+    new_user_data["_id"] = await usuario_repo.insert_one(new_user_data)
+    return normalize_user(new_user_data, safe=True)
+
+
+async def authenticate_async(email: str, senha: str):
+    if not await usuario_repo.disponivel():
+        return None
+
+    user_raw = await usuario_repo.buscar_por_email(email)
+    if not user_raw:
+        return None
+
+    if not await run_in_threadpool(verify_password, senha, user_raw.get("hashed_password", "")):
+        return None
+
+    return normalize_user(user_raw, safe=True)
+
+
+async def update_token_async(email: str, token: str) -> None:
+    await usuario_repo.atualizar_por_email(email, {"$set": {"token": token}})
+
+
+async def update_user_password_async(email: str, senha: str, token: str):
+    if not await usuario_repo.disponivel():
+        return None
+    if await usuario_repo.existe_com_token(email, token):
+        await usuario_repo.atualizar_por_email(
+            email, {"$set": {"senha_hash": senha}, "$unset": {"token": token}}
+        )
+        return "Senha alterada com sucesso"
+    return "Não foi possivel alterar a senha"
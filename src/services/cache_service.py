@@ -0,0 +1,184 @@
+"""
+Cache de respostas do Gemini.
+
+As respostas são indexadas por um hash de (modelo, instrução do sistema,
+prompt do usuário normalizado). Há dois backends:
+
+- `MemoryCacheBackend`: LRU em memória do processo, com TTL;
+- `MongoCacheBackend`: collection do MongoDB com índice TTL em `expira_em`,
+  compartilhada entre workers.
+
+O backend é escolhido por `settings.GEMINI_CACHE_BACKEND` ("memory",
+"mongo" ou "off").
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from config.settings import settings
+from utils.metrics import registry
+
+cache_hits = registry.counter("gemini_cache_hits_total", "Respostas do Gemini servidas pelo cache")
+cache_misses = registry.counter("gemini_cache_misses_total", "Consultas ao cache sem resposta válida")
+
+
+def normalizar_prompt(texto: str) -> str:
+    """Remove espaços nas pontas e colapsa espaços/quebras repetidos."""
+    return " ".join((texto or "").split())
+
+
+def gerar_chave(model_name: str, system_instruction: str, prompt_usuario: str) -> str:
+    """Hash SHA-256 de (modelo, instrução do sistema, prompt normalizado)."""
+    h = hashlib.sha256()
+    for parte in (model_name, system_instruction, normalizar_prompt(prompt_usuario)):
+        h.update((parte or "").encode("utf-8"))
+        # separador para que ("ab", "c") e ("a", "bc") não colidam
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class MemoryCacheBackend:
+    """LRU em memória com expiração por TTL (thread-safe)."""
+
+    bloqueante = False
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._dados: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, chave: str) -> Optional[str]:
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em <= time.monotonic():
+                del self._dados[chave]
+                return None
+            self._dados.move_to_end(chave)
+            return valor
+
+    def set(self, chave: str, valor: str) -> None:
+        with self._lock:
+            self._dados[chave] = (valor, time.monotonic() + self.ttl_seconds)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entries:
+                self._dados.popitem(last=False)
+
+    def delete(self, chave: str) -> None:
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+
+class MongoCacheBackend:
+    """Cache numa collection do MongoDB com índice TTL.
+
+    O índice TTL (declarado em `database/indices.py`) remove os documentos
+    expirados em segundo plano; como o monitor do Mongo roda apenas a cada
+    ~60s, o `get` também filtra por `expira_em` para nunca devolver uma
+    entrada vencida.
+    """
+
+    bloqueante = True
+
+    def __init__(self, collection=None, ttl_seconds: int = 3600) -> None:
+        self._collection = collection
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from database import mongodb
+
+            if mongodb.db is None:
+                return None
+            self._collection = mongodb.db[settings.GEMINI_CACHE_COLLECTION]
+        return self._collection
+
+    def get(self, chave: str) -> Optional[str]:
+        collection = self.collection
+        if collection is None:
+            return None
+        doc = collection.find_one({"_id": chave, "expira_em": {"$gt": datetime.utcnow()}})
+        return doc.get("resposta") if doc else None
+
+    def set(self, chave: str, valor: str) -> None:
+        collection = self.collection
+        if collection is None:
+            return
+        collection.update_one(
+            {"_id": chave},
+            {"$set": {
+                "resposta": valor,
+                "expira_em": datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+            }},
+            upsert=True,
+        )
+
+    def clear(self) -> None:
+        collection = self.collection
+        if collection is not None:
+            collection.delete_many({})
+
+
+class CompletionCache:
+    """Fachada usada pelo `gemini_service`: monta a chave e conta hits/misses.
+
+    Falhas do backend nunca propagam — o cache é uma otimização, então um
+    erro apenas conta como miss (ou descarta a escrita).
+    """
+
+    def __init__(self, backend) -> None:
+        self.backend = backend
+
+    @property
+    def bloqueante(self) -> bool:
+        return getattr(self.backend, "bloqueante", False)
+
+    def get(self, model_name: str, system_instruction: str, prompt_usuario: str) -> Optional[str]:
+        try:
+            valor = self.backend.get(gerar_chave(model_name, system_instruction, prompt_usuario))
+        except Exception as e:
+            print(f"Erro ao ler cache do Gemini: {e}")
+            valor = None
+        if valor is None:
+            cache_misses.inc()
+        else:
+            cache_hits.inc()
+        return valor
+
+    def set(self, model_name: str, system_instruction: str, prompt_usuario: str, resposta: str) -> None:
+        try:
+            self.backend.set(gerar_chave(model_name, system_instruction, prompt_usuario), resposta)
+        except Exception as e:
+            print(f"Erro ao gravar cache do Gemini: {e}")
+
+    def estatisticas(self) -> dict:
+        hits, misses = cache_hits.value(), cache_misses.value()
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_ratio": (hits / total) if total else 0.0}
+
+
+def criar_cache_padrao() -> Optional[CompletionCache]:
+    """Cria o cache conforme as configurações (None se desabilitado)."""
+    backend_nome = (settings.GEMINI_CACHE_BACKEND or "off").lower()
+    if backend_nome == "memory":
+        return CompletionCache(MemoryCacheBackend(
+            max_entries=settings.GEMINI_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.GEMINI_CACHE_TTL_SECONDS,
+        ))
+    if backend_nome == "mongo":
+        return CompletionCache(MongoCacheBackend(ttl_seconds=settings.GEMINI_CACHE_TTL_SECONDS))
+    return None
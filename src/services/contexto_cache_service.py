@@ -0,0 +1,181 @@
+"""
+Cache de contexto do Gemini para as instruções de sistema.
+
+`SYSTEM_INSTRUCTION_PLANO` tem alguns milhares de caracteres e, enviada
+inline, é cobrada como tokens de entrada em toda requisição. Com o cache de
+contexto do provedor (`genai.caching.CachedContent`) a instrução é
+registrada uma vez e as requisições referenciam o handle, que:
+
+- é reaproveitado enquanto estiver válido;
+- é renovado (`update(ttl=...)`) quando falta menos de `margem_seconds`
+  para expirar;
+- pode ser descartado quando o provedor diz que ele não existe mais.
+
+Se o provedor recusar o cache (instrução curta demais, modelo sem suporte,
+SDK antigo...), `obter` devolve None por `espera_falha_seconds` e o
+chamador usa a instrução inline, como antes.
+"""
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, Set, Tuple
+
+from utils.metrics import registry as metrics
+
+eventos_contexto = metrics.counter(
+    "gemini_context_cache_total", "Eventos do cache de contexto das instruções de sistema"
+)
+
+
+class _Entrada:
+    __slots__ = ("handle", "expira_em")
+
+    def __init__(self, handle, expira_em: float) -> None:
+        self.handle = handle
+        self.expira_em = expira_em
+
+
+class ContextoCache:
+    """Um handle de `CachedContent` por (modelo, instrução), renovado antes do TTL.
+
+    As chamadas ao provedor (`create`/`update`/`delete`) acontecem fora do
+    lock, que só protege a troca do handle. Enquanto uma thread cria ou
+    renova o handle de uma chave, as demais usam o handle atual (ainda
+    válido dentro da margem) ou a instrução inline, sem esperar.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = 3600,
+        margem_seconds: int = 300,
+        espera_falha_seconds: int = 600,
+        relogio: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        # A margem nunca consome o TTL inteiro (senão renovaria a cada chamada)
+        self.margem_seconds = min(margem_seconds, ttl_seconds / 2)
+        self.espera_falha_seconds = espera_falha_seconds
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._entradas: Dict[Tuple[str, str], _Entrada] = {}
+        self._falhas: Dict[Tuple[str, str], float] = {}
+        self._em_andamento: Set[Tuple[str, str]] = set()
+        # Incrementada por `limpar`: handles criados antes dela são apagados, não guardados
+        self._geracao = 0
+
+    def _valido(self, chave: Tuple[str, str], agora: float):
+        # Chamado com o lock adquirido
+        entrada = self._entradas.get(chave)
+        if entrada is not None and agora < entrada.expira_em - self.margem_seconds:
+            eventos_contexto.inc(evento="reutilizado")
+            return entrada.handle
+        return None
+
+    def obter(self, genai_modulo, model_name: str, system_instruction: str):
+        """Retorna o handle válido para a instrução, ou None para usar a instrução inline.
+
+        Pode fazer uma chamada remota (criar/renovar o handle); em código
+        assíncrono use `obter_async`.
+        """
+        caching = getattr(genai_modulo, "caching", None)
+        if caching is None:
+            return None
+
+        chave = (model_name, system_instruction)
+        with self._lock:
+            agora = self._relogio()
+            handle = self._valido(chave, agora)
+            if handle is not None:
+                return handle
+
+            entrada = self._entradas.get(chave)
+            if entrada is None and self._falhas.get(chave, 0) > agora:
+                return None
+            if chave in self._em_andamento:
+                # Outra thread já cria/renova o handle desta chave
+                return entrada.handle if entrada is not None and agora < entrada.expira_em else None
+            self._em_andamento.add(chave)
+            geracao = self._geracao
+
+        try:
+            if entrada is not None and self._renovar(entrada):
+                return entrada.handle
+            return self._criar(caching, chave, geracao)
+        finally:
+            with self._lock:
+                self._em_andamento.discard(chave)
+
+    async def obter_async(self, genai_modulo, model_name: str, system_instruction: str):
+        """`obter` sem bloquear o event loop: criação/renovação rodam numa thread."""
+        if getattr(genai_modulo, "caching", None) is None:
+            return None
+        with self._lock:
+            handle = self._valido((model_name, system_instruction), self._relogio())
+        if handle is not None:
+            return handle
+        return await asyncio.to_thread(self.obter, genai_modulo, model_name, system_instruction)
+
+    def _renovar(self, entrada: _Entrada) -> bool:
+        try:
+            entrada.handle.update(ttl=timedelta(seconds=self.ttl_seconds))
+        except Exception as e:
+            print(f"⚠️ Falha ao renovar cache de contexto do Gemini: {e}")
+            return False
+        with self._lock:
+            entrada.expira_em = self._relogio() + self.ttl_seconds
+        eventos_contexto.inc(evento="renovado")
+        return True
+
+    def _criar(self, caching, chave: Tuple[str, str], geracao: int):
+        model_name, system_instruction = chave
+        try:
+            handle = caching.CachedContent.create(
+                model=model_name,
+                display_name="personalia-system-instruction",
+                system_instruction=system_instruction,
+                ttl=timedelta(seconds=self.ttl_seconds),
+            )
+        except Exception as e:
+            print(f"⚠️ Cache de contexto do Gemini indisponível, usando instrução inline: {e}")
+            with self._lock:
+                self._entradas.pop(chave, None)
+                self._falhas[chave] = self._relogio() + self.espera_falha_seconds
+            eventos_contexto.inc(evento="falha")
+            return None
+
+        with self._lock:
+            atual = geracao == self._geracao
+            if atual:
+                self._falhas.pop(chave, None)
+                self._entradas[chave] = _Entrada(handle, self._relogio() + self.ttl_seconds)
+        if not atual:
+            # `limpar` rodou durante a criação (ex: troca de API key): não guarda o handle
+            self._apagar(handle)
+            return None
+        eventos_contexto.inc(evento="criado")
+        return handle
+
+    def _apagar(self, handle) -> None:
+        try:
+            handle.delete()
+        except Exception as e:
+            print(f"⚠️ Falha ao apagar cache de contexto do Gemini: {e}")
+
+    def descartar(self, model_name: str, system_instruction: str) -> bool:
+        """Esquece o handle (ex: o provedor respondeu 404). True se havia um."""
+        with self._lock:
+            descartado = self._entradas.pop((model_name, system_instruction), None) is not None
+        if descartado:
+            eventos_contexto.inc(evento="descartado")
+        return descartado
+
+    def limpar(self) -> None:
+        """Apaga os handles no provedor (usado no shutdown) e esvazia o cache."""
+        with self._lock:
+            entradas = list(self._entradas.values())
+            self._entradas.clear()
+            self._falhas.clear()
+            self._geracao += 1
+        for entrada in entradas:
+            self._apagar(entrada.handle)
@@ -0,0 +1,116 @@
+"""
+Cache em processo do contexto do usuário usado na geração de planos.
+
+O contexto reúne o perfil (`auth_service.get_user_by_email`), o resumo do
+histórico (`historico_service.obter_resumo_historico`) e o bloco de perfil
+já montado para o prompt. Ele é pré-carregado no login
+(`gemini_service.registrar_contexto_usuario`), de modo que o primeiro
+`POST /treinos/` depois do login não precisa consultar o MongoDB.
+
+As entradas expiram após `CONTEXTO_USUARIO_TTL_SECONDS` e são invalidadas
+quando um treino novo é salvo (o resumo do histórico muda). A invalidação
+vale só para o processo que salvou: com várias réplicas da API, as outras
+podem servir o resumo antigo até o TTL vencer.
+"""
+from typing import Optional, Tuple
+
+from config.settings import settings
+from services.cache_service import MemoryCacheBackend
+from utils.metrics import registry as metrics
+
+contexto_hits = metrics.counter("contexto_usuario_hits_total", "Contextos de usuário servidos pelo cache")
+contexto_misses = metrics.counter("contexto_usuario_misses_total", "Contextos de usuário carregados do banco")
+
+# None quando desativado (padrão nos testes, como o cache de respostas)
+contextos: Optional[MemoryCacheBackend] = (
+    MemoryCacheBackend(
+        max_entries=settings.CONTEXTO_USUARIO_MAX_ENTRIES,
+        ttl_seconds=settings.CONTEXTO_USUARIO_TTL_SECONDS,
+    ) if settings.CONTEXTO_USUARIO_CACHE else None
+)
+
+
+def _carregar(email: str) -> Tuple[Optional[dict], bool]:
+    """Lê o contexto do banco. Retorna (contexto, completo)."""
+    # Imports tardios: evitam ciclos (historico_service -> treino_service -> gemini_service)
+    from services import auth_service, historico_service
+
+    user = auth_service.get_user_by_email(email)
+    if not user:
+        return None, False
+
+    # O histórico só enriquece o prompt: sem ele a geração continua
+    completo = True
+    try:
+        historico = historico_service.obter_resumo_historico(user)
+    except Exception as e:
+        print(f"Erro ao obter resumo do histórico: {e}")
+        historico, completo = "", False
+
+    return _montar_contexto(user, historico), completo
+
+
+async def _carregar_async(email: str) -> Tuple[Optional[dict], bool]:
+    """Versão assíncrona de `_carregar` (repositório Motor)."""
+    from services import auth_service, historico_service
+
+    user = await auth_service.get_user_by_email_async(email)
+    if not user:
+        return None, False
+
+    completo = True
+    try:
+        historico = await historico_service.obter_resumo_historico_async(user)
+    except Exception as e:
+        print(f"Erro ao obter resumo do histórico: {e}")
+        historico, completo = "", False
+    return _montar_contexto(user, historico), completo
+
+
+def _montar_contexto(user: dict, historico: str) -> dict:
+    from services import gemini_service
+
+    return {
+        "user": user,
+        "historico": historico,
+        "bloco": gemini_service.montar_bloco_usuario(user),
+    }
+
+
+def aquecer(email: str) -> Optional[dict]:
+    """Carrega o contexto do banco e o guarda no cache (usado no login)."""
+    contexto, completo = _carregar(email)
+    if completo and contextos is not None:
+        contextos.set(email, contexto)
+    return contexto
+
+
+def obter(email: str) -> Optional[dict]:
+    """Contexto do usuário (cache ou banco). None se o usuário não existe."""
+    if contextos is not None:
+        contexto = contextos.get(email)
+        if contexto is not None:
+            contexto_hits.inc()
+            return contexto
+    contexto_misses.inc()
+    return aquecer(email)
+
+
+async def obter_async(email: str) -> Optional[dict]:
+    """Versão ASSÍNCRONA de `obter`, usada pelas rotas (sem threadpool)."""
+    if contextos is not None:
+        contexto = contextos.get(email)
+        if contexto is not None:
+            contexto_hits.inc()
+            return contexto
+    contexto_misses.inc()
+    contexto, completo = await _carregar_async(email)
+    if completo and contextos is not None:
+        contextos.set(email, contexto)
+    return contexto
+
+
+def invalidar(email: Optional[str]) -> None:
+    """Descarta o contexto (ex: novo treino salvo altera o resumo do histórico)."""
+    if contextos is not None and email:
+        contextos.delete(email)
@@ -0,0 +1,380 @@
+"""
+Backend local que imita o SDK `google.generativeai` para testes de carga.
+
+Com `GEMINI_BACKEND=fake`, o `gemini_service` usa este módulo no lugar do
+SDK real: nenhuma cota do Gemini é consumida, mas todo o caminho da
+aplicação (limitador, retentativas, cache, streaming, cache de contexto)
+é exercitado com um comportamento parecido com o de produção:
+
+- latência até o primeiro token com distribuição log-normal (mediana e p99);
+- geração a `tokens_por_segundo`, inclusive no streaming;
+- erros 429/500 com as mesmas exceções do `google.api_core`;
+- planos prontos no formato "Plano de Treino: ..." e respostas curtas de chat;
+- `usage_metadata` com contagem (estimada) de tokens.
+
+Implementa a superfície usada pela aplicação: `configure`, `list_models`,
+`GenerativeModel` (`generate_content`, `generate_content_async`,
+`from_cached_content`) e `caching.CachedContent`.
+"""
+import asyncio
+import hashlib
+import math
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except Exception:
+    google_exceptions = None
+
+
+class FakeAPIError(Exception):
+    """Usada quando o `google.api_core` não está instalado."""
+
+    def __init__(self, message: str, code: int) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+MODELOS = ("models/gemini-2.5-flash-lite", "models/gemini-2.5-flash", "models/gemini-2.5-pro")
+
+PLANOS_PRONTOS = (
+    """Plano de Treino: Full Body Iniciante
+
+Alongamento: 5 minutos de mobilidade articular antes e depois do treino.
+
+1. Agachamento livre
+Foco: Quadríceps e glúteos
+Execução: 3 séries de 12 repetições (descanso de 60s)
+Execução Segura:
+    Dica 1: Mantenha os joelhos alinhados com a ponta dos pés.
+    Dica 2: Mantenha a coluna neutra durante todo o movimento.
+Alternativas:
+    Mais fácil: Agachamento na cadeira.
+    Mais difícil: Agachamento com salto.
+
+2. Flexão de braço
+Foco: Peito, ombros e tríceps
+Execução: 3 séries de 10 repetições (descanso de 60s)
+Execução Segura:
+    Dica 1: Mantenha o abdômen contraído para estabilizar a coluna.
+    Dica 2: Evite prender a respiração durante o movimento.
+Alternativas:
+    Mais fácil: Flexão com joelhos apoiados.
+    Mais difícil: Flexão declinada com os pés na cadeira.
+
+3. Remada com mochila
+Foco: Costas e bíceps
+Execução: 3 séries de 12 repetições (descanso de 60s)
+
+4. Afundo alternado
+Foco: Quadríceps, posterior de coxa e glúteos
+Execução: 3 séries de 10 repetições por perna
+
+5. Elevação de quadril
+Foco: Glúteos e lombar
+Execução: 3 séries de 15 repetições
+
+6. Prancha
+Foco: Abdômen e lombar
+Execução: 3 séries de 30 segundos
+""",
+    """Plano de Treino: Hipertrofia Academia
+
+Alongamento: aquecimento de 10 minutos na esteira e alongamento ao final.
+
+1. Supino reto com barra
+Foco: Peito e tríceps
+Execução: 4 séries de 8 a 10 repetições (descanso de 90s)
+
+2. Puxada frontal
+Foco: Costas e bíceps
+Execução: 4 séries de 10 repetições (descanso de 90s)
+
+3. Leg press 45°
+Foco: Quadríceps e glúteos
+Execução: 4 séries de 12 repetições
+
+4. Desenvolvimento com halteres
+Foco: Ombros
+Execução: 3 séries de 10 repetições
+
+5. Mesa flexora
+Foco: Posterior de coxa
+Execução: 3 séries de 12 repetições
+
+6. Panturrilha no smith
+Foco: Panturrilhas
+Execução: 4 séries de 15 repetições
+
+Atenção à postura em todos os exercícios e descanse entre as séries.
+""",
+)
+
+RESPOSTAS_CHAT = (
+    "Mantenha a **coluna neutra**, desça controlando o movimento e **expire na subida**. "
+    "Comece com pouca carga até dominar a execução.",
+    "Uma boa **alternativa** é fazer a versão com o peso do corpo, priorizando a **amplitude** "
+    "e o **controle** do movimento.",
+)
+
+
+def estimar_tokens(texto: str) -> int:
+    """~4 caracteres por token (mesma estimativa do historico_service)."""
+    return max(1, len(texto or "") // 4)
+
+
+class PerfilFake:
+    """Parâmetros de comportamento do backend fake."""
+
+    def __init__(
+        self,
+        latencia_mediana_ms: float = 800,
+        latencia_p99_ms: float = 4000,
+        tokens_por_segundo: float = 80,
+        taxa_429: float = 0.0,
+        taxa_500: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latencia_mediana_ms = latencia_mediana_ms
+        self.latencia_p99_ms = max(latencia_p99_ms, latencia_mediana_ms)
+        self.tokens_por_segundo = tokens_por_segundo
+        self.taxa_429 = taxa_429
+        self.taxa_500 = taxa_500
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def de_settings(cls, settings) -> "PerfilFake":
+        return cls(
+            latencia_mediana_ms=settings.FAKE_GEMINI_LATENCIA_MEDIANA_MS,
+            latencia_p99_ms=settings.FAKE_GEMINI_LATENCIA_P99_MS,
+            tokens_por_segundo=settings.FAKE_GEMINI_TOKENS_POR_SEGUNDO,
+            taxa_429=settings.FAKE_GEMINI_TAXA_429,
+            taxa_500=settings.FAKE_GEMINI_TAXA_500,
+            seed=settings.FAKE_GEMINI_SEED,
+        )
+
+    def latencia(self) -> float:
+        """Tempo até o primeiro token, em segundos (log-normal por mediana/p99)."""
+        if self.latencia_mediana_ms <= 0:
+            return 0.0
+        # p99 = mediana * exp(2.326 * sigma)
+        sigma = math.log(self.latencia_p99_ms / self.latencia_mediana_ms) / 2.326
+        return self._rng.lognormvariate(math.log(self.latencia_mediana_ms), sigma) / 1000
+
+    def tempo_de_geracao(self, tokens: int) -> float:
+        if self.tokens_por_segundo <= 0:
+            return 0.0
+        return tokens / self.tokens_por_segundo
+
+    def sortear_erro(self) -> Optional[int]:
+        sorteio = self._rng.random()
+        if sorteio < self.taxa_429:
+            return 429
+        if sorteio < self.taxa_429 + self.taxa_500:
+            return 500
+        return None
+
+
+def _erro(codigo: int, mensagem: str) -> Exception:
+    if google_exceptions is not None:
+        classe = {
+            404: google_exceptions.NotFound,
+            429: google_exceptions.ResourceExhausted,
+            500: google_exceptions.InternalServerError,
+        }[codigo]
+        return classe(mensagem)
+    return FakeAPIError(mensagem, codigo)
+
+
+def _resposta_pronta(system_instruction: str, prompt: str) -> str:
+    # Determinística por prompt: a mesma pergunta recebe a mesma resposta
+    indice = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    if "Plano de Treino:" in (system_instruction or ""):
+        return PLANOS_PRONTOS[indice % len(PLANOS_PRONTOS)]
+    return RESPOSTAS_CHAT[indice % len(RESPOSTAS_CHAT)]
+
+
+def _fatiar(texto: str, tokens_por_trecho: int = 16) -> List[str]:
+    tamanho = tokens_por_trecho * 4
+    return [texto[i:i + tamanho] for i in range(0, len(texto), tamanho)]
+
+
+class _Resposta:
+    def __init__(self, text: str, usage_metadata) -> None:
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class _StreamAsync:
+    """Imita o `AsyncGenerateContentResponse` com `stream=True`."""
+
+    def __init__(self, trechos: List[str], intervalo: float, usage_metadata) -> None:
+        self._trechos = trechos
+        self._intervalo = intervalo
+        self.usage_metadata = usage_metadata
+
+    async def __aiter__(self):
+        for i, trecho in enumerate(self._trechos):
+            if i:
+                await asyncio.sleep(self._intervalo)
+            yield SimpleNamespace(text=trecho)
+
+
+class FakeGenerativeModel:
+    """`GenerativeModel` do backend fake (subclasse criada por `FakeGemini`)."""
+
+    _backend: "FakeGemini" = None
+
+    def __init__(self, model_name: str = "gemini-2.5-flash-lite", system_instruction=None, **kwargs) -> None:
+        self.model_name = model_name
+        self._system_instruction = system_instruction or ""
+        self._cached_content = None
+
+    @classmethod
+    def from_cached_content(cls, cached_content, **kwargs) -> "FakeGenerativeModel":
+        model = cls(model_name=cached_content.model, system_instruction=cached_content.system_instruction)
+        model._cached_content = cached_content
+        return model
+
+    # --- comportamento comum -----------------------------------------------
+
+    def _preparar(self, prompt: str):
+        """Sorteia erro/latência e monta o texto e o usage_metadata da resposta."""
+        backend = self._backend
+        backend._contar("generate_content")
+        if self._cached_content is not None and not backend.caching.existe(self._cached_content.name):
+            return _erro(404, f"CachedContent not found: {self._cached_content.name}"), 0.0, None, None
+
+        perfil = backend.perfil
+        codigo = perfil.sortear_erro()
+        if codigo == 429:
+            # Throttling responde rápido
+            return _erro(429, "Resource has been exhausted (fake)"), perfil.latencia() / 10, None, None
+        if codigo == 500:
+            return _erro(500, "Internal error encountered (fake)"), perfil.latencia(), None, None
+
+        texto = _resposta_pronta(self._system_instruction, prompt)
+        tokens_instrucao = estimar_tokens(self._system_instruction)
+        usage = SimpleNamespace(
+            prompt_token_count=tokens_instrucao + estimar_tokens(prompt),
+            cached_content_token_count=tokens_instrucao if self._cached_content is not None else 0,
+            candidates_token_count=estimar_tokens(texto),
+        )
+        usage.total_token_count = usage.prompt_token_count + usage.candidates_token_count
+        return None, perfil.latencia(), texto, usage
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        erro, espera, texto, usage = self._preparar(prompt)
+        time.sleep(espera)
+        if erro is not None:
+            raise erro
+        trechos = _fatiar(texto)
+        intervalo = self._backend.perfil.tempo_de_geracao(estimar_tokens(texto)) / len(trechos)
+        if stream:
+            def gerar():
+                for i, trecho in enumerate(trechos):
+                    if i:
+                        time.sleep(intervalo)
+                    yield SimpleNamespace(text=trecho)
+            return gerar()
+        time.sleep(intervalo * len(trechos))
+        return _Resposta(texto, usage)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        erro, espera, texto, usage = self._preparar(prompt)
+        await asyncio.sleep(espera)
+        if erro is not None:
+            raise erro
+        trechos = _fatiar(texto)
+        intervalo = self._backend.perfil.tempo_de_geracao(estimar_tokens(texto)) / len(trechos)
+        if stream:
+            return _StreamAsync(trechos, intervalo, usage)
+        await asyncio.sleep(intervalo * len(trechos))
+        return _Resposta(texto, usage)
+
+
+class FakeCachedContent:
+    """`caching.CachedContent` do backend fake (subclasse criada por `FakeCaching`)."""
+
+    _caching: "FakeCaching" = None
+
+    def __init__(self, name: str, model: str, system_instruction: str, ttl) -> None:
+        self.name = name
+        self.model = model
+        self.system_instruction = system_instruction
+        self.ttl = ttl
+
+    @classmethod
+    def create(cls, model: str, display_name=None, system_instruction=None, ttl=None, **kwargs):
+        return cls._caching._criar(cls, model, system_instruction, ttl)
+
+    def update(self, ttl=None, **kwargs) -> None:
+        if not self._caching.existe(self.name):
+            raise _erro(404, f"CachedContent not found: {self.name}")
+        self.ttl = ttl
+
+    def delete(self) -> None:
+        self._caching._apagar(self.name)
+
+
+class FakeCaching:
+    """Imita o módulo `genai.caching` guardando os handles em memória."""
+
+    def __init__(self, min_tokens: int = 0) -> None:
+        self.min_tokens = min_tokens
+        self._lock = threading.Lock()
+        self._handles: Dict[str, FakeCachedContent] = {}
+        self._sequencia = 0
+        self.CachedContent = type("CachedContent", (FakeCachedContent,), {"_caching": self})
+
+    def _criar(self, classe, model, system_instruction, ttl):
+        if estimar_tokens(system_instruction) < self.min_tokens:
+            raise ValueError(f"Cached content is too small. min_total_token_count={self.min_tokens}")
+        with self._lock:
+            self._sequencia += 1
+            handle = classe(f"cachedContents/fake-{self._sequencia}", model, system_instruction, ttl)
+            self._handles[handle.name] = handle
+        return handle
+
+    def _apagar(self, name: str) -> None:
+        with self._lock:
+            self._handles.pop(name, None)
+
+    def existe(self, name: str) -> bool:
+        return name in self._handles
+
+
+class FakeGemini:
+    """Objeto com a mesma interface do módulo `google.generativeai`."""
+
+    def __init__(self, perfil: Optional[PerfilFake] = None, min_tokens_cache: int = 0) -> None:
+        self.perfil = perfil or PerfilFake(latencia_mediana_ms=0, tokens_por_segundo=0)
+        self.caching = FakeCaching(min_tokens=min_tokens_cache)
+        self.GenerativeModel = type("GenerativeModel", (FakeGenerativeModel,), {"_backend": self})
+        self.chamadas: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.api_key: Optional[str] = None
+
+    def _contar(self, metodo: str) -> None:
+        with self._lock:
+            self.chamadas[metodo] = self.chamadas.get(metodo, 0) + 1
+
+    def configure(self, api_key: Optional[str] = None, **kwargs) -> None:
+        self.api_key = api_key
+
+    def list_models(self):
+        self._contar("list_models")
+        return [
+            SimpleNamespace(name=nome, supported_generation_methods=["generateContent", "createCachedContent"])
+            for nome in MODELOS
+        ]
+
+
+def criar_backend(settings) -> FakeGemini:
+    """Cria o backend fake com o perfil definido nas configurações."""
+    print("🧪 Usando backend FAKE do Gemini (GEMINI_BACKEND=fake)")
+    return FakeGemini(PerfilFake.de_settings(settings))
@@ -1,3 +1,5 @@
+import asyncio
+
 try:
     import google.generativeai as genai
 except Exception:
@@ -5,10 +7,32 @@ except Exception:
     # definimos `genai = None` e os testes podem mockar `services.gemini_service.genai`.
     genai = None
 
+try:
+    from google.api_core import exceptions as google_exceptions
+except Exception:
+    google_exceptions = None
+
 # Importa as configurações (seu main.py também usa)
 from config.settings import settings
 from models.schemas import MensagemChat
-from typing import Optional
+from services import cache_service
+from services.contexto_cache_service import ContextoCache
+from services import intent_router
+from services import uso_service
+from utils.circuit_breaker import ABERTO, FECHADO, CircuitBreaker
+from utils.hedging import Hedge
+from utils.limiter import AdaptiveLimiter, LimiteExcedido
+from utils.metrics import registry as metrics
+from utils.retry import executar_com_retry, executar_com_retry_async
+from utils.singleflight import AsyncSingleFlight, SingleFlight
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import threading
+import time
+
+# Stand-in local do SDK (GEMINI_BACKEND=fake): mesma interface, sem cota
+if settings.GEMINI_BACKEND == "fake":
+    from services import gemini_fake
+    genai = gemini_fake.criar_backend(settings)
 
 
 # --- NOVOS CONSTANTES DE INSTRUÇÃO ---
@@ -45,29 +69,494 @@ SYSTEM_INSTRUCTION_PLANO = (
 )
 # --- FIM NOVOS CONSTANTES DE INSTRUÇÃO ---
 
-def gerar_plano_de_treino(data: MensagemChat, user: Optional[dict] = None, historico: Optional[str] = None) -> str:
+class ModelRegistry:
+    """Mantém o SDK configurado e um `GenerativeModel` por (modelo, instrução).
+
+    `genai.configure` e a construção do `GenerativeModel` (cliente e
+    transporte) acontecem apenas na primeira chamada ou quando a API key
+    muda; as requisições seguintes reutilizam as mesmas instâncias.
+
+    Com `contexto` (cache de contexto do provedor), a instrução de sistema
+    é referenciada por um handle de `CachedContent` em vez de ser reenviada
+    a cada requisição; sem handle disponível, usa a instrução inline.
     """
-    Gera o texto do plano de treino ou responde a uma dúvida (SÍNCRONO).
+
+    def __init__(self, contexto: Optional[ContextoCache] = None) -> None:
+        self._lock = threading.Lock()
+        self._api_key: Optional[str] = None
+        self._genai = None
+        self._modelos: Dict[Tuple[str, str], object] = {}
+        # (modelo, instrução) -> (nome do handle, modelo criado a partir dele)
+        self._modelos_contexto: Dict[Tuple[str, str], Tuple[str, object]] = {}
+        self.contexto = contexto
+
+    def _configurar(self) -> bool:
+        # Chamado com o lock adquirido. Reconfigura se a chave mudou ou se o
+        # módulo do SDK foi trocado (ex: `genai` mockado nos testes). Retorna
+        # True se reconfigurou: os handles de contexto criados com a chave
+        # anterior devem ser apagados pelo chamador, fora do lock.
+        api_key = settings.GEMINI_API_KEY
+        if api_key != self._api_key or genai is not self._genai:
+            genai.configure(api_key=api_key)
+            self._api_key = api_key
+            self._genai = genai
+            self._modelos.clear()
+            self._modelos_contexto.clear()
+            return True
+        return False
+
+    def obter(self, model_name: str, system_instruction: str):
+        """Retorna o modelo para (model_name, system_instruction), criando-o se preciso.
+
+        Com cache de contexto, pode fazer chamadas remotas ao provedor; em
+        código assíncrono use `obter_async`.
+        """
+        with self._lock:
+            reconfigurado = self._configurar()
+
+        handle = None
+        if self.contexto is not None:
+            if reconfigurado:
+                self.contexto.limpar()
+            handle = self.contexto.obter(genai, model_name, system_instruction)
+        return self._modelo(model_name, system_instruction, handle)
+
+    async def obter_async(self, model_name: str, system_instruction: str):
+        """`obter` sem bloquear o event loop: as chamadas ao cache de contexto rodam numa thread."""
+        with self._lock:
+            reconfigurado = self._configurar()
+
+        handle = None
+        if self.contexto is not None:
+            if reconfigurado:
+                await asyncio.to_thread(self.contexto.limpar)
+            handle = await self.contexto.obter_async(genai, model_name, system_instruction)
+        return self._modelo(model_name, system_instruction, handle)
+
+    def _modelo(self, model_name: str, system_instruction: str, handle):
+        # Construção local (sem I/O): o modelo do handle de contexto, ou o da instrução inline
+        chave = (model_name, system_instruction)
+        with self._lock:
+            if handle is not None:
+                nome = getattr(handle, "name", None) or str(id(handle))
+                atual = self._modelos_contexto.get(chave)
+                if atual is None or atual[0] != nome:
+                    atual = (nome, genai.GenerativeModel.from_cached_content(handle))
+                    self._modelos_contexto[chave] = atual
+                return atual[1]
+
+            model = self._modelos.get(chave)
+            if model is None:
+                model = genai.GenerativeModel(model_name=model_name, system_instruction=system_instruction)
+                self._modelos[chave] = model
+            return model
+
+    def descartar_contexto(self, model_name: str, system_instruction: str) -> bool:
+        """Esquece o handle de contexto da instrução. True se havia um em uso."""
+        if self.contexto is None:
+            return False
+        with self._lock:
+            self._modelos_contexto.pop((model_name, system_instruction), None)
+        return self.contexto.descartar(model_name, system_instruction)
+
+    def aquecer(self) -> None:
+        """Configura o SDK e cria os modelos de chat e de plano (usado no startup)."""
+        if genai is None or not settings.GEMINI_API_KEY:
+            return
+        model_name = _resolver_modelo()
+        for instrucao in (SYSTEM_INSTRUCTION_BASE, SYSTEM_INSTRUCTION_PLANO):
+            self.obter(model_name, instrucao)
+        # Carrega a lista de modelos em segundo plano (usada nas mensagens de erro)
+        lista_de_modelos.obter()
+
+    def refresh(self) -> None:
+        """Descarta as instâncias; a próxima chamada reconfigura o SDK.
+
+        Use após trocar GEMINI_API_KEY ou GEMINI_MODEL em tempo de execução.
+        """
+        with self._lock:
+            self._api_key = None
+            self._genai = None
+            self._modelos.clear()
+            self._modelos_contexto.clear()
+
+
+# Cache de contexto das instruções (GEMINI_CONTEXT_CACHE=true). Lido uma vez:
+# os testes substituem `settings` por mocks.
+model_registry = ModelRegistry(
+    contexto=ContextoCache(
+        ttl_seconds=settings.GEMINI_CONTEXT_CACHE_TTL_SECONDS,
+        margem_seconds=settings.GEMINI_CONTEXT_CACHE_MARGEM_SECONDS,
+    ) if settings.GEMINI_CONTEXT_CACHE else None
+)
+
+# Cache de respostas (None quando GEMINI_CACHE_BACKEND="off")
+completion_cache = cache_service.criar_cache_padrao()
+
+
+def _cache_get(model_name: str, system_instruction: str, prompt_usuario: str) -> Optional[str]:
+    if completion_cache is None:
+        return None
+    return completion_cache.get(model_name, system_instruction, prompt_usuario)
+
+
+def _cache_set(model_name: str, system_instruction: str, prompt_usuario: str, resposta: str) -> None:
+    if completion_cache is not None and resposta:
+        completion_cache.set(model_name, system_instruction, prompt_usuario, resposta)
+
+
+async def _cache_get_async(model_name: str, system_instruction: str, prompt_usuario: str) -> Optional[str]:
+    # Backends bloqueantes (Mongo) são consultados fora do event loop
+    if completion_cache is not None and completion_cache.bloqueante:
+        return await asyncio.to_thread(_cache_get, model_name, system_instruction, prompt_usuario)
+    return _cache_get(model_name, system_instruction, prompt_usuario)
+
+
+async def _cache_set_async(model_name: str, system_instruction: str, prompt_usuario: str, resposta: str) -> None:
+    if completion_cache is not None and completion_cache.bloqueante:
+        await asyncio.to_thread(_cache_set, model_name, system_instruction, prompt_usuario, resposta)
+    else:
+        _cache_set(model_name, system_instruction, prompt_usuario, resposta)
+
+
+# Single-flight: chamadas idênticas concorrentes compartilham uma única
+# requisição ao Gemini (a chave é a mesma do cache de respostas).
+singleflight_coalescidas = metrics.counter(
+    "gemini_singleflight_coalesced_total",
+    "Chamadas ao Gemini que reaproveitaram uma requisição idêntica em andamento",
+)
+_singleflight = SingleFlight(singleflight_coalescidas, modo="sync")
+_singleflight_async = AsyncSingleFlight(singleflight_coalescidas, modo="async")
+
+
+# --- Controle de concorrência e retentativas ---
+# O limite de chamadas simultâneas ao Gemini se adapta (AIMD): cresce aos
+# poucos enquanto as respostas são normais e cai pela metade a cada 429/503.
+gemini_limiter = AdaptiveLimiter(
+    limite_inicial=settings.GEMINI_LIMITE_INICIAL,
+    limite_min=settings.GEMINI_LIMITE_MIN,
+    limite_max=settings.GEMINI_LIMITE_MAX,
+    fila_max=settings.GEMINI_FILA_MAX,
+    timeout_fila=settings.GEMINI_FILA_TIMEOUT_SECONDS,
+    gauge_limite=metrics.gauge("gemini_limiter_limit", "Limite atual de chamadas simultâneas ao Gemini"),
+    gauge_em_andamento=metrics.gauge("gemini_limiter_in_flight", "Chamadas ao Gemini em andamento"),
+    gauge_fila=metrics.gauge("gemini_limiter_queue_depth", "Chamadas aguardando vaga para o Gemini"),
+    rejeicoes=metrics.counter("gemini_limiter_rejected_total", "Chamadas recusadas pelo limitador"),
+)
+gemini_retries = metrics.counter("gemini_retries_total", "Retentativas de chamadas ao Gemini por tipo de erro")
+
+# --- Telemetria por chamada (rótulos: modelo e modo "plano"/"chat") ---
+_BUCKETS_TOKENS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+gemini_latencia = metrics.histogram(
+    "gemini_request_duration_seconds", "Latência de cada tentativa de chamada ao Gemini"
+)
+gemini_latencia_total = metrics.histogram(
+    "gemini_call_duration_seconds", "Latência total de uma geração (fila + retentativas)"
+)
+gemini_espera_fila = metrics.histogram(
+    "gemini_queue_wait_seconds", "Tempo de espera por uma vaga do limitador"
+)
+gemini_chamadas = metrics.counter("gemini_requests_total", "Tentativas de chamada ao Gemini por status")
+gemini_tokens = metrics.counter("gemini_tokens_total", "Tokens consumidos no Gemini (prompt, resposta, cache)")
+gemini_primeiro_trecho = metrics.histogram(
+    "gemini_time_to_first_chunk_seconds", "Tempo até o primeiro trecho no streaming"
+)
+gemini_tokens_resposta = metrics.histogram(
+    "gemini_response_tokens", "Tokens por resposta do Gemini", buckets=_BUCKETS_TOKENS
+)
+
+# Circuit breaker: após falhas consecutivas do provedor, as chamadas falham
+# na hora (sem rede) até o tempo de espera passar e uma sonda dar certo.
+gemini_breaker = CircuitBreaker(
+    limite_falhas=settings.GEMINI_BREAKER_FALHAS,
+    tempo_aberto=settings.GEMINI_BREAKER_ABERTO_SECONDS,
+    sondas=settings.GEMINI_BREAKER_SONDAS,
+    transicoes=metrics.counter("gemini_circuit_transitions_total", "Transições de estado do circuit breaker do Gemini"),
+    gauge_estado=metrics.gauge("gemini_circuit_state", "Estado do circuit breaker do Gemini (0=fechado, 1=semi-aberto, 2=aberto)"),
+)
+
+# Lidos uma vez: os testes substituem `settings` por mocks
+_RETRY = {
+    "max_retries": settings.GEMINI_MAX_RETRIES,
+    "base": settings.GEMINI_RETRY_BASE_SECONDS,
+    "maximo": settings.GEMINI_RETRY_MAX_SECONDS,
+}
+
+# Hedge (opcional, só no caminho assíncrono): se a chamada passar do percentil
+# de latência recente, uma segunda chamada é disparada e a primeira resposta vence.
+_HEDGE_ATIVO = settings.GEMINI_HEDGE
+_HEDGE_MODELO = settings.GEMINI_HEDGE_MODELO
+gemini_hedge = Hedge(
+    percentil=settings.GEMINI_HEDGE_PERCENTIL,
+    atraso_min=settings.GEMINI_HEDGE_ATRASO_MIN_SECONDS,
+    atraso_max=settings.GEMINI_HEDGE_ATRASO_MAX_SECONDS,
+    disparos=metrics.counter("gemini_hedges_total", "Chamadas de reserva (hedge) disparadas ao Gemini"),
+    vitorias=metrics.counter("gemini_hedge_wins_total", "Resultados usados quando houve hedge, por vencedor"),
+)
+
+_ERROS_SOBRECARGA = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable"}
+_ERROS_RETENTAVEIS = _ERROS_SOBRECARGA | {"InternalServerError", "DeadlineExceeded", "GatewayTimeout"}
+
+
+def _codigo_http(e: BaseException) -> Optional[int]:
+    codigo = getattr(e, "code", None)
+    return codigo if isinstance(codigo, int) else None
+
+
+def _erro_de_sobrecarga(e: BaseException) -> bool:
+    """429/503: o provedor está limitando as requisições."""
+    return type(e).__name__ in _ERROS_SOBRECARGA or _codigo_http(e) in (429, 503)
+
+
+def _erro_retentavel(e: BaseException) -> bool:
+    """Erros transitórios que valem uma nova tentativa (429/500/503/504)."""
+    if google_exceptions is not None and isinstance(e, google_exceptions.GoogleAPICallError):
+        return _codigo_http(e) in (429, 500, 503, 504)
+    return type(e).__name__ in _ERROS_RETENTAVEIS or _codigo_http(e) in (429, 500, 503, 504)
+
+
+def _registrar_resultado(erro: Optional[BaseException] = None) -> None:
+    """Realimenta o limitador AIMD e o circuit breaker com o resultado da chamada."""
+    if erro is None:
+        gemini_limiter.sucesso()
+        gemini_breaker.sucesso()
+        return
+    if _erro_de_sobrecarga(erro):
+        gemini_limiter.sobrecarga()
+    if _erro_retentavel(erro):
+        gemini_breaker.falha()
+    else:
+        # Erro do lado do cliente (ex: argumento inválido): o provedor respondeu
+        gemini_breaker.sucesso()
+
+
+def _modo(system_instruction: str) -> str:
+    return "plano" if system_instruction == SYSTEM_INSTRUCTION_PLANO else "chat"
+
+
+def _observar_tentativa(inicio_fila: float, inicio: float, rotulos: dict, erro=None) -> None:
+    fim = time.perf_counter()
+    status = "ok" if erro is None else type(erro).__name__
+    gemini_espera_fila.observe(inicio - inicio_fila, **rotulos)
+    gemini_latencia.observe(fim - inicio, status=status, **rotulos)
+    gemini_chamadas.inc(status=status, **rotulos)
+
+
+def _registrar_uso(response, rotulos: dict) -> Optional[Tuple[int, int, int]]:
+    """Exporta os tokens do `usage_metadata` da resposta nas métricas.
+
+    Retorna (prompt, resposta, cache) para o uso por usuário (`_creditar_uso`),
+    ou None se a resposta não trouxe o uso.
     """
-    api_key = settings.GEMINI_API_KEY
-    if not api_key:
-        return "Erro: GEMINI_API_KEY não configurada"
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+
+    def contar(campo: str) -> int:
+        valor = getattr(usage, campo, 0)
+        return valor if isinstance(valor, int) else 0
+
+    prompt = contar("prompt_token_count")
+    resposta = contar("candidates_token_count")
+    cache = contar("cached_content_token_count")
+    gemini_tokens.inc(prompt, tipo="prompt", **rotulos)
+    gemini_tokens.inc(resposta, tipo="resposta", **rotulos)
+    if cache:
+        gemini_tokens.inc(cache, tipo="cache", **rotulos)
+    gemini_tokens_resposta.observe(resposta, **rotulos)
+    return prompt, resposta, cache
+
+
+def _creditar_uso(usuario_id: Optional[str], modo: str, tokens: Optional[Tuple[int, int, int]]) -> None:
+    """Credita ao usuário os tokens da resposta que ele recebeu.
+
+    Chamado por cada chamador, inclusive os coalescidos pelo single-flight:
+    todos recebem o mesmo resultado e cada um responde pelo seu uso, então a
+    soma por usuário pode passar dos tokens cobrados pelo provedor
+    (`gemini_tokens_total` conta a chamada real uma única vez).
+    """
+    if tokens is not None:
+        uso_service.registrar(usuario_id, modo, *tokens)
+
+
+def _chamar_com_limite(funcao, rotulos: Optional[dict] = None):
+    """Executa uma chamada ao Gemini passando pelo breaker e ocupando uma vaga do limitador."""
+    rotulos = rotulos or {}
+    gemini_breaker.permitir()
+    inicio_fila = time.perf_counter()
+    try:
+        gemini_limiter.acquire()
+    except LimiteExcedido:
+        gemini_breaker.cancelar()
+        raise
+    inicio = time.perf_counter()
+    try:
+        resultado = funcao()
+    except Exception as e:
+        _observar_tentativa(inicio_fila, inicio, rotulos, e)
+        _registrar_resultado(e)
+        raise
+    finally:
+        gemini_limiter.release()
+    _observar_tentativa(inicio_fila, inicio, rotulos)
+    _registrar_resultado()
+    return resultado
+
+
+async def _chamar_com_limite_async(fabrica, rotulos: Optional[dict] = None):
+    rotulos = rotulos or {}
+    gemini_breaker.permitir()
+    inicio_fila = time.perf_counter()
+    try:
+        await gemini_limiter.acquire_async()
+    except BaseException:
+        # LimiteExcedido ou cancelamento: a chamada não chegou ao provedor
+        gemini_breaker.cancelar()
+        raise
+    inicio = time.perf_counter()
+    try:
+        resultado = await fabrica()
+    except asyncio.CancelledError:
+        # Perdedora de um hedge (ou cliente desconectado): sem resultado do provedor
+        gemini_breaker.cancelar()
+        raise
+    except Exception as e:
+        _observar_tentativa(inicio_fila, inicio, rotulos, e)
+        _registrar_resultado(e)
+        raise
+    finally:
+        gemini_limiter.release()
+    _observar_tentativa(inicio_fila, inicio, rotulos)
+    _registrar_resultado()
+    return resultado
+
+
+def _erro_de_contexto(e: BaseException) -> bool:
+    """403/404: o handle de contexto expirou ou foi apagado no provedor."""
+    return type(e).__name__ in ("NotFound", "PermissionDenied") or _codigo_http(e) in (403, 404)
+
+
+def _gerar(model_name: str, system_instruction: str, prompt_usuario: str) -> Tuple[str, Optional[Tuple[int, int, int]]]:
+    """Chama o Gemini (síncrono), com limite e retentativas, e grava no cache.
+
+    Retorna (texto, tokens); o uso é creditado por quem chamou (`_creditar_uso`).
+    """
+    rotulos = {"modelo": model_name, "modo": _modo(system_instruction)}
+    inicio = time.perf_counter()
+
+    def chamar(model):
+        return executar_com_retry(
+            lambda: _chamar_com_limite(lambda: model.generate_content(prompt_usuario), rotulos),
+            _erro_retentavel,
+            contador=gemini_retries,
+            **_RETRY,
+        )
+
+    try:
+        response = chamar(model_registry.obter(model_name, system_instruction))
+    except Exception as e:
+        # Handle de contexto perdido no provedor: uma nova tentativa já recria
+        # o handle (ou usa a instrução inline)
+        if not (_erro_de_contexto(e) and model_registry.descartar_contexto(model_name, system_instruction)):
+            raise
+        response = chamar(model_registry.obter(model_name, system_instruction))
+    gemini_latencia_total.observe(time.perf_counter() - inicio, **rotulos)
+    tokens = _registrar_uso(response, rotulos)
+    _cache_set(model_name, system_instruction, prompt_usuario, response.text)
+    return response.text, tokens
+
 
-    # 1. Lógica para DETECTAR INTENÇÃO (Geração de Plano vs. Dúvida/Chat)
-    mensagem_lower = data.mensagem_usuario.lower().strip()
-    
-    # Detecção V2: Se contiver palavras-chave de plano (treino, plano, foco)
-    is_plan_request = any(
-        keyword in mensagem_lower for keyword in ["treino", "plano", "foco"]
+async def _gerar_async(
+    model_name: str, system_instruction: str, prompt_usuario: str
+) -> Tuple[str, Optional[Tuple[int, int, int]]]:
+    """Chama o Gemini (assíncrono), com limite e retentativas, e grava no cache. Retorna (texto, tokens)."""
+    rotulos = {"modelo": model_name, "modo": _modo(system_instruction)}
+    inicio = time.perf_counter()
+
+    async def chamar(model):
+        return await executar_com_retry_async(
+            lambda: _chamar_com_limite_async(lambda: model.generate_content_async(prompt_usuario), rotulos),
+            _erro_retentavel,
+            contador=gemini_retries,
+            **_RETRY,
+        )
+
+    try:
+        response = await chamar(await model_registry.obter_async(model_name, system_instruction))
+    except Exception as e:
+        if not (_erro_de_contexto(e) and model_registry.descartar_contexto(model_name, system_instruction)):
+            raise
+        response = await chamar(await model_registry.obter_async(model_name, system_instruction))
+    gemini_latencia_total.observe(time.perf_counter() - inicio, **rotulos)
+    tokens = _registrar_uso(response, rotulos)
+    await _cache_set_async(model_name, system_instruction, prompt_usuario, response.text)
+    return response.text, tokens
+
+
+async def _gerar_com_hedge(
+    model_name: str, system_instruction: str, prompt_usuario: str
+) -> Tuple[str, Optional[Tuple[int, int, int]]]:
+    """`_gerar_async` com hedge: a chamada de reserva vai para GEMINI_HEDGE_MODELO (ou o mesmo modelo)."""
+    if not _HEDGE_ATIVO:
+        return await _gerar_async(model_name, system_instruction, prompt_usuario)
+
+    modelo_reserva = _HEDGE_MODELO or model_name
+    return await gemini_hedge.executar(
+        lambda: _gerar_async(model_name, system_instruction, prompt_usuario),
+        lambda: _gerar_async(modelo_reserva, system_instruction, prompt_usuario),
+        # Com o provedor falhando, a reserva só aumentaria a carga
+        permitir_reserva=lambda: gemini_breaker.estado == FECHADO,
+        modelo=model_name,
+        modo=_modo(system_instruction),
     )
-    # Detecção V2: Se contiver palavras-chave de dúvida/execução (dúvida, como, execução, alternativa)
-    is_chat_doubt = any(
-        keyword in mensagem_lower for keyword in ["olá", "oi", "dúvida", "como é", "execução", "alternativa", "o que é", "ajuda", "diga"]
-    ) or len(mensagem_lower.split()) < 6 
-    
+
+
+def _usuario_id(user: Optional[dict]) -> Optional[str]:
+    return str(user["_id"]) if user and user.get("_id") else None
+
+
+def _resolver_modelo() -> str:
+    """Retorna o nome do modelo configurado (ou o padrão)."""
+    model_name = getattr(settings, "GEMINI_MODEL", None)
+    if not isinstance(model_name, str) or not model_name:
+        model_name = "gemini-2.5-flash-lite"
+    return model_name
+
+
+def montar_bloco_usuario(user: Optional[dict]) -> str:
+    """Bloco com os dados do perfil do usuário enviado no prompt."""
+    user_parts = []
+    if user:
+        # Extrai campos úteis do perfil do usuário
+        if user.get("idade") is not None:
+            user_parts.append(f"Idade: {user.get('idade')}")
+        if user.get("peso") is not None:
+            user_parts.append(f"Peso: {user.get('peso')} kg")
+        if user.get("altura") is not None:
+            user_parts.append(f"Altura: {user.get('altura')} cm")
+        if user.get("objetivo"):
+            user_parts.append(f"Objetivo do usuário: {user.get('objetivo')}")
+        if user.get("limitacoes"):
+            user_parts.append(f"Limitações: {user.get('limitacoes')}")
+
+    return ("\n".join(user_parts) + "\n") if user_parts else ""
+
+
+def _montar_requisicao(
+    data: MensagemChat, user: Optional[dict] = None, historico: Optional[str] = None,
+    intencao: Optional[str] = None,
+):
+    """Seleciona a instrução pela intenção e monta (system_instruction, prompt_usuario, is_plan_mode).
+
+    Compartilhado entre as versões síncrona e assíncrona para que ambas
+    enviem exatamente o mesmo conteúdo ao Gemini.
+    """
+    # 1. Intenção detectada pelo roteador local (plano vs. dúvida/chat)
+    if intencao is None:
+        intencao = intent_router.classificar(data.mensagem_usuario)
+
     # 2. SELECIONAR A INSTRUÇÃO DO SISTEMA
-    # Se for uma requisição de plano E NÃO for uma dúvida/execução simples
-    if is_plan_request and not is_chat_doubt:
+    if intencao == intent_router.PLANO:
         system_instruction = SYSTEM_INSTRUCTION_PLANO
         is_plan_mode = True
     else:
@@ -75,88 +564,298 @@ def gerar_plano_de_treino(data: MensagemChat, user: Optional[dict] = None, histo
         system_instruction = SYSTEM_INSTRUCTION_BASE
         is_plan_mode = False
 
-    try:
-        genai.configure(api_key=api_key)
-
-        model_name = getattr(settings, "GEMINI_MODEL", None)
-        if not isinstance(model_name, str) or not model_name:
-            model_name = "gemini-2.5-flash-lite"
-
-        # Monta o PROMPT DO USUÁRIO
-        equipamentos_str = ", ".join(data.equipamentos) if getattr(data, "equipamentos", None) else "peso corporal"
-
-        user_parts = []
-        if user:
-            # Extrai campos úteis do perfil do usuário
-            if user.get("idade") is not None:
-                user_parts.append(f"Idade: {user.get('idade')}")
-            if user.get("peso") is not None:
-                user_parts.append(f"Peso: {user.get('peso')} kg")
-            if user.get("altura") is not None:
-                user_parts.append(f"Altura: {user.get('altura')} cm")
-            if user.get("objetivo"):
-                user_parts.append(f"Objetivo do usuário: {user.get('objetivo')}")
-            if user.get("limitacoes"):
-                user_parts.append(f"Limitações: {user.get('limitacoes')}")
-
-        user_info_block = ("\n".join(user_parts) + "\n") if user_parts else ""
-        historico_block = f"Histórico de treinos anteriores:\n{historico}\n\n" if historico else ""
-
-        if is_plan_mode:
-            # Prompt detalhado para geração de plano
-            prompt_usuario = (
-                f"Por favor, gere um plano de treino para o usuário com base nas seguintes informações:\n"
-                f"- Nível de Experiência: {getattr(data, 'nivel', 'iniciante')}\n"
-                f"- Objetivo Principal: {getattr(data, 'objetivo', 'condicionamento')}\n"
-                f"- Equipamentos Disponíveis: {equipamentos_str}\n"
-                f"- Disponibilidade na semana: {getattr(data, 'frequencia', '2 dias por semana')}\n"
-                f"\n{user_info_block}"
-                f"{historico_block}"
-                f"Mensagem do Usuário: {data.mensagem_usuario}"
-            )
+    # Monta o PROMPT DO USUÁRIO
+    equipamentos_str = ", ".join(data.equipamentos) if getattr(data, "equipamentos", None) else "peso corporal"
+
+    user_info_block = montar_bloco_usuario(user)
+    historico_block = f"Histórico de treinos anteriores:\n{historico}\n\n" if historico else ""
+
+    if is_plan_mode:
+        # Prompt detalhado para geração de plano
+        prompt_usuario = (
+            f"Por favor, gere um plano de treino para o usuário com base nas seguintes informações:\n"
+            f"- Nível de Experiência: {getattr(data, 'nivel', 'iniciante')}\n"
+            f"- Objetivo Principal: {getattr(data, 'objetivo', 'condicionamento')}\n"
+            f"- Equipamentos Disponíveis: {equipamentos_str}\n"
+            f"- Disponibilidade na semana: {getattr(data, 'frequencia', '2 dias por semana')}\n"
+            f"\n{user_info_block}"
+            f"{historico_block}"
+            f"Mensagem do Usuário: {data.mensagem_usuario}"
+        )
+    else:
+        # Prompt Simples para Dúvidas/Chat - FORÇA A RESPOSTA CURTA E DIRECIONADA
+        prompt_usuario = (
+            f"Mensagem do Usuário: {data.mensagem_usuario}\n\n"
+            f"**Atenção:** Ignore a formatação de plano de treino e as regras de lista. Use apenas texto corrido e **negrito (**) para palavras-chave. Responda APENAS à pergunta do usuário de forma concisa e direta, mantendo seu papel de personal trainer digital. Use os dados do perfil do usuário ({user_info_block.strip()}) apenas como contexto para uma resposta mais útil, se necessário."
+        )
+
+    return system_instruction, prompt_usuario, is_plan_mode
+
+
+def _nomes_de_modelos(models) -> List[str]:
+    """Extrai os nomes do retorno de `list_models` (strings, objetos ou dicionários)."""
+    model_names = []
+    for m in models:
+        if isinstance(m, str):
+            model_names.append(m)
+        elif isinstance(m, dict) and "name" in m:
+            model_names.append(m["name"])
         else:
-             # Prompt Simples para Dúvidas/Chat - FORÇA A RESPOSTA CURTA E DIRECIONADA
-             prompt_usuario = (
-                 f"Mensagem do Usuário: {data.mensagem_usuario}\n\n"
-                 f"**Atenção:** Ignore a formatação de plano de treino e as regras de lista. Use apenas texto corrido e **negrito (**) para palavras-chave. Responda APENAS à pergunta do usuário de forma concisa e direta, mantendo seu papel de personal trainer digital. Use os dados do perfil do usuário ({user_info_block.strip()}) apenas como contexto para uma resposta mais útil, se necessário."             )
+            # tenta atributo 'name'
+            name = getattr(m, "name", None)
+            if name:
+                model_names.append(name)
+    return model_names
+
+
+class ListaDeModelos:
+    """Nomes dos modelos disponíveis, em cache com TTL.
+
+    `obter` nunca faz chamada remota: devolve o que estiver em cache e, se
+    estiver vencido, agenda a atualização numa thread em segundo plano. Assim
+    o caminho de erro não adiciona uma ida ao provedor (que pode estar fora).
+    """
+
+    def __init__(self, ttl_seconds: float = 3600) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._nomes: List[str] = []
+        self._atualizado_em: Optional[float] = None
+        self._atualizando = False
+        self._genai = None
+
+    def obter(self) -> List[str]:
+        with self._lock:
+            if genai is not self._genai:
+                # SDK trocado (ex: mock nos testes): a lista antiga não vale
+                self._genai = genai
+                self._nomes = []
+                self._atualizado_em = None
+            vencida = self._atualizado_em is None or time.monotonic() - self._atualizado_em > self.ttl_seconds
+            if (
+                vencida and not self._atualizando and gemini_breaker.estado != ABERTO
+                and callable(getattr(genai, "list_models", None))
+            ):
+                self._atualizando = True
+                threading.Thread(target=self.atualizar, args=(genai,), daemon=True).start()
+            return list(self._nomes)
+
+    def atualizar(self, genai_modulo=None) -> List[str]:
+        """Consulta `list_models` (bloqueante) e atualiza o cache."""
+        genai_modulo = genai_modulo or genai
+        nomes: Optional[List[str]] = None
+        try:
+            nomes = _nomes_de_modelos(genai_modulo.list_models())
+        except Exception as e:
+            print(f"⚠️ Não foi possível listar os modelos do Gemini: {e}")
+        with self._lock:
+            self._atualizando = False
+            if genai_modulo is self._genai or self._genai is None:
+                self._genai = genai_modulo
+                # Em caso de falha, espera o próximo TTL para tentar de novo
+                self._atualizado_em = time.monotonic()
+                if nomes is not None:
+                    self._nomes = nomes
+            return list(self._nomes)
+
+
+lista_de_modelos = ListaDeModelos(ttl_seconds=settings.GEMINI_MODELOS_TTL_SECONDS)
+
+
+# Prefixos das respostas de erro devolvidas (em vez de exceções) pelos geradores
+PREFIXOS_ERRO = ("Erro:", "Ocorreu um erro ao se comunicar")
+
+
+def resposta_de_erro(texto: Optional[str]) -> bool:
+    """True se o texto é vazio ou uma mensagem de erro do gerador, e não um plano."""
+    return not texto or texto.startswith(PREFIXOS_ERRO)
+
+
+def _mensagem_de_erro(e: Exception) -> str:
+    """Monta a mensagem de erro devolvida ao usuário quando o Gemini falha (sem I/O)."""
+    # Mensagem de erro mais útil: inclui os modelos disponíveis (lista em
+    # cache) para ajudar na correção de um GEMINI_MODEL inválido.
+    err_text = str(e)
+    model_names = lista_de_modelos.obter()
+    if model_names:
+        return (
+            f"Ocorreu um erro ao se comunicar com a API do Gemini: {err_text}. "
+            f"Modelos disponíveis: {', '.join(model_names)}. "
+            "Defina a variável de ambiente GEMINI_MODEL com um modelo suportado."
+        )
+
+    return f"Ocorreu um erro ao se comunicar com a API do Gemini: {err_text}"
+
+
+def gerar_plano_de_treino(data: MensagemChat, user: Optional[dict] = None, historico: Optional[str] = None) -> str:
+    """
+    Gera o texto do plano de treino ou responde a uma dúvida (SÍNCRONO).
+
+    Mantida para os endpoints de compatibilidade; as rotas assíncronas usam
+    `gerar_plano_de_treino_async`.
+    """
+    api_key = settings.GEMINI_API_KEY
+    if not api_key:
+        return "Erro: GEMINI_API_KEY não configurada"
+
+    # Saudações e assuntos fora do tema são respondidos sem chamar o Gemini
+    intencao = intent_router.classificar(data.mensagem_usuario)
+    resposta_local = intent_router.resposta_local(intencao)
+    if resposta_local is not None:
+        return resposta_local
+
+    try:
+        model_name = _resolver_modelo()
+        system_instruction, prompt_usuario, _ = _montar_requisicao(data, user, historico, intencao)
 
+        em_cache = _cache_get(model_name, system_instruction, prompt_usuario)
+        if em_cache is not None:
+            return em_cache
 
-        model = genai.GenerativeModel(model_name=model_name, system_instruction=system_instruction)
-        response = model.generate_content(prompt_usuario)
-        return response.text
+        chave = cache_service.gerar_chave(model_name, system_instruction, prompt_usuario)
+        texto, tokens = _singleflight.do(chave, lambda: _gerar(model_name, system_instruction, prompt_usuario))
+        _creditar_uso(_usuario_id(user), _modo(system_instruction), tokens)
+        return texto
 
     except Exception as e:
-        # Mensagem de erro mais útil: se a biblioteca suportar listar modelos,
-        # tentamos recuperar a lista disponível para ajudar na correção.
-        err_text = str(e)
+        return _mensagem_de_erro(e)
+
+
+async def gerar_plano_de_treino_async(
+    data: MensagemChat, user: Optional[dict] = None, historico: Optional[str] = None
+) -> str:
+    """
+    Versão ASSÍNCRONA de `gerar_plano_de_treino`.
+
+    Usa `generate_content_async` do SDK, então a espera pela resposta do
+    Gemini não ocupa uma thread do threadpool do AnyIO.
+    """
+    api_key = settings.GEMINI_API_KEY
+    if not api_key:
+        return "Erro: GEMINI_API_KEY não configurada"
+
+    intencao = intent_router.classificar(data.mensagem_usuario)
+    resposta_local = intent_router.resposta_local(intencao)
+    if resposta_local is not None:
+        return resposta_local
+
+    try:
+        model_name = _resolver_modelo()
+        system_instruction, prompt_usuario, _ = _montar_requisicao(data, user, historico, intencao)
+
+        em_cache = await _cache_get_async(model_name, system_instruction, prompt_usuario)
+        if em_cache is not None:
+            return em_cache
+
+        chave = cache_service.gerar_chave(model_name, system_instruction, prompt_usuario)
+        texto, tokens = await _singleflight_async.do(
+            chave, lambda: _gerar_com_hedge(model_name, system_instruction, prompt_usuario)
+        )
+        _creditar_uso(_usuario_id(user), _modo(system_instruction), tokens)
+        return texto
+
+    except Exception as e:
+        return _mensagem_de_erro(e)
+
+
+class ErroNoStream(Exception):
+    """Falha da geração em streaming; `str(e)` é a mensagem para o usuário.
+
+    Levantada por `gerar_plano_de_treino_stream` em vez de produzir o erro
+    como um trecho, para o chamador não o confundir com o plano.
+    """
+
+
+async def gerar_plano_de_treino_stream(
+    data: MensagemChat, user: Optional[dict] = None, historico: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Versão em STREAMING: produz os trechos de texto à medida que o Gemini os gera.
+
+    Em caso de erro levanta `ErroNoStream` (com a mesma mensagem das outras
+    versões); os trechos já produzidos não formam um plano completo.
+    """
+    api_key = settings.GEMINI_API_KEY
+    if not api_key:
+        raise ErroNoStream("Erro: GEMINI_API_KEY não configurada")
+
+    intencao = intent_router.classificar(data.mensagem_usuario)
+    resposta_local = intent_router.resposta_local(intencao)
+    if resposta_local is not None:
+        yield resposta_local
+        return
+
+    try:
+        model_name = _resolver_modelo()
+        system_instruction, prompt_usuario, _ = _montar_requisicao(data, user, historico, intencao)
+
+        em_cache = await _cache_get_async(model_name, system_instruction, prompt_usuario)
+        if em_cache is not None:
+            yield em_cache
+            return
+
+        model = await model_registry.obter_async(model_name, system_instruction)
+        rotulos = {"modelo": model_name, "modo": _modo(system_instruction)}
+        partes = []
+        # O stream passa pelo breaker e ocupa uma vaga do limitador até o último trecho
+        gemini_breaker.permitir()
+        registrado = False
         try:
-            list_models = getattr(genai, "list_models", None)
-            if callable(list_models):
-                models = list_models()
-                # models pode ser lista de strings, objetos ou dicionários
-                model_names = []
-                try:
-                    for m in models:
-                        if isinstance(m, str):
-                            model_names.append(m)
-                        elif isinstance(m, dict) and "name" in m:
-                            model_names.append(m["name"])
-                        else:
-                            # tenta atributo 'name'
-                            name = getattr(m, "name", None)
-                            if name:
-                                model_names.append(name)
-                except Exception:
-                    model_names = []
-
-                if model_names:
-                    return (
-                        f"Ocorreu um erro ao se comunicar com a API do Gemini: {err_text}. "
-                        f"Modelos disponíveis: {', '.join(model_names)}. "
-                        "Defina a variável de ambiente GEMINI_MODEL com um modelo suportado."
-                    )
-        except Exception:
-            # se falhar ao listar modelos, apenas cair para a mensagem genérica
-            pass
-
-        return f"Ocorreu um erro ao se comunicar com a API do Gemini: {err_text}"
\ No newline at end of file
+            inicio_fila = time.perf_counter()
+            await gemini_limiter.acquire_async()
+            inicio = time.perf_counter()
+            try:
+                response = await model.generate_content_async(prompt_usuario, stream=True)
+                async for chunk in response:
+                    texto = getattr(chunk, "text", "")
+                    if texto:
+                        if not partes:
+                            gemini_primeiro_trecho.observe(time.perf_counter() - inicio, **rotulos)
+                        partes.append(texto)
+                        yield texto
+            except Exception as e:
+                _observar_tentativa(inicio_fila, inicio, rotulos, e)
+                _registrar_resultado(e)
+                registrado = True
+                if _erro_de_contexto(e):
+                    # Stream já iniciado não é repetido; a próxima chamada recria o handle
+                    model_registry.descartar_contexto(model_name, system_instruction)
+                raise
+            finally:
+                gemini_limiter.release()
+            _registrar_resultado()
+            registrado = True
+        finally:
+            if not registrado:
+                # Limitador recusou ou o cliente desconectou (GeneratorExit /
+                # CancelledError): libera a vaga de sonda do breaker
+                gemini_breaker.cancelar()
+        _observar_tentativa(inicio_fila, inicio, rotulos)
+        gemini_latencia_total.observe(time.perf_counter() - inicio_fila, **rotulos)
+        _creditar_uso(_usuario_id(user), rotulos["modo"], _registrar_uso(response, rotulos))
+        # Só grava no cache quando o stream terminou sem erro
+        await _cache_set_async(model_name, system_instruction, prompt_usuario, "".join(partes))
+
+    except Exception as e:
+        raise ErroNoStream(_mensagem_de_erro(e)) from e
+
+
+def registrar_contexto_usuario(user: dict) -> None:
+    """
+    Aquece o contexto do usuário logo após o login (executada via BackgroundTasks).
+
+    Carrega o perfil e o resumo do histórico no cache em processo
+    (`contexto_usuario_service`), já com o bloco de perfil do prompt, para que
+    o primeiro `POST /treinos/` não precise consultar o MongoDB.
+    """
+    # Import tardio: contexto_usuario_service usa `montar_bloco_usuario` deste módulo
+    from services import contexto_usuario_service
+
+    email = (user or {}).get("email")
+    if not email:
+        return
+
+    try:
+        contexto_usuario_service.aquecer(email)
+    except Exception as e:
+        print(f"⚠️ Não foi possível aquecer o contexto de {email}: {e}")
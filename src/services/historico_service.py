@@ -0,0 +1,213 @@
+"""
+Resumo incremental do histórico de treinos de cada usuário.
+
+Em vez de concatenar todos os `plano_gerado` anteriores no prompt, cada
+usuário guarda no próprio documento (`usuarios.resumo_historico`) um texto
+curto com uma linha por treino ("data: título — exercícios"). A cada novo
+treino salvo a linha é acrescentada e as mais antigas são descartadas até
+o texto caber em `settings.HISTORICO_MAX_TOKENS`, então o tamanho do
+prompt não cresce com o número de treinos.
+
+A atualização é um compare-and-set: o `update_one` só casa se o resumo
+ainda é o que foi lido, e é refeita (até `_TENTATIVAS_RESUMO` vezes) quando
+outro save concorrente o alterou no meio, para nenhuma linha se perder.
+"""
+import re
+from datetime import datetime
+from typing import Iterable, Optional
+
+from bson import ObjectId
+
+from config.settings import settings
+from database import mongodb
+from repositories.usuario_repository import usuario_repo
+
+CAMPO_RESUMO = "resumo_historico"
+
+# Aproximação usada pelo Gemini para textos em português: ~4 caracteres por token
+CARACTERES_POR_TOKEN = 4
+
+# Releituras do compare-and-set quando outro save altera o resumo no meio
+_TENTATIVAS_RESUMO = 5
+
+_RE_TITULO = re.compile(r"plano de treino:\s*(.+)", re.IGNORECASE)
+_RE_EXERCICIO = re.compile(r"^\s*(?:#+\s*)?\d+\.\s*(.+?)\s*$")
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa barata do número de tokens de um texto."""
+    return (len(texto or "") + CARACTERES_POR_TOKEN - 1) // CARACTERES_POR_TOKEN
+
+
+def resumir_plano(plano: str, max_exercicios: int = 8) -> str:
+    """Reduz um plano (ou resposta de chat) a uma linha curta."""
+    texto = (plano or "").strip()
+    if not texto:
+        return ""
+
+    titulo = None
+    exercicios = []
+    for linha in texto.splitlines():
+        limpa = linha.strip().strip("*#").strip()
+        if titulo is None:
+            m = _RE_TITULO.search(limpa)
+            if m:
+                titulo = m.group(1).strip().strip("*").strip()
+                continue
+        m = _RE_EXERCICIO.match(linha.replace("*", ""))
+        if m and len(exercicios) < max_exercicios:
+            exercicios.append(m.group(1).strip())
+
+    if titulo is None and not exercicios:
+        # Resposta de chat: guardamos apenas o começo
+        primeira = " ".join(texto.split())
+        return primeira[:120] + ("..." if len(primeira) > 120 else "")
+
+    resumo = titulo or "Plano de treino"
+    if exercicios:
+        resumo += " — exercícios: " + ", ".join(exercicios)
+    return resumo
+
+
+def atualizar_resumo(
+    resumo_atual: Optional[str], novo_plano: str, criado_em: Optional[datetime] = None,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """Acrescenta o novo plano ao resumo e corta as entradas mais antigas."""
+    max_tokens = max_tokens if max_tokens is not None else settings.HISTORICO_MAX_TOKENS
+    linha = resumir_plano(novo_plano)
+    linhas = [l for l in (resumo_atual or "").splitlines() if l.strip()]
+    if linha:
+        data = (criado_em or datetime.utcnow()).strftime("%Y-%m-%d")
+        linhas.append(f"- {data}: {linha}")
+
+    # Remove as mais antigas até caber no orçamento
+    while len(linhas) > 1 and estimar_tokens("\n".join(linhas)) > max_tokens:
+        linhas.pop(0)
+
+    resumo = "\n".join(linhas)
+    limite = max_tokens * CARACTERES_POR_TOKEN
+    if len(resumo) > limite:
+        resumo = resumo[:limite]
+    return resumo
+
+
+def construir_resumo(treinos: Iterable[dict], max_tokens: Optional[int] = None) -> str:
+    """Monta o resumo a partir de treinos já salvos (mais recente primeiro)."""
+    resumo = ""
+    for t in reversed(list(treinos)):
+        resumo = atualizar_resumo(resumo, t.get("plano_gerado") or "", t.get("criado_em"), max_tokens)
+    return resumo
+
+
+def _filtro_resumo(filtro: dict, doc: dict) -> dict:
+    """`filtro` + o resumo lido: casa só se ninguém o alterou desde a leitura."""
+    if CAMPO_RESUMO in doc:
+        return {**filtro, CAMPO_RESUMO: doc[CAMPO_RESUMO]}
+    return {**filtro, CAMPO_RESUMO: {"$exists": False}}
+
+
+def registrar_treino_no_resumo(usuario_id, plano_gerado: str, criado_em: Optional[datetime] = None) -> Optional[str]:
+    """Atualiza `resumo_historico` do usuário após salvar um treino (SÍNCRONO)."""
+    if mongodb.usuarios_collection is None:
+        return None
+
+    filtro = {"_id": ObjectId(usuario_id) if not isinstance(usuario_id, ObjectId) else usuario_id}
+    for _ in range(_TENTATIVAS_RESUMO):
+        doc = mongodb.usuarios_collection.find_one(filtro, {CAMPO_RESUMO: 1})
+        if doc is None:
+            return None
+
+        if CAMPO_RESUMO in doc:
+            resumo = atualizar_resumo(doc[CAMPO_RESUMO], plano_gerado, criado_em)
+            if resumo == doc[CAMPO_RESUMO]:
+                return resumo
+        else:
+            # Usuário sem resumo (anterior ao recurso): monta com todos os
+            # treinos salvos, que já incluem o novo
+            from services import treino_service
+
+            resumo = construir_resumo(treino_service.listar_treinos_por_usuario(str(filtro["_id"])))
+        result = mongodb.usuarios_collection.update_one(
+            _filtro_resumo(filtro, doc), {"$set": {CAMPO_RESUMO: resumo}}
+        )
+        if result.matched_count == 1:
+            return resumo
+
+    print(f"⚠️ Resumo do histórico de {usuario_id} não atualizado: escritas concorrentes")
+    return None
+
+
+def obter_resumo_historico(user: dict) -> str:
+    """Retorna o resumo do usuário, criando-o a partir dos treinos antigos se ainda não existir.
+
+    Usuários anteriores a este recurso não têm o campo: na primeira vez o
+    resumo é montado com os treinos salvos e persistido, depois disso ele só
+    é atualizado incrementalmente por `registrar_treino_no_resumo`.
+    """
+    if CAMPO_RESUMO in user:
+        return user.get(CAMPO_RESUMO) or ""
+
+    # Import tardio para evitar ciclo (treino_service importa este módulo)
+    from services import treino_service
+
+    treinos = treino_service.listar_treinos_por_usuario(str(user["_id"]))
+    resumo = construir_resumo(treinos)
+
+    if mongodb.usuarios_collection is not None:
+        try:
+            # Só grava se um save concorrente ainda não criou o resumo
+            mongodb.usuarios_collection.update_one(
+                {"_id": ObjectId(str(user["_id"])), CAMPO_RESUMO: {"$exists": False}},
+                {"$set": {CAMPO_RESUMO: resumo}},
+            )
+        except Exception as e:
+            print(f"Erro ao salvar resumo do histórico: {e}")
+    return resumo
+
+
+async def registrar_treino_no_resumo_async(
+    usuario_id, plano_gerado: str, criado_em: Optional[datetime] = None
+) -> Optional[str]:
+    """Versão ASSÍNCRONA de `registrar_treino_no_resumo` (Motor)."""
+    for _ in range(_TENTATIVAS_RESUMO):
+        doc = await usuario_repo.buscar_por_id(usuario_id, {CAMPO_RESUMO: 1})
+        if doc is None:
+            return None
+
+        if CAMPO_RESUMO in doc:
+            resumo = atualizar_resumo(doc[CAMPO_RESUMO], plano_gerado, criado_em)
+            if resumo == doc[CAMPO_RESUMO]:
+                return resumo
+        else:
+            # Sem resumo: monta com os treinos salvos, lidos do primário para incluir o novo
+            from services import treino_service
+
+            treinos = await treino_service.listar_treinos_por_usuario_async(str(doc["_id"]), primario=True)
+            resumo = construir_resumo(treinos)
+        if await usuario_repo.update_one(_filtro_resumo({"_id": doc["_id"]}, doc), {"$set": {CAMPO_RESUMO: resumo}}):
+            return resumo
+
+    print(f"⚠️ Resumo do histórico de {usuario_id} não atualizado: escritas concorrentes")
+    return None
+
+
+async def obter_resumo_historico_async(user: dict) -> str:
+    """Versão ASSÍNCRONA de `obter_resumo_historico` (Motor)."""
+    if CAMPO_RESUMO in user:
+        return user.get(CAMPO_RESUMO) or ""
+
+    # Import tardio para evitar ciclo (treino_service importa este módulo)
+    from services import treino_service
+
+    treinos = await treino_service.listar_treinos_por_usuario_async(str(user["_id"]))
+    resumo = construir_resumo(treinos)
+    try:
+        # Só grava se um save concorrente ainda não criou o resumo
+        await usuario_repo.update_one(
+            {"_id": ObjectId(str(user["_id"])), CAMPO_RESUMO: {"$exists": False}},
+            {"$set": {CAMPO_RESUMO: resumo}},
+        )
+    except Exception as e:
+        print(f"Erro ao salvar resumo do histórico: {e}")
+    return resumo
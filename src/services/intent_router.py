@@ -0,0 +1,152 @@
+"""
+Roteador local de intenção das mensagens do chat.
+
+Classifica cada mensagem em uma de quatro intenções:
+
+- `PLANO`: pedido de plano de treino (vai ao Gemini com SYSTEM_INSTRUCTION_PLANO);
+- `DUVIDA`: dúvida sobre exercício/execução (vai ao Gemini com SYSTEM_INSTRUCTION_BASE);
+- `SAUDACAO`: apenas cumprimento ("oi", "bom dia") — respondida localmente;
+- `FORA_DO_TEMA`: assunto que não é treino — respondida localmente.
+
+As palavras-chave são compiladas uma vez num autômato (trie de tokens),
+então a busca respeita fronteiras de palavra ("oi" não casa com "foi") e
+aceita expressões de várias palavras ("bom dia", "o que é").
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils.metrics import registry as metrics
+
+PLANO = "plano"
+DUVIDA = "duvida"
+SAUDACAO = "saudacao"
+FORA_DO_TEMA = "fora_do_tema"
+
+# Categorias internas de palavras-chave
+_KW_PLANO = "kw_plano"
+_KW_DUVIDA = "kw_duvida"
+_KW_SAUDACAO = "kw_saudacao"
+_KW_TREINO = "kw_treino"
+_KW_FORA = "kw_fora"
+
+PALAVRAS_CHAVE: Dict[str, tuple] = {
+    _KW_PLANO: ("treino", "treinos", "plano", "planos", "foco", "rotina", "ficha", "cronograma"),
+    _KW_DUVIDA: (
+        "duvida", "como e", "como faco", "como fazer", "como executar", "execucao", "executar",
+        "alternativa", "alternativas", "o que e", "ajuda", "diga", "substituir", "postura",
+    ),
+    _KW_SAUDACAO: (
+        "oi", "ola", "opa", "hey", "hello", "eai", "e ai", "bom dia", "boa tarde", "boa noite",
+        "tudo bem", "tudo bom", "como vai", "obrigado", "obrigada", "valeu",
+    ),
+    # Vocabulário de treino/saúde: se aparecer, a mensagem nunca é fora do tema
+    _KW_TREINO: (
+        "exercicio", "exercicios", "academia", "musculacao", "alongamento", "aquecimento",
+        "cardio", "corrida", "correr", "caminhada", "hipertrofia", "emagrecer", "emagrecimento",
+        "perder peso", "ganhar massa", "massa muscular", "musculo", "musculos", "forca",
+        "condicionamento", "serie", "series", "repeticao", "repeticoes", "descanso", "carga",
+        "agachamento", "flexao", "prancha", "supino", "abdominal", "burpee", "polichinelo",
+        "halter", "halteres", "barra", "elastico", "perna", "pernas", "braco", "bracos",
+        "peito", "costas", "ombro", "ombros", "abdomen", "gluteo", "gluteos", "biceps",
+        "triceps", "panturrilha", "coxa", "lombar", "dor", "dores", "lesao", "machuquei",
+        "joelho", "postura", "treinar", "malhar", "definir", "sarado",
+    ),
+    _KW_FORA: (
+        "receita", "receitas", "culinaria", "cozinhar", "bolo", "musica", "musicas", "cantor",
+        "filme", "filmes", "novela", "futebol", "politica", "eleicao", "programacao",
+        "codigo", "python", "javascript", "piada", "horoscopo", "signo", "clima", "previsao do tempo",
+        "bitcoin", "investimento", "matematica", "historia do brasil",
+    ),
+}
+
+RESPOSTA_SAUDACAO = (
+    "Olá! Sou o PersonalIA, seu personal trainer digital. 💪 "
+    "Posso montar um **plano de treino** para você ou tirar **dúvidas sobre a execução** "
+    "de exercícios. Como posso ajudar?"
+)
+
+RESPOSTA_FORA_DO_TEMA = (
+    "Sou uma IA de treino e só posso responder sobre **exercícios físicos** e **planos de treino**. "
+    "Se quiser, me conte seu objetivo e monto um treino para você!"
+)
+
+RESPOSTAS_LOCAIS = {SAUDACAO: RESPOSTA_SAUDACAO, FORA_DO_TEMA: RESPOSTA_FORA_DO_TEMA}
+
+intencoes_total = metrics.counter(
+    "intent_router_total", "Mensagens classificadas pelo roteador de intenção"
+)
+
+_RE_TOKEN = re.compile(r"\w+")
+_FIM = "$"
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas e sem acentos ("Execução" -> "execucao")."""
+    decomposto = unicodedata.normalize("NFKD", (texto or "").lower())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def tokenizar(texto: str) -> List[str]:
+    return _RE_TOKEN.findall(normalizar(texto))
+
+
+class KeywordAutomaton:
+    """Trie de tokens: encontra expressões de uma ou mais palavras inteiras."""
+
+    def __init__(self, palavras_chave: Dict[str, Iterable[str]]) -> None:
+        self._raiz: dict = {}
+        for categoria, expressoes in palavras_chave.items():
+            for expressao in expressoes:
+                no = self._raiz
+                for token in tokenizar(expressao):
+                    no = no.setdefault(token, {})
+                no.setdefault(_FIM, set()).add(categoria)
+
+    def categorias(self, tokens: List[str]) -> Set[str]:
+        """Conjunto de categorias cujas expressões aparecem em `tokens`."""
+        encontradas: Set[str] = set()
+        raiz = self._raiz
+        for i in range(len(tokens)):
+            no = raiz.get(tokens[i])
+            j = i + 1
+            while no is not None:
+                fim = no.get(_FIM)
+                if fim:
+                    encontradas.update(fim)
+                if j >= len(tokens):
+                    break
+                no = no.get(tokens[j])
+                j += 1
+        return encontradas
+
+
+_automato = KeywordAutomaton(PALAVRAS_CHAVE)
+
+
+def classificar(mensagem: str) -> str:
+    """Retorna a intenção da mensagem (PLANO, DUVIDA, SAUDACAO ou FORA_DO_TEMA)."""
+    tokens = tokenizar(mensagem)
+    cats = _automato.categorias(tokens)
+    sobre_treino = bool(cats & {_KW_PLANO, _KW_DUVIDA, _KW_TREINO})
+
+    if not sobre_treino:
+        if _KW_FORA in cats:
+            intencao = FORA_DO_TEMA
+        elif _KW_SAUDACAO in cats or not tokens:
+            intencao = SAUDACAO
+        else:
+            # Sem vocabulário conhecido: deixa o Gemini decidir
+            intencao = DUVIDA
+    elif _KW_PLANO in cats and _KW_DUVIDA not in cats and len(tokens) >= 6:
+        intencao = PLANO
+    else:
+        intencao = DUVIDA
+
+    intencoes_total.inc(intencao=intencao)
+    return intencao
+
+
+def resposta_local(intencao: str) -> Optional[str]:
+    """Resposta pronta para intenções que não precisam do Gemini (ou None)."""
+    return RESPOSTAS_LOCAIS.get(intencao)
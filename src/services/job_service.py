@@ -0,0 +1,281 @@
+"""
+Fila durável de geração de planos (collection `jobs` no MongoDB).
+
+Fluxo:
+1. `criar_job` grava o pedido com status "pendente" (a rota responde 202);
+2. um worker chama `reivindicar_job`, que troca atomicamente o status para
+   "processando" e define um lease (`lease_ate`). Jobs cujo lease venceu
+   (worker morto/reiniciado) voltam a ser reivindicáveis enquanto houver
+   tentativas; os que já esgotaram `max_tentativas` viram "erro". Enquanto processa,
+   o worker renova o lease a cada terço do prazo (`renovar_lease`);
+3. o worker gera o plano com o `gemini_service`, salva com
+   `treino_service.salvar_treino` e marca o job como "concluido" — ou o
+   devolve para "pendente" até `max_tentativas`, e então "erro". Respostas
+   de erro do Gemini contam como falha. Se o lease foi perdido (outro
+   worker reivindicou o job), o resultado é descartado sem salvar. O treino
+   leva o `job_id`: se o job for reprocessado depois de salvo (lease vencido
+   antes de `concluir_job`), o treino existente é reaproveitado.
+
+Os workers rodam como corrotinas no processo da API (`iniciar_workers`,
+chamado no lifespan) ou num processo separado (`python -m scripts.job_worker`).
+"""
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from config.settings import settings
+from database import mongodb
+from models.schemas import MensagemChat
+from utils.metrics import registry as metrics
+
+PENDENTE = "pendente"
+PROCESSANDO = "processando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+# Status só da métrica: o job foi reivindicado por outro worker durante o processamento
+LEASE_PERDIDO = "lease_perdido"
+
+jobs_processados = metrics.counter("jobs_processed_total", "Jobs de geração de plano finalizados por status")
+
+
+def _collection():
+    # Acessado pelo módulo para refletir a conexão atual (e patches nos testes)
+    return mongodb.jobs_collection
+
+
+def _id_worker() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def criar_job(usuario_id: str, email: str, data: MensagemChat) -> dict:
+    """Enfileira um pedido de plano e retorna o documento criado (SÍNCRONO)."""
+    collection = _collection()
+    if collection is None:
+        raise RuntimeError("Conexão com banco de dados não disponível")
+
+    agora = datetime.utcnow()
+    job = {
+        "tipo": "plano_treino",
+        "status": PENDENTE,
+        "usuario_id": usuario_id,
+        "email": email,
+        "mensagem": data.model_dump(),
+        "tentativas": 0,
+        "max_tentativas": settings.JOBS_MAX_TENTATIVAS,
+        "criado_em": agora,
+        "atualizado_em": agora,
+        "lease_ate": None,
+    }
+    result = collection.insert_one(dict(job))
+    job["_id"] = str(result.inserted_id)
+    return job
+
+
+def buscar_job(job_id: str) -> Optional[dict]:
+    """Retorna o job pelo id (ou None)."""
+    collection = _collection()
+    if collection is None or not ObjectId.is_valid(job_id):
+        return None
+    doc = collection.find_one({"_id": ObjectId(job_id)})
+    if doc:
+        doc["_id"] = str(doc["_id"])
+    return doc
+
+
+def _esgotar_vencidos(collection, agora: datetime) -> None:
+    """Marca como erro os jobs com lease vencido que já usaram todas as tentativas."""
+    collection.update_many(
+        {
+            "status": PROCESSANDO,
+            "lease_ate": {"$lt": agora},
+            "$expr": {"$gte": ["$tentativas", "$max_tentativas"]},
+        },
+        {"$set": {
+            "status": ERRO,
+            "erro": "Lease vencido após o número máximo de tentativas",
+            "lease_ate": None,
+            "atualizado_em": agora,
+        }},
+    )
+
+
+def reivindicar_job(worker_id: str, lease_seconds: Optional[int] = None) -> Optional[dict]:
+    """Reivindica atomicamente o job pendente mais antigo (ou com lease vencido e tentativas restantes)."""
+    collection = _collection()
+    if collection is None:
+        return None
+
+    agora = datetime.utcnow()
+    lease_seconds = lease_seconds or settings.JOBS_LEASE_SECONDS
+    _esgotar_vencidos(collection, agora)
+    return collection.find_one_and_update(
+        {"$or": [
+            {"status": PENDENTE},
+            {
+                "status": PROCESSANDO,
+                "lease_ate": {"$lt": agora},
+                "$expr": {"$lt": ["$tentativas", "$max_tentativas"]},
+            },
+        ]},
+        {
+            "$set": {
+                "status": PROCESSANDO,
+                "worker_id": worker_id,
+                "lease_ate": agora + timedelta(seconds=lease_seconds),
+                "atualizado_em": agora,
+            },
+            "$inc": {"tentativas": 1},
+        },
+        sort=[("criado_em", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _filtro_lease(job_id, worker_id: str, agora: datetime) -> dict:
+    """Filtro que só casa se o lease do job ainda é deste worker e não venceu."""
+    return {"_id": job_id, "worker_id": worker_id, "status": PROCESSANDO, "lease_ate": {"$gt": agora}}
+
+
+def renovar_lease(job_id, worker_id: str, lease_seconds: Optional[int] = None) -> bool:
+    """Estende o lease do job; False se ele já não pertence a este worker."""
+    agora = datetime.utcnow()
+    lease_seconds = lease_seconds or settings.JOBS_LEASE_SECONDS
+    result = _collection().update_one(
+        _filtro_lease(job_id, worker_id, agora),
+        {"$set": {"lease_ate": agora + timedelta(seconds=lease_seconds), "atualizado_em": agora}},
+    )
+    return result.modified_count == 1
+
+
+def concluir_job(job_id, worker_id: str, resultado: dict) -> bool:
+    """Marca o job como concluído; False se o lease já não pertence a este worker."""
+    agora = datetime.utcnow()
+    result = _collection().update_one(
+        _filtro_lease(job_id, worker_id, agora),
+        {"$set": {
+            "status": CONCLUIDO,
+            "resultado": resultado,
+            "lease_ate": None,
+            "atualizado_em": agora,
+        }},
+    )
+    return result.modified_count == 1
+
+
+def falhar_job(job: dict, worker_id: str, erro: str) -> str:
+    """Devolve o job para a fila ou o marca como erro após `max_tentativas`."""
+    esgotado = job.get("tentativas", 0) >= job.get("max_tentativas", settings.JOBS_MAX_TENTATIVAS)
+    status = ERRO if esgotado else PENDENTE
+    _collection().update_one(
+        {"_id": job["_id"], "worker_id": worker_id, "status": PROCESSANDO},
+        {"$set": {
+            "status": status,
+            "erro": erro,
+            "lease_ate": None,
+            "atualizado_em": datetime.utcnow(),
+        }},
+    )
+    return status
+
+
+async def _manter_lease(job_id, worker_id: str, perdido: asyncio.Event) -> None:
+    """Renova o lease a cada terço do prazo até ser cancelada ou perdê-lo."""
+    intervalo = settings.JOBS_LEASE_SECONDS / 3
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            renovado = await asyncio.to_thread(renovar_lease, job_id, worker_id)
+        except Exception as e:
+            # Falha transitória do banco: tenta de novo no próximo intervalo
+            print(f"Erro ao renovar lease do job {job_id}: {e}")
+            continue
+        if not renovado:
+            perdido.set()
+            return
+
+
+async def processar_job(job: dict, worker_id: str) -> str:
+    """Gera e salva o plano de um job já reivindicado. Retorna o status final."""
+    # Imports tardios: evitam ciclos (treino_service -> gemini_service -> ...)
+    from services import contexto_usuario_service, gemini_service, treino_service
+
+    perdido = asyncio.Event()
+    heartbeat = asyncio.create_task(_manter_lease(job["_id"], worker_id, perdido))
+    try:
+        data = MensagemChat(**job["mensagem"])
+        contexto = await asyncio.to_thread(contexto_usuario_service.obter, job["email"])
+        if not contexto:
+            raise ValueError("Usuário não encontrado")
+
+        user, historico = contexto["user"], contexto["historico"]
+        plano = await gemini_service.gerar_plano_de_treino_async(data, user=user, historico=historico)
+        if gemini_service.resposta_de_erro(plano):
+            raise RuntimeError(plano or "Resposta vazia do Gemini")
+
+        # Renova antes de salvar: sem o lease, outro worker já refaz o job
+        heartbeat.cancel()
+        if perdido.is_set() or not await asyncio.to_thread(renovar_lease, job["_id"], worker_id):
+            print(f"⚠️ Lease do job {job['_id']} perdido; resultado descartado")
+            status = LEASE_PERDIDO
+        else:
+            # Reprocessamento de um job já salvo (lease vencido antes de concluir): não duplica
+            treino = await asyncio.to_thread(treino_service.buscar_treino_do_job, job["_id"])
+            if treino is None:
+                user_context = treino_service.montar_user_context(user, data)
+                user_context["job_id"] = str(job["_id"])
+                treino = await asyncio.to_thread(
+                    treino_service.salvar_treino,
+                    usuario_id=str(user["_id"]), plano_gerado=plano, user_context=user_context,
+                )
+            resultado = {"treino_id": str(treino.get("_id")), "treino": treino}
+            if await asyncio.to_thread(concluir_job, job["_id"], worker_id, resultado):
+                status = CONCLUIDO
+            else:
+                print(f"⚠️ Lease do job {job['_id']} venceu antes da conclusão")
+                status = LEASE_PERDIDO
+    except Exception as e:
+        print(f"Erro ao processar job {job.get('_id')}: {e}")
+        status = await asyncio.to_thread(falhar_job, job, worker_id, str(e))
+    finally:
+        heartbeat.cancel()
+
+    jobs_processados.inc(status=status)
+    return status
+
+
+async def executar_worker(parar: asyncio.Event, worker_id: Optional[str] = None) -> None:
+    """Laço de um worker: reivindica e processa jobs até `parar` ser sinalizado."""
+    worker_id = worker_id or _id_worker()
+    while not parar.is_set():
+        try:
+            job = await asyncio.to_thread(reivindicar_job, worker_id)
+        except Exception as e:
+            print(f"Erro ao reivindicar job: {e}")
+            job = None
+
+        if job is None:
+            # Fila vazia: espera o intervalo de polling (ou o sinal de parada)
+            try:
+                await asyncio.wait_for(parar.wait(), timeout=settings.JOBS_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        try:
+            await processar_job(job, worker_id)
+        except Exception as e:
+            # Ex: `falhar_job` sem banco; o lease vence e o job volta para a fila
+            print(f"Erro no worker {worker_id} com o job {job.get('_id')}: {e}")
+
+
+def iniciar_workers(quantidade: int, parar: asyncio.Event) -> List[asyncio.Task]:
+    """Cria `quantidade` workers no loop atual (sem banco, nenhum é criado)."""
+    if quantidade <= 0 or _collection() is None:
+        return []
+    return [asyncio.create_task(executar_worker(parar)) for _ in range(quantidade)]
@@ -0,0 +1,255 @@
+"""
+Pré-geração em lote dos planos semanais dos usuários ativos.
+
+Na segunda de manhã quase todos os usuários pedem um plano ao mesmo tempo.
+Este serviço gera os planos antes (ex: domingo à noite, via
+`python -m scripts.pregerar_planos`), para que no horário de pico o plano
+já esteja salvo e seja só uma leitura no banco (`GET /treinos/`).
+
+- Usuários ativos: não desativados (`ativo != False`) e com histórico de treinos
+  (`resumo_historico` preenchido). Eles são lidos em páginas ordenadas por `_id`.
+- Cada página é processada com paralelismo limitado (semáforo) pelo
+  `gemini_service`, que já aplica o limitador, as retentativas e o circuit breaker.
+- Os planos são salvos por `treino_service.salvar_treino` com `pregerado=True`
+  e `lote_pregeracao` (ex: "2025-W06").
+- O progresso fica num checkpoint na collection `meta`. Depois de uma queda,
+  a execução do mesmo lote continua da última página concluída, e usuários
+  que já têm plano do lote são pulados.
+- No pico, `POST /treinos/` (e `/treinos/stream`) entrega o plano pré-gerado
+  do lote da semana atual quando o pedido é o plano semanal padrão (intenção
+  PLANO com nível, objetivo, equipamentos e frequência do perfil), sem chamar
+  o Gemini. Cada plano é servido uma vez (`servido_em`); pedidos seguintes ou
+  com outros parâmetros geram um plano novo.
+- Usuários cuja geração falhou ficam em `falhas_ids` no checkpoint e são
+  tentados de novo na próxima execução; o lote só é marcado `concluido`
+  sem falhas pendentes. Com o circuit breaker do Gemini aberto, a execução
+  para (os usuários da página ficam como falha) para ser retomada depois.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from bson import ObjectId
+
+from config.settings import settings
+from database import mongodb
+from models.schemas import MensagemChat
+from utils.metrics import registry as metrics
+
+GERADO = "gerado"
+PULADO = "pulado"
+FALHA = "falha"
+# Campo do checkpoint com os `_id`s cuja geração falhou (tentados de novo)
+FALHAS_IDS = "falhas_ids"
+
+pregeracoes = metrics.counter("pregeracao_total", "Planos processados pela pré-geração em lote")
+
+def lote_da_semana(referencia: Optional[datetime] = None) -> str:
+    """Identificador ISO da semana seguinte à data de referência (ex: "2025-W06")."""
+    ano, semana, _ = ((referencia or datetime.utcnow()) + timedelta(days=7)).isocalendar()
+    return f"{ano}-W{semana:02d}"
+
+
+def lote_atual(referencia: Optional[datetime] = None) -> str:
+    """Lote pré-gerado para a semana da data de referência (o gerado na semana anterior)."""
+    return lote_da_semana((referencia or datetime.utcnow()) - timedelta(days=7))
+
+
+def filtro_usuarios_ativos() -> dict:
+    return {"ativo": {"$ne": False}, "resumo_historico": {"$nin": [None, ""]}}
+
+
+def montar_mensagem_semanal(user: dict) -> MensagemChat:
+    """Pedido de plano da semana a partir do perfil salvo no cadastro."""
+    equipamentos = [e.strip() for e in (user.get("equipamentos") or "").split(",") if e.strip()]
+    return MensagemChat(
+        mensagem_usuario="Monte meu plano de treino completo para a próxima semana",
+        nivel=user.get("nivel") or "iniciante",
+        objetivo=user.get("objetivo") or "condicionamento",
+        equipamentos=equipamentos or ["peso corporal"],
+        frequencia=user.get("frequencia") or "2 dias por semana",
+    )
+
+
+# --- checkpoint ---------------------------------------------------------------
+
+def pedido_semanal(user: dict, data: MensagemChat) -> bool:
+    """True se o pedido é o plano da semana com os parâmetros do perfil (o que foi pré-gerado)."""
+    from services import intent_router
+
+    if intent_router.classificar(data.mensagem_usuario) != intent_router.PLANO:
+        return False
+    padrao = montar_mensagem_semanal(user)
+    return all(
+        getattr(data, campo) == getattr(padrao, campo)
+        for campo in ("nivel", "objetivo", "equipamentos", "frequencia")
+    )
+
+
+async def servir_pregerado(user: dict, data: MensagemChat) -> Optional[dict]:
+    """Plano pré-gerado do lote atual para o pedido semanal, marcado como servido.
+
+    Retorna None (e a rota gera um plano novo) se o pedido não é o semanal
+    padrão ou se o usuário não tem plano do lote ainda não servido.
+    """
+    from repositories.treino_repository import treino_repo
+    from services import treino_service
+
+    if not pedido_semanal(user, data):
+        return None
+    doc = await treino_repo.find_one_and_update(
+        {
+            "usuario_id": ObjectId(str(user["_id"])),
+            "lote_pregeracao": lote_atual(),
+            "servido_em": {"$exists": False},
+        },
+        {"$set": {"servido_em": datetime.utcnow()}},
+    )
+    if doc is None:
+        return None
+    pregeracoes.inc(status="servido")
+    return treino_service._formatar_treino(doc)
+
+
+def _checkpoints():
+    return mongodb.db["meta"] if mongodb.db is not None else None
+
+
+def carregar_checkpoint(lote: str) -> dict:
+    collection = _checkpoints()
+    doc = collection.find_one({"_id": f"pregeracao:{lote}"}) if collection is not None else None
+    return doc or {"_id": f"pregeracao:{lote}", "ultimo_id": None, GERADO: 0, PULADO: 0, FALHA: 0, FALHAS_IDS: []}
+
+
+def salvar_checkpoint(checkpoint: dict) -> None:
+    collection = _checkpoints()
+    if collection is None:
+        return
+    checkpoint["atualizado_em"] = datetime.utcnow()
+    collection.replace_one({"_id": checkpoint["_id"]}, checkpoint, upsert=True)
+
+
+# --- processamento ------------------------------------------------------------
+
+def _buscar_pagina(ultimo_id, tamanho: int) -> list:
+    filtro = filtro_usuarios_ativos()
+    if ultimo_id is not None:
+        filtro["_id"] = {"$gt": ultimo_id}
+    cursor = mongodb.usuarios_collection.find(filtro, {"hashed_password": 0, "token": 0})
+    return list(cursor.sort("_id", 1).limit(tamanho))
+
+
+def _buscar_usuarios(ids: list) -> list:
+    filtro = {**filtro_usuarios_ativos(), "_id": {"$in": ids}}
+    cursor = mongodb.usuarios_collection.find(filtro, {"hashed_password": 0, "token": 0})
+    return list(cursor.sort("_id", 1))
+
+
+def _breaker_aberto() -> bool:
+    from services import gemini_service
+
+    return gemini_service.gemini_breaker.estado == gemini_service.ABERTO
+
+
+def _ja_pregerado(usuario_id, lote: str) -> bool:
+    collection = mongodb.treinos_collection
+    if collection is None:
+        return False
+    return collection.count_documents({"usuario_id": usuario_id, "lote_pregeracao": lote}, limit=1) > 0
+
+
+async def pregerar_usuario(user: dict, lote: str) -> str:
+    """Gera e salva o plano da semana de um usuário. Retorna GERADO, PULADO ou FALHA."""
+    # Imports tardios: evitam ciclos (treino_service -> gemini_service -> ...)
+    from services import gemini_service, historico_service, treino_service
+
+    try:
+        if await asyncio.to_thread(_ja_pregerado, user["_id"], lote):
+            return PULADO
+
+        data = montar_mensagem_semanal(user)
+        historico = await asyncio.to_thread(historico_service.obter_resumo_historico, user)
+        plano = await gemini_service.gerar_plano_de_treino_async(data, user=user, historico=historico)
+        if gemini_service.resposta_de_erro(plano):
+            print(f"⚠️ Pré-geração falhou para {user['_id']}: {plano}")
+            return FALHA
+
+        user_context = treino_service.montar_user_context(user, data)
+        user_context.update({"pregerado": True, "lote_pregeracao": lote})
+        await asyncio.to_thread(
+            treino_service.salvar_treino,
+            usuario_id=str(user["_id"]), plano_gerado=plano, user_context=user_context,
+        )
+        return GERADO
+    except Exception as e:
+        print(f"⚠️ Pré-geração falhou para {user.get('_id')}: {e}")
+        return FALHA
+
+
+async def pregerar_planos(
+    lote: Optional[str] = None,
+    paralelismo: Optional[int] = None,
+    tamanho_pagina: Optional[int] = None,
+    limite: Optional[int] = None,
+) -> dict:
+    """Pré-gera os planos do lote para todos os usuários ativos. Retorna o checkpoint final."""
+    if mongodb.usuarios_collection is None:
+        raise RuntimeError("Conexão com banco de dados não disponível")
+
+    lote = lote or lote_da_semana()
+    paralelismo = paralelismo or settings.PREGERACAO_PARALELISMO
+    tamanho_pagina = tamanho_pagina or settings.PREGERACAO_TAMANHO_PAGINA
+
+    checkpoint = await asyncio.to_thread(carregar_checkpoint, lote)
+    if checkpoint.get("concluido"):
+        print(f"✅ Lote {lote} já concluído")
+        return checkpoint
+
+    semaforo = asyncio.Semaphore(paralelismo)
+
+    async def processar(user: dict) -> str:
+        async with semaforo:
+            # Breaker aberto: nem tenta (o usuário fica para a próxima execução)
+            status = FALHA if _breaker_aberto() else await pregerar_usuario(user, lote)
+        pregeracoes.inc(status=status)
+        return status
+
+    async def processar_pagina(pagina: list) -> None:
+        for user, status in zip(pagina, await asyncio.gather(*[processar(user) for user in pagina])):
+            checkpoint[status] = checkpoint.get(status, 0) + 1
+            if status == FALHA:
+                checkpoint.setdefault(FALHAS_IDS, []).append(user["_id"])
+
+    # Primeiro, as falhas de execuções anteriores (as que falharem de novo voltam à lista)
+    pendentes = checkpoint.get(FALHAS_IDS) or []
+    if pendentes and not _breaker_aberto():
+        checkpoint[FALHAS_IDS] = []
+        await processar_pagina(await asyncio.to_thread(_buscar_usuarios, pendentes))
+        await asyncio.to_thread(salvar_checkpoint, checkpoint)
+
+    processados = 0
+    while limite is None or processados < limite:
+        if _breaker_aberto():
+            print(f"⛔ {lote}: circuit breaker do Gemini aberto; execute de novo para continuar")
+            break
+
+        tamanho = tamanho_pagina if limite is None else min(tamanho_pagina, limite - processados)
+        pagina = await asyncio.to_thread(_buscar_pagina, checkpoint["ultimo_id"], tamanho)
+        if not pagina:
+            # Só termina o lote sem falhas pendentes
+            checkpoint["concluido"] = not checkpoint.get(FALHAS_IDS)
+            break
+
+        await processar_pagina(pagina)
+        processados += len(pagina)
+
+        # Só avança o checkpoint com a página inteira processada (falhas ficam em FALHAS_IDS)
+        checkpoint["ultimo_id"] = pagina[-1]["_id"]
+        await asyncio.to_thread(salvar_checkpoint, checkpoint)
+        print(
+            f"📦 {lote}: {checkpoint.get(GERADO, 0)} gerados, {checkpoint.get(PULADO, 0)} pulados, "
+            f"{checkpoint.get(FALHA, 0)} falhas (até {checkpoint['ultimo_id']})"
+        )
+
+    await asyncio.to_thread(salvar_checkpoint, checkpoint)
+    return checkpoint
@@ -1,22 +1,26 @@
-from database.mongodb import usuarios_collection
+from fastapi.concurrency import run_in_threadpool
+
+from repositories.usuario_repository import usuario_repo
 from schemas import DadosUsr
 from services.email_service import enviar_email
 from utils.hash import hash_pass
 from utils.reset import criar_token, verifica_token
 
-def criar_usuario(data: DadosUsr):
+# Funções assíncronas: usam o repositório Motor; hash e envio de e-mail
+# (bloqueantes) rodam no threadpool.
+
+async def criar_usuario(data: DadosUsr):
 
-    usr_data = ler_usuario(data.email_usuario)
+    usr_data = await ler_usuario(data.email_usuario)
     if not usr_data:
         usr_data = data.model_dump()
         usr_data["email"] = usr_data.pop("email_usuario")
         usr_data.pop("senha_usuario")
-        hash_senha = hash_pass(data.senha_usuario)
+        hash_senha = await run_in_threadpool(hash_pass, data.senha_usuario)
         usr_data.update({"senha_hash": hash_senha})
-        if usuarios_collection is not None:
-            usuario = usuarios_collection.insert_one(usr_data)
-            id_usuario = str(usuario.inserted_id)
-            usr_data["_id"] = id_usuario
+        if await usuario_repo.disponivel():
+            id_usuario = await usuario_repo.insert_one(usr_data)
+            usr_data["_id"] = str(id_usuario)
         # Não expor senha_hash ao retornar para a API
         usr_safe = {k: v for k, v in usr_data.items() if k != "senha_hash"}
         return "Cadastro feito com sucesso", usr_safe
@@ -28,33 +32,31 @@ def criar_usuario(data: DadosUsr):
     return "Já existe cadastro nesse email", usr_safe
 
 
-def ler_usuario(email_usuario: str):
-    if usuarios_collection is None:
-        return None
-    usuario = usuarios_collection.find_one({"email": f"{email_usuario}"})
+async def ler_usuario(email_usuario: str):
+    usuario = await usuario_repo.buscar_por_email(f"{email_usuario}")
     if usuario:
         usuario["_id"] = str(usuario["_id"])
     return usuario
 
 
-def solicitar_recuperacao(email_usuario: str):
-    usuario = ler_usuario(email_usuario)
+async def solicitar_recuperacao(email_usuario: str):
+    usuario = await ler_usuario(email_usuario)
     if not usuario:
         return "Usuário não existe", usuario
     token = criar_token(email_usuario)
-    usuarios_collection.update_one({"email": email_usuario}, {"$set": {"token": token}})
-    enviar_email(email_usuario, token)
+    await usuario_repo.atualizar_por_email(email_usuario, {"$set": {"token": token}})
+    await run_in_threadpool(enviar_email, email_usuario, token)
     return "Solicitação feita com sucesso", email_usuario
 
 
-def mudar_senha(token: str, senha_nova: str):
+async def mudar_senha(token: str, senha_nova: str):
     email = verifica_token(token)
     if not email:
         return "Token incorreto"
-    if usuarios_collection.find_one({"email": email, "token": token}):
-        senha_nova = hash_pass(senha_nova)
-        usuarios_collection.update_one(
-            {"email": email}, {"$set": {"senha_hash": senha_nova}, "$unset": {"token": token}}
+    if await usuario_repo.existe_com_token(email, token):
+        senha_nova = await run_in_threadpool(hash_pass, senha_nova)
+        await usuario_repo.atualizar_por_email(
+            email, {"$set": {"senha_hash": senha_nova}, "$unset": {"token": token}}
         )
         return "Senha alterada com sucesso"
-    return "Não foi possivel alterar a senha"
\ No newline at end of file
+    return "Não foi possivel alterar a senha"
@@ -1,13 +1,24 @@
+import base64
+import json
+import re
 from datetime import datetime
 from bson import ObjectId
 from fastapi import HTTPException
+from pymongo import UpdateOne
 
+from config.settings import settings
 # Importa a coleção SÍNCRONA do seu arquivo mongodb.py
-from database.mongodb import treinos_collection
+from database import mongodb
 
 # Import Gemini (se necessário para gerar plano)
 from services import gemini_service
-from typing import Optional
+from services import contexto_usuario_service
+from services import historico_service
+from repositories import leitura
+from repositories.treino_repository import ORDEM_PAGINA, filtro_pagina, treino_repo
+from repositories.usuario_repository import usuario_repo
+from typing import Iterable, Optional, Tuple
+from utils import compressao
 
 
 def gerar_plano_de_treino(data: Optional[object]) -> str:
@@ -24,6 +35,67 @@ def gerar_plano_de_treino(data: Optional[object]) -> str:
         return "Plano de treino (modo fallback)"
 
 
+def montar_user_context(user: dict, data) -> dict:
+    """Contexto do usuário salvo junto com o treino gerado."""
+    return {
+        "email": user.get("email"),
+        "idade": user.get("idade"),
+        "peso": user.get("peso"),
+        "altura": user.get("altura"),
+        "objetivo": user.get("objetivo"),
+        "frequencia": user.get("frequencia"),
+        "limitacoes": user.get("limitacoes"),
+        "mensagem_usuario": data.mensagem_usuario, # Salva a pergunta também
+    }
+
+
+_TITULO = re.compile(r"Plano de Treino:\s*(.+)", re.IGNORECASE)
+TITULO_MAX = 120
+
+# Campos que a listagem pode devolver (`fields`) e a visão resumida (`view=summary`)
+CAMPOS_TREINO = ("usuario_id", "nivel", "objetivo", "equipamentos", "plano_gerado", "criado_em", "titulo")
+CAMPOS_RESUMO = ("criado_em", "objetivo", "titulo")
+
+
+def extrair_titulo(plano_gerado: Optional[str]) -> Optional[str]:
+    """Título curto a partir do cabeçalho "Plano de Treino: ..." do plano."""
+    if not isinstance(plano_gerado, str):
+        return None
+    match = _TITULO.search(plano_gerado)
+    if not match:
+        return None
+    # Remove marcação de markdown que costuma vir no cabeçalho (#, **, _)
+    titulo = match.group(1).strip().strip("*_#` ").strip()
+    return titulo[:TITULO_MAX] or None
+
+
+def resolver_campos(view: Optional[str] = None, fields: Optional[str] = None) -> Optional[Tuple[str, ...]]:
+    """Campos pedidos na listagem; None = documento completo. Levanta ValueError se inválidos."""
+    if fields:
+        campos = tuple(dict.fromkeys(c.strip() for c in fields.split(",") if c.strip()))
+        invalidos = [c for c in campos if c not in CAMPOS_TREINO]
+        if invalidos:
+            raise ValueError(f"Campos inválidos: {', '.join(invalidos)}")
+        return campos
+    if view == "summary":
+        return CAMPOS_RESUMO
+    if view not in (None, "full"):
+        raise ValueError(f"View inválida: {view}")
+    return None
+
+
+def _projecao(campos: Optional[Iterable[str]]) -> Optional[dict]:
+    """Projeção do Mongo para os campos pedidos (o plano inclui a forma comprimida)."""
+    if campos is None:
+        return None
+    projecao = {campo: 1 for campo in campos}
+    if "plano_gerado" in projecao:
+        projecao.update({compressao.CAMPO_BINARIO: 1, compressao.CAMPO_CODEC: 1})
+    # criado_em sempre vem: é a chave do cursor de paginação
+    projecao["criado_em"] = 1
+    return projecao
+
+
 def salvar_treino(usuario_id: str, plano_gerado=None, user_context: Optional[dict] = None) -> dict:
     """Salva um treino.
 
@@ -44,30 +116,21 @@ def salvar_treino(usuario_id: str, plano_gerado=None, user_context: Optional[dic
         doc_context = user_context or {}
 
     # Se não há collection disponível, usamos modo mock (como esperado nos testes)
-    if treinos_collection is None:
-        mock_doc = {
-            "_id": "mock_id",
-            "usuario_id": usuario_id,
-            "plano_gerado": plano_gerado,
-            "criado_em": datetime.utcnow(),
-        }
-        # mesclar context se existir
-        mock_doc.update(doc_context)
-        return mock_doc
+    if mongodb.treinos_collection is None:
+        return _documento_mock(usuario_id, plano_gerado, doc_context)
 
     # Prepara documento para inserir
-    treino_doc = dict(doc_context) if isinstance(doc_context, dict) else {}
-    treino_doc.update({
-        "usuario_id": ObjectId(usuario_id) if not isinstance(usuario_id, ObjectId) else usuario_id,
-        "plano_gerado": plano_gerado,
-        "criado_em": datetime.utcnow(),
-    })
+    treino_doc = _novo_documento(usuario_id, plano_gerado, doc_context)
 
     try:
         # Passe uma cópia para o insert_one para que alterações posteriores
         # no dicionário local não modifiquem o objeto enviado ao mock nos testes.
-        result = treinos_collection.insert_one(dict(treino_doc))
+        result = mongodb.treinos_collection.insert_one(_documento_para_banco(treino_doc))
         treino_doc["_id"] = str(result.inserted_id)
+        _marcar_escrita(treino_doc["usuario_id"], treino_doc["criado_em"])
+        _atualizar_resumo_historico(treino_doc["usuario_id"], plano_gerado, treino_doc["criado_em"])
+        # O resumo mudou: o contexto em cache do usuário fica desatualizado
+        contexto_usuario_service.invalidar(treino_doc.get("email"))
         # converte usuario_id para string para retorno
         treino_doc["usuario_id"] = str(treino_doc["usuario_id"])
         return treino_doc
@@ -79,43 +142,293 @@ def salvar_treino(usuario_id: str, plano_gerado=None, user_context: Optional[dic
         return treino_doc
 
 
-def listar_treinos_por_usuario(usuario_id: str) -> list:
-    """Retorna todos os treinos salvos de um usuário (SÍNCRONO)."""
-    if treinos_collection is None:
-        return []
+async def salvar_treino_async(usuario_id: str, plano_gerado: str, user_context: Optional[dict] = None) -> dict:
+    """Versão ASSÍNCRONA de `salvar_treino` (Motor), usada pelas rotas."""
+    doc_context = user_context or {}
+    if not await treino_repo.disponivel():
+        return _documento_mock(usuario_id, plano_gerado, doc_context)
+
+    treino_doc = _novo_documento(usuario_id, plano_gerado, doc_context)
+    try:
+        inserted_id = await treino_repo.insert_one(_documento_para_banco(treino_doc))
+        treino_doc["_id"] = str(inserted_id)
+        try:
+            await usuario_repo.atualizar_por_id(
+                treino_doc["usuario_id"], {"$set": {leitura.CAMPO_ESCRITA: treino_doc["criado_em"]}}
+            )
+        except Exception as e:
+            print(f"Erro ao marcar escrita do usuário: {e}")
+        try:
+            await historico_service.registrar_treino_no_resumo_async(
+                treino_doc["usuario_id"], plano_gerado, treino_doc["criado_em"]
+            )
+        except Exception as e:
+            print(f"Erro ao atualizar resumo do histórico: {e}")
+        contexto_usuario_service.invalidar(treino_doc.get("email"))
+    except Exception as e:
+        print(f"Erro ao salvar no MongoDB: {e}")
+    treino_doc["usuario_id"] = str(treino_doc["usuario_id"])
+    return treino_doc
 
-    cursor = treinos_collection.find({"usuario_id": ObjectId(usuario_id)}).sort("criado_em", -1)
 
-    treinos = []
-    for t in cursor:
-        treinos.append({
-            "_id": str(t.get("_id")),
-            "usuario_id": str(t.get("usuario_id")) if t.get("usuario_id") is not None else None,
-            "nivel": t.get("nivel"),
-            "objetivo": t.get("objetivo"),
-            "equipamentos": t.get("equipamentos"),
-            "plano_gerado": t.get("plano_gerado"),
-            "criado_em": t.get("criado_em"),
-        })
-    return treinos
+def _documento_mock(usuario_id: str, plano_gerado: str, doc_context: dict) -> dict:
+    mock_doc = {
+        "_id": "mock_id",
+        "usuario_id": usuario_id,
+        "plano_gerado": plano_gerado,
+        "titulo": extrair_titulo(plano_gerado),
+        "criado_em": datetime.utcnow(),
+    }
+    # mesclar context se existir
+    mock_doc.update(doc_context)
+    return mock_doc
 
 
-def buscar_treino_por_id(treino_id: str) -> Optional[dict]:
-    """Busca um treino pelo seu ID. Retorna None se não encontrado ou collection ausente."""
-    if treinos_collection is None:
-        return None
+def _novo_documento(usuario_id, plano_gerado: str, doc_context: dict) -> dict:
+    treino_doc = dict(doc_context) if isinstance(doc_context, dict) else {}
+    treino_doc.update({
+        "usuario_id": ObjectId(usuario_id) if not isinstance(usuario_id, ObjectId) else usuario_id,
+        "plano_gerado": plano_gerado,
+        "titulo": extrair_titulo(plano_gerado),
+        "criado_em": datetime.utcnow(),
+    })
+    return treino_doc
 
-    doc = treinos_collection.find_one({"_id": ObjectId(treino_id)})
-    if not doc:
-        return None
 
-    return {
+def _documento_para_banco(treino_doc: dict) -> dict:
+    """Cópia do documento com o plano comprimido quando PLANO_COMPRESSAO está ativo."""
+    doc = dict(treino_doc)
+    doc.update(compressao.campos_do_plano(
+        doc.pop("plano_gerado", None), settings.PLANO_COMPRESSAO, settings.PLANO_COMPRESSAO_MIN_BYTES,
+    ))
+    return doc
+
+
+def _marcar_escrita(usuario_id, criado_em: datetime) -> None:
+    """Grava o horário do treino no usuário: as próximas listagens dele leem do primário."""
+    try:
+        if mongodb.usuarios_collection is not None:
+            mongodb.usuarios_collection.update_one(
+                {"_id": usuario_id}, {"$set": {leitura.CAMPO_ESCRITA: criado_em}}
+            )
+    except Exception as e:
+        print(f"Erro ao marcar escrita do usuário: {e}")
+
+
+def ler_do_primario(user: dict) -> bool:
+    """True logo após o usuário salvar um treino (read-your-writes nas listagens)."""
+    return leitura.escrito_recentemente(user.get(leitura.CAMPO_ESCRITA))
+
+
+def _atualizar_resumo_historico(usuario_id, plano_gerado: str, criado_em: datetime) -> None:
+    """Atualiza o resumo incremental do usuário; falhas não impedem o salvamento."""
+    try:
+        historico_service.registrar_treino_no_resumo(usuario_id, plano_gerado, criado_em)
+    except Exception as e:
+        print(f"Erro ao atualizar resumo do histórico: {e}")
+
+
+def _formatar_treino(doc: dict, campos: Optional[Iterable[str]] = None) -> dict:
+    """Documento de `treinos` no formato retornado pela API (só `campos`, se informados)."""
+    treino = {
         "_id": str(doc.get("_id")),
         "usuario_id": str(doc.get("usuario_id")) if doc.get("usuario_id") is not None else None,
         "nivel": doc.get("nivel"),
         "objetivo": doc.get("objetivo"),
         "equipamentos": doc.get("equipamentos"),
-        "plano_gerado": doc.get("plano_gerado"),
+        "plano_gerado": compressao.ler_plano(doc),
+        "titulo": doc.get("titulo"),
         "criado_em": doc.get("criado_em"),
     }
+    if campos is None:
+        return treino
+    return {"_id": treino["_id"], **{campo: treino[campo] for campo in campos}}
+
+
+def buscar_treino_do_job(job_id) -> Optional[dict]:
+    """Treino já salvo pelo job `job_id` (fila de geração) ou None."""
+    if mongodb.treinos_collection is None:
+        return None
+    doc = mongodb.treinos_collection.find_one({"job_id": str(job_id)})
+    return _formatar_treino(doc) if doc else None
+
+
+def listar_treinos_por_usuario(usuario_id: str, campos: Optional[Iterable[str]] = None) -> list:
+    """Retorna todos os treinos salvos de um usuário (SÍNCRONO)."""
+    if mongodb.treinos_collection is None:
+        return []
+
+    cursor = mongodb.treinos_collection.find({"usuario_id": ObjectId(usuario_id)}, _projecao(campos)).sort("criado_em", -1)
+    return [_formatar_treino(t, campos) for t in cursor]
+
+
+async def listar_treinos_por_usuario_async(
+    usuario_id: str, campos: Optional[Iterable[str]] = None, primario: bool = False
+) -> list:
+    """Versão ASSÍNCRONA de `listar_treinos_por_usuario` (Motor)."""
+    docs = await treino_repo.listar_por_usuario(ObjectId(usuario_id), _projecao(campos), primario=primario)
+    return [_formatar_treino(t, campos) for t in docs]
+
+
+def codificar_cursor(doc: dict) -> str:
+    """Cursor opaco com a posição (criado_em, _id) do último treino da página."""
+    posicao = {"c": doc["criado_em"].isoformat(), "i": str(doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(posicao).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Inverso de `codificar_cursor`. Levanta ValueError se o cursor for inválido."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        posicao = json.loads(bruto)
+        return datetime.fromisoformat(posicao["c"]), ObjectId(posicao["i"])
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def listar_treinos_paginado(
+    usuario_id: str, limit: int = 20, cursor: Optional[str] = None, campos: Optional[Iterable[str]] = None
+) -> dict:
+    """Uma página dos treinos do usuário, do mais recente para o mais antigo.
+
+    Paginação por keyset em (criado_em, _id), coberta pelo índice
+    (usuario_id, criado_em, _id): o custo de cada página não depende do
+    tamanho do histórico. `next_cursor` é None na última página. Com
+    `campos`, só eles são lidos do banco (projeção).
+    """
+    if mongodb.treinos_collection is None:
+        return {"itens": [], "next_cursor": None}
+
+    filtro = filtro_pagina(ObjectId(usuario_id), decodificar_cursor(cursor) if cursor else None)
+    # Um a mais para saber se existe próxima página
+    docs = list(mongodb.treinos_collection.find(filtro, _projecao(campos)).sort(ORDEM_PAGINA).limit(limit + 1))
+    return _montar_pagina(docs, limit, campos)
+
+
+async def listar_treinos_paginado_async(
+    usuario_id: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    campos: Optional[Iterable[str]] = None,
+    primario: bool = False,
+) -> dict:
+    """Versão ASSÍNCRONA de `listar_treinos_paginado` (Motor).
+
+    Com `primario` (ver `ler_do_primario`), lê do primário mesmo quando a
+    listagem está configurada para secundários.
+    """
+    posicao = decodificar_cursor(cursor) if cursor else None
+    docs = await treino_repo.listar_pagina(
+        ObjectId(usuario_id), limit + 1, posicao, _projecao(campos), primario=primario
+    )
+    return _montar_pagina(docs, limit, campos)
+
+
+def _montar_pagina(docs: list, limit: int, campos: Optional[Iterable[str]]) -> dict:
+    proximo = codificar_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return {"itens": [_formatar_treino(t, campos) for t in docs[:limit]], "next_cursor": proximo}
+
+
+def buscar_treino_por_id(treino_id: str) -> Optional[dict]:
+    """Busca um treino pelo seu ID. Retorna None se não encontrado ou collection ausente."""
+    if mongodb.treinos_collection is None:
+        return None
+
+    doc = mongodb.treinos_collection.find_one({"_id": ObjectId(treino_id)})
+    if not doc:
+        return None
+
+    return _formatar_treino(doc)
+
+
+async def buscar_treino_por_id_async(treino_id: str) -> Optional[dict]:
+    """Versão ASSÍNCRONA de `buscar_treino_por_id` (Motor)."""
+    doc = await treino_repo.buscar_por_id(treino_id)
+    return _formatar_treino(doc) if doc else None
+
+
+def migrar_compressao(
+    codec: Optional[str] = None, min_bytes: Optional[int] = None, tamanho_lote: int = 500, limite: Optional[int] = None
+) -> dict:
+    """Converte os planos já salvos para o codec informado (padrão: PLANO_COMPRESSAO).
+
+    Com codec "off", descomprime os documentos de volta para texto. Os já
+    comprimidos com outro codec (ex: zlib -> zstd) são recodificados. Os
+    documentos são lidos em lotes ordenados por `_id` e atualizados com
+    `bulk_write`. Retorna a contagem de documentos lidos e convertidos.
+    """
+    if mongodb.treinos_collection is None:
+        raise RuntimeError("Conexão com banco de dados não disponível")
+
+    codec = (codec or settings.PLANO_COMPRESSAO).lower()
+    min_bytes = settings.PLANO_COMPRESSAO_MIN_BYTES if min_bytes is None else min_bytes
+    if codec == "off":
+        filtro = {compressao.CAMPO_BINARIO: {"$exists": True}}
+    else:
+        # O $cond evita que $strLenBytes falhe em plano_gerado ausente ou não-texto
+        texto = {"$cond": [{"$eq": [{"$type": "$plano_gerado"}, "string"]}, "$plano_gerado", ""]}
+        filtro = {"$or": [
+            {"$expr": {"$gte": [{"$strLenBytes": texto}, min_bytes]}},
+            {compressao.CAMPO_CODEC: {"$exists": True, "$ne": compressao.resolver_codec(codec)}},
+        ]}
+
+    totais = {"lidos": 0, "convertidos": 0}
+    ultimo_id = None
+    while limite is None or totais["lidos"] < limite:
+        pagina_filtro = dict(filtro)
+        if ultimo_id is not None:
+            pagina_filtro["_id"] = {"$gt": ultimo_id}
+        tamanho = tamanho_lote if limite is None else min(tamanho_lote, limite - totais["lidos"])
+        projecao = {"plano_gerado": 1, compressao.CAMPO_BINARIO: 1, compressao.CAMPO_CODEC: 1}
+        docs = list(mongodb.treinos_collection.find(pagina_filtro, projecao).sort("_id", 1).limit(tamanho))
+        if not docs:
+            break
+
+        operacoes = []
+        for doc in docs:
+            texto = compressao.ler_plano(doc)
+            campos = compressao.campos_do_plano(texto, codec, 0 if codec == "off" else min_bytes)
+            if "plano_gerado" not in campos:
+                atualizacao = {"$set": campos, "$unset": {"plano_gerado": ""}}
+            elif compressao.CAMPO_BINARIO in doc:
+                atualizacao = {
+                    "$set": campos,
+                    "$unset": {compressao.CAMPO_BINARIO: "", compressao.CAMPO_CODEC: ""},
+                }
+            else:
+                continue  # não compensa comprimir: fica como texto
+            operacoes.append(UpdateOne({"_id": doc["_id"]}, atualizacao))
+
+        if operacoes:
+            mongodb.treinos_collection.bulk_write(operacoes, ordered=False)
+        totais["lidos"] += len(docs)
+        totais["convertidos"] += len(operacoes)
+        ultimo_id = docs[-1]["_id"]
+
+    return totais
+
+
+def preencher_titulos(tamanho_lote: int = 500) -> int:
+    """Grava `titulo` nos treinos salvos antes do campo existir. Retorna quantos foram atualizados."""
+    if mongodb.treinos_collection is None:
+        raise RuntimeError("Conexão com banco de dados não disponível")
+
+    filtro = {"titulo": {"$exists": False}}
+    projecao = {"plano_gerado": 1, compressao.CAMPO_BINARIO: 1, compressao.CAMPO_CODEC: 1}
+    atualizados = 0
+    ultimo_id = None
+    while True:
+        pagina_filtro = dict(filtro)
+        if ultimo_id is not None:
+            pagina_filtro["_id"] = {"$gt": ultimo_id}
+        docs = list(mongodb.treinos_collection.find(pagina_filtro, projecao).sort("_id", 1).limit(tamanho_lote))
+        if not docs:
+            return atualizados
 
+        operacoes = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"titulo": extrair_titulo(compressao.ler_plano(doc))}})
+            for doc in docs
+        ]
+        mongodb.treinos_collection.bulk_write(operacoes, ordered=False)
+        atualizados += len(operacoes)
+        ultimo_id = docs[-1]["_id"]
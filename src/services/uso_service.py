@@ -0,0 +1,106 @@
+"""
+Contabilidade de tokens do Gemini por usuário (collection `uso_tokens`).
+
+Cada documento acumula o uso de um usuário em um dia:
+
+    {"usuario_id": "...", "dia": "2025-01-31", "chamadas": 3,
+     "tokens_prompt": 4200, "tokens_resposta": 1800, "tokens_cache": 900,
+     "por_modo": {"plano": {...}, "chat": {...}}, "expira_em": <dia + retenção>}
+
+A janela é móvel: o índice TTL em `expira_em` apaga os dias mais antigos
+que `USO_TOKENS_RETENCAO_DIAS`.
+
+Para não adicionar uma escrita no banco a cada chamada ao Gemini, o uso é
+agregado em memória e descarregado em lote (`bulk_write`) a cada
+`USO_TOKENS_FLUSH_SECONDS`, numa thread em segundo plano, e no shutdown.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from config.settings import settings
+from database import mongodb
+
+_CAMPOS = ("chamadas", "tokens_prompt", "tokens_resposta", "tokens_cache")
+
+_lock = threading.Lock()
+_pendente: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+_ultimo_flush = time.monotonic()
+_descarregando = False
+
+
+def _dia(momento: Optional[datetime] = None) -> str:
+    return (momento or datetime.utcnow()).strftime("%Y-%m-%d")
+
+
+def registrar(
+    usuario_id: Optional[str], modo: str, tokens_prompt: int, tokens_resposta: int, tokens_cache: int = 0
+) -> None:
+    """Acumula o uso de uma chamada (sem I/O; o envio ao banco é em lote)."""
+    global _descarregando
+    if not usuario_id:
+        return
+
+    chave = (str(usuario_id), _dia(), modo)
+    with _lock:
+        uso = _pendente.setdefault(chave, dict.fromkeys(_CAMPOS, 0))
+        uso["chamadas"] += 1
+        uso["tokens_prompt"] += tokens_prompt
+        uso["tokens_resposta"] += tokens_resposta
+        uso["tokens_cache"] += tokens_cache
+
+        vencido = time.monotonic() - _ultimo_flush >= settings.USO_TOKENS_FLUSH_SECONDS
+        if not vencido or _descarregando:
+            return
+        _descarregando = True
+    threading.Thread(target=descarregar, daemon=True).start()
+
+
+def descarregar() -> int:
+    """Grava o uso acumulado no MongoDB. Retorna quantos documentos foram atualizados."""
+    global _pendente, _ultimo_flush, _descarregando
+    with _lock:
+        lote, _pendente = _pendente, {}
+        _ultimo_flush = time.monotonic()
+
+    try:
+        collection = mongodb.uso_tokens_collection
+        if not lote or collection is None:
+            return 0
+
+        expira_em = datetime.utcnow() + timedelta(days=settings.USO_TOKENS_RETENCAO_DIAS)
+        operacoes = []
+        for (usuario_id, dia, modo), uso in lote.items():
+            incrementos = {campo: uso[campo] for campo in _CAMPOS}
+            incrementos.update({f"por_modo.{modo}.{campo}": uso[campo] for campo in _CAMPOS})
+            operacoes.append(UpdateOne(
+                {"usuario_id": usuario_id, "dia": dia},
+                {"$inc": incrementos, "$set": {"atualizado_em": datetime.utcnow(), "expira_em": expira_em}},
+                upsert=True,
+            ))
+        collection.bulk_write(operacoes, ordered=False)
+        return len(operacoes)
+    except Exception as e:
+        # Uso é informativo: não derruba a requisição, mas não some em silêncio
+        print(f"⚠️ Falha ao gravar uso de tokens ({len(lote)} registros descartados): {e}")
+        return 0
+    finally:
+        with _lock:
+            _descarregando = False
+
+
+def obter_uso(usuario_id: str, dias: int = 30) -> dict:
+    """Soma o uso de tokens do usuário nos últimos `dias` (planejamento de capacidade/custo)."""
+    totais = dict.fromkeys(_CAMPOS, 0)
+    collection = mongodb.uso_tokens_collection
+    if collection is None:
+        return {"usuario_id": usuario_id, "dias": dias, **totais}
+
+    inicio = _dia(datetime.utcnow() - timedelta(days=dias - 1))
+    for doc in collection.find({"usuario_id": str(usuario_id), "dia": {"$gte": inicio}}):
+        for campo in _CAMPOS:
+            totais[campo] += doc.get(campo, 0)
+    return {"usuario_id": usuario_id, "dias": dias, **totais}
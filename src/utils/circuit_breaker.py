@@ -0,0 +1,121 @@
+"""Circuit breaker (fechado / aberto / semi-aberto) para chamadas a um provedor externo.
+
+- fechado: as chamadas passam; `limite_falhas` falhas consecutivas abrem o circuito;
+- aberto: as chamadas falham imediatamente com `CircuitoAberto`, sem tocar
+  no provedor, durante `tempo_aberto` segundos;
+- semi-aberto: até `sondas` chamadas de teste passam; sucesso fecha o
+  circuito, falha o abre de novo.
+
+Só falhas do provedor (timeouts, 5xx, 429) devem ser reportadas com
+`falha()`: erros de validação mostram que o provedor está respondendo.
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+from utils.metrics import Counter, Gauge
+
+FECHADO = "fechado"
+SEMI_ABERTO = "semi_aberto"
+ABERTO = "aberto"
+
+# Valor numérico do estado para o gauge
+_VALOR_ESTADO = {FECHADO: 0, SEMI_ABERTO: 1, ABERTO: 2}
+
+
+class CircuitoAberto(Exception):
+    """O circuito está aberto: a chamada nem foi feita ao provedor."""
+
+    def __init__(self, restante: float) -> None:
+        super().__init__(f"Circuito aberto: serviço indisponível, nova tentativa em {restante:.0f}s")
+        self.restante = restante
+
+
+class CircuitBreaker:
+    """Circuit breaker thread-safe com métricas das transições de estado."""
+
+    def __init__(
+        self,
+        limite_falhas: int = 5,
+        tempo_aberto: float = 30.0,
+        sondas: int = 1,
+        relogio: Callable[[], float] = time.monotonic,
+        transicoes: Optional[Counter] = None,
+        gauge_estado: Optional[Gauge] = None,
+    ) -> None:
+        self.limite_falhas = max(1, limite_falhas)
+        self.tempo_aberto = tempo_aberto
+        self.sondas = max(1, sondas)
+        self._relogio = relogio
+        self._transicoes = transicoes
+        self._gauge_estado = gauge_estado
+        self._lock = threading.Lock()
+        self._estado = FECHADO
+        self._falhas = 0
+        self._aberto_ate = 0.0
+        self._sondas_em_andamento = 0
+        self._prazo_sondas = 0.0
+        if gauge_estado is not None:
+            gauge_estado.set(_VALOR_ESTADO[FECHADO])
+
+    @property
+    def estado(self) -> str:
+        return self._estado
+
+    def _transicionar(self, novo: str) -> None:
+        # chamado com o lock adquirido
+        if novo == self._estado:
+            return
+        if self._transicoes is not None:
+            self._transicoes.inc(de=self._estado, para=novo)
+        if self._gauge_estado is not None:
+            self._gauge_estado.set(_VALOR_ESTADO[novo])
+        self._estado = novo
+
+    def _abrir(self, agora: float) -> None:
+        self._aberto_ate = agora + self.tempo_aberto
+        self._sondas_em_andamento = 0
+        self._transicionar(ABERTO)
+
+    def permitir(self) -> None:
+        """Autoriza uma chamada ou levanta `CircuitoAberto` (sem I/O)."""
+        with self._lock:
+            if self._estado == FECHADO:
+                return
+            agora = self._relogio()
+            if self._estado == ABERTO:
+                if agora < self._aberto_ate:
+                    raise CircuitoAberto(self._aberto_ate - agora)
+                self._transicionar(SEMI_ABERTO)
+                self._sondas_em_andamento = 0
+
+            # Sondas que nunca reportaram resultado não bloqueiam para sempre
+            if self._sondas_em_andamento and agora >= self._prazo_sondas:
+                self._sondas_em_andamento = 0
+            if self._sondas_em_andamento >= self.sondas:
+                raise CircuitoAberto(0)
+            self._sondas_em_andamento += 1
+            self._prazo_sondas = agora + self.tempo_aberto
+
+    def sucesso(self) -> None:
+        with self._lock:
+            self._falhas = 0
+            if self._estado == SEMI_ABERTO:
+                self._sondas_em_andamento = 0
+                self._transicionar(FECHADO)
+
+    def falha(self) -> None:
+        with self._lock:
+            agora = self._relogio()
+            if self._estado == SEMI_ABERTO:
+                self._abrir(agora)
+            elif self._estado == FECHADO:
+                self._falhas += 1
+                if self._falhas >= self.limite_falhas:
+                    self._abrir(agora)
+
+    def cancelar(self) -> None:
+        """Libera a vaga de sonda de uma chamada autorizada que não chegou a ser feita."""
+        with self._lock:
+            if self._estado == SEMI_ABERTO and self._sondas_em_andamento:
+                self._sondas_em_andamento -= 1
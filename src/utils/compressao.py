@@ -0,0 +1,75 @@
+"""Codec de armazenamento do texto dos planos (`plano_gerado`).
+
+Planos acima de um tamanho mínimo são gravados comprimidos num campo
+binário (`plano_comprimido`) junto com o nome do codec (`plano_codec`), no
+lugar do texto. Na leitura, `ler_plano` devolve o texto de qualquer um dos
+formatos, então documentos antigos e novos convivem na mesma collection.
+
+Codecs: "zlib" (biblioteca padrão) e "zstd" (precisa do pacote
+`zstandard`; sem ele, cai para zlib na gravação).
+"""
+import zlib
+from typing import Optional
+
+from bson.binary import Binary
+
+try:
+    import zstandard
+except Exception:
+    # Dependência opcional: sem ela só o zlib está disponível
+    zstandard = None
+
+CAMPO_TEXTO = "plano_gerado"
+CAMPO_BINARIO = "plano_comprimido"
+CAMPO_CODEC = "plano_codec"
+
+CODECS = ("zlib", "zstd")
+
+
+def resolver_codec(codec: str) -> Optional[str]:
+    """Codec efetivamente usado (zstd sem o pacote vira zlib; "off"/inválido é None)."""
+    codec = (codec or "").lower()
+    if codec == "zstd" and zstandard is None:
+        return "zlib"
+    return codec if codec in CODECS else None
+
+
+def comprimir(texto: str, codec: str) -> bytes:
+    dados = texto.encode("utf-8")
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(dados)
+    return zlib.compress(dados, 6)
+
+
+def descomprimir(dados: bytes, codec: str) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Plano comprimido com zstd, mas o pacote zstandard não está instalado")
+        bruto = zstandard.ZstdDecompressor().decompress(bytes(dados))
+    else:
+        bruto = zlib.decompress(bytes(dados))
+    return bruto.decode("utf-8")
+
+
+def campos_do_plano(texto: Optional[str], codec: str, min_bytes: int) -> dict:
+    """Campos a gravar no documento: o texto ou a versão comprimida.
+
+    Só comprime quando o codec está ativo, o texto tem pelo menos
+    `min_bytes` e a versão comprimida é de fato menor.
+    """
+    codec = resolver_codec(codec)
+    if codec is None or not isinstance(texto, str) or len(texto.encode("utf-8")) < min_bytes:
+        return {CAMPO_TEXTO: texto}
+
+    dados = comprimir(texto, codec)
+    if len(dados) >= len(texto.encode("utf-8")):
+        return {CAMPO_TEXTO: texto}
+    return {CAMPO_BINARIO: Binary(dados), CAMPO_CODEC: codec}
+
+
+def ler_plano(doc: dict) -> Optional[str]:
+    """Texto do plano de um documento de `treinos`, comprimido ou não."""
+    dados = doc.get(CAMPO_BINARIO)
+    if dados is None:
+        return doc.get(CAMPO_TEXTO)
+    return descomprimir(dados, doc.get(CAMPO_CODEC) or "zlib")
@@ -0,0 +1,123 @@
+"""Requisições "hedged" para cortar a cauda de latência de um provedor externo.
+
+Se a chamada principal não termina dentro de um percentil da latência
+recente (ex: p95), uma segunda chamada é disparada, possivelmente para um
+modelo mais rápido. O primeiro resultado bem-sucedido é usado e a outra
+chamada é cancelada. Uma falha de uma das chamadas não encerra a disputa:
+a outra ainda pode responder.
+
+A latência é estimada numa janela deslizante com a duração das chamadas
+principais. Uma principal cancelada entra com o tempo que já tinha
+decorrido (um limite inferior), para que o percentil não caia só porque
+as chamadas lentas deixaram de terminar. Até haver `amostras_min`
+observações, o atraso usado é `atraso_max`.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from utils.metrics import Counter
+
+T = TypeVar("T")
+
+PRINCIPAL = "principal"
+RESERVA = "reserva"
+
+
+class JanelaDeLatencias:
+    """Últimas N latências observadas (segundos), com cálculo de percentil."""
+
+    def __init__(self, tamanho: int = 200) -> None:
+        self._valores = deque(maxlen=max(1, tamanho))
+        self._lock = threading.Lock()
+
+    def observar(self, segundos: float) -> None:
+        with self._lock:
+            self._valores.append(segundos)
+
+    def __len__(self) -> int:
+        return len(self._valores)
+
+    def percentil(self, p: float) -> Optional[float]:
+        """Percentil pelo método nearest-rank; None se a janela está vazia."""
+        with self._lock:
+            valores = sorted(self._valores)
+        if not valores:
+            return None
+        posicao = max(1, math.ceil(p / 100 * len(valores)))
+        return valores[min(posicao, len(valores)) - 1]
+
+
+class Hedge:
+    """Política de hedge: quando disparar a segunda chamada e quem venceu."""
+
+    def __init__(
+        self,
+        percentil: float = 95.0,
+        atraso_min: float = 0.5,
+        atraso_max: float = 10.0,
+        amostras_min: int = 20,
+        janela: int = 200,
+        disparos: Optional[Counter] = None,
+        vitorias: Optional[Counter] = None,
+    ) -> None:
+        self.percentil = percentil
+        self.atraso_min = atraso_min
+        self.atraso_max = max(atraso_min, atraso_max)
+        self.amostras_min = amostras_min
+        self.latencias = JanelaDeLatencias(janela)
+        self._disparos = disparos
+        self._vitorias = vitorias
+
+    def observar(self, segundos: float) -> None:
+        self.latencias.observar(segundos)
+
+    def atraso(self) -> float:
+        """Quanto esperar pela chamada principal antes de disparar a reserva."""
+        if len(self.latencias) < self.amostras_min:
+            return self.atraso_max
+        valor = self.latencias.percentil(self.percentil)
+        return min(self.atraso_max, max(self.atraso_min, valor))
+
+    async def executar(
+        self,
+        principal: Callable[[], Awaitable[T]],
+        reserva: Callable[[], Awaitable[T]],
+        permitir_reserva: Callable[[], bool] = lambda: True,
+        **labels,
+    ) -> T:
+        """Executa `principal`; após o atraso, dispara `reserva` e usa quem terminar primeiro."""
+        inicio = time.monotonic()
+        tarefa_principal = asyncio.ensure_future(principal())
+        tarefa_principal.add_done_callback(lambda _: self.observar(time.monotonic() - inicio))
+        tarefas = {tarefa_principal: PRINCIPAL}
+        try:
+            concluidas, _ = await asyncio.wait(set(tarefas), timeout=self.atraso())
+            if concluidas or not permitir_reserva():
+                return await tarefa_principal
+
+            tarefas[asyncio.ensure_future(reserva())] = RESERVA
+            if self._disparos is not None:
+                self._disparos.inc(**labels)
+
+            primeiro_erro: Optional[BaseException] = None
+            pendentes = set(tarefas)
+            while pendentes:
+                concluidas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                # Se as duas terminaram juntas, a principal tem preferência
+                for tarefa in sorted(concluidas, key=lambda t: tarefas[t] != PRINCIPAL):
+                    if tarefa.exception() is None:
+                        if self._vitorias is not None:
+                            self._vitorias.inc(vencedor=tarefas[tarefa], **labels)
+                        return tarefa.result()
+                    if primeiro_erro is None or tarefas[tarefa] == PRINCIPAL:
+                        primeiro_erro = tarefa.exception()
+            raise primeiro_erro
+        finally:
+            # A perdedora (ou todas, se quem chamou foi cancelado) é cancelada
+            for tarefa in tarefas:
+                if not tarefa.done():
+                    tarefa.cancel()
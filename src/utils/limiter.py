@@ -0,0 +1,241 @@
+"""Limitador adaptativo de concorrência (AIMD) com fila de espera limitada.
+
+O limite de chamadas simultâneas cresce aos poucos enquanto o backend
+responde bem (aumento aditivo) e cai pela metade quando ele sinaliza
+sobrecarga (redução multiplicativa), como no controle de congestionamento
+do TCP. Quem não consegue vaga entra numa fila limitada e espera até um
+timeout. Funciona tanto para threads quanto para corrotinas, que dividem
+o mesmo orçamento de vagas.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from utils.metrics import Counter, Gauge
+
+
+class LimiteExcedido(Exception):
+    """Não foi possível obter vaga (fila cheia ou timeout de espera)."""
+
+    def __init__(self, motivo: str) -> None:
+        super().__init__(f"Limite de concorrência excedido: {motivo}")
+        self.motivo = motivo
+
+
+class _EsperaThread:
+    __slots__ = ("evento",)
+
+    def __init__(self) -> None:
+        self.evento = threading.Event()
+
+    def acordar(self) -> bool:
+        self.evento.set()
+        return True
+
+
+class _EsperaAsync:
+    __slots__ = ("loop", "futuro")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.futuro = loop.create_future()
+
+    def acordar(self) -> bool:
+        def _set():
+            if not self.futuro.done():
+                self.futuro.set_result(True)
+        try:
+            self.loop.call_soon_threadsafe(_set)
+            return True
+        except RuntimeError:
+            # loop já encerrado: ninguém mais aguarda esta vaga
+            return False
+
+
+class AdaptiveLimiter:
+    """Limite AIMD de chamadas simultâneas, compartilhado por threads e corrotinas."""
+
+    def __init__(
+        self,
+        limite_inicial: int = 8,
+        limite_min: int = 1,
+        limite_max: int = 64,
+        fila_max: int = 100,
+        timeout_fila: float = 10.0,
+        fator_reducao: float = 0.5,
+        gauge_limite: Optional[Gauge] = None,
+        gauge_em_andamento: Optional[Gauge] = None,
+        gauge_fila: Optional[Gauge] = None,
+        rejeicoes: Optional[Counter] = None,
+    ) -> None:
+        self.limite_min = max(1, limite_min)
+        self.limite_max = max(self.limite_min, limite_max)
+        self._limite = float(min(max(limite_inicial, self.limite_min), self.limite_max))
+        self.fila_max = fila_max
+        self.timeout_fila = timeout_fila
+        self.fator_reducao = fator_reducao
+        self._em_andamento = 0
+        self._fila: deque = deque()
+        self._lock = threading.Lock()
+        self._gauge_limite = gauge_limite
+        self._gauge_em_andamento = gauge_em_andamento
+        self._gauge_fila = gauge_fila
+        self._rejeicoes = rejeicoes
+        self._publicar()
+
+    # --- estado -------------------------------------------------------------
+
+    @property
+    def limite(self) -> int:
+        return int(self._limite)
+
+    @property
+    def em_andamento(self) -> int:
+        return self._em_andamento
+
+    @property
+    def fila(self) -> int:
+        return len(self._fila)
+
+    def _publicar(self) -> None:
+        if self._gauge_limite is not None:
+            self._gauge_limite.set(self.limite)
+        if self._gauge_em_andamento is not None:
+            self._gauge_em_andamento.set(self._em_andamento)
+        if self._gauge_fila is not None:
+            self._gauge_fila.set(len(self._fila))
+
+    def _rejeitar(self, motivo: str) -> LimiteExcedido:
+        if self._rejeicoes is not None:
+            self._rejeicoes.inc(motivo=motivo)
+        return LimiteExcedido(motivo)
+
+    # --- AIMD ---------------------------------------------------------------
+
+    def sucesso(self) -> None:
+        """Resposta normal: aumento aditivo (~+1 por janela de `limite` sucessos)."""
+        with self._lock:
+            antes = self.limite
+            self._limite = min(self.limite_max, self._limite + 1.0 / self._limite)
+            cresceu = self.limite > antes
+            self._publicar()
+        if cresceu:
+            self._acordar_proximo()
+
+    def sobrecarga(self) -> None:
+        """Backend sinalizou throttling: redução multiplicativa do limite."""
+        with self._lock:
+            self._limite = max(float(self.limite_min), self._limite * self.fator_reducao)
+            self._publicar()
+
+    # --- aquisição ----------------------------------------------------------
+
+    def _tentar(self) -> bool:
+        # chamado com o lock adquirido
+        if self._em_andamento < self.limite:
+            self._em_andamento += 1
+            self._publicar()
+            return True
+        return False
+
+    def _acordar_proximo(self) -> None:
+        while True:
+            with self._lock:
+                espera = self._fila.popleft() if self._fila else None
+                self._publicar()
+            if espera is None or espera.acordar():
+                return
+
+    def _remover_da_fila(self, espera) -> bool:
+        """Remove `espera` da fila; False se ela já tinha sido acordada."""
+        with self._lock:
+            try:
+                self._fila.remove(espera)
+                return True
+            except ValueError:
+                return False
+            finally:
+                self._publicar()
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        timeout = self.timeout_fila if timeout is None else timeout
+        prazo = time.monotonic() + timeout
+        primeira = True
+        while True:
+            with self._lock:
+                # Só quem chega agora respeita o tamanho da fila; quem foi
+                # acordado e perdeu a vaga volta para o início dela.
+                if self._tentar():
+                    return
+                if primeira and len(self._fila) >= self.fila_max:
+                    raise self._rejeitar("fila_cheia")
+                espera = _EsperaThread()
+                if primeira:
+                    self._fila.append(espera)
+                else:
+                    self._fila.appendleft(espera)
+                self._publicar()
+            primeira = False
+
+            restante = prazo - time.monotonic()
+            if restante <= 0 or not espera.evento.wait(restante):
+                if not self._remover_da_fila(espera):
+                    # Fomos acordados junto com o timeout: repassa o aviso
+                    self._acordar_proximo()
+                raise self._rejeitar("timeout")
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> None:
+        timeout = self.timeout_fila if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        prazo = loop.time() + timeout
+        primeira = True
+        while True:
+            with self._lock:
+                if self._tentar():
+                    return
+                if primeira and len(self._fila) >= self.fila_max:
+                    raise self._rejeitar("fila_cheia")
+                espera = _EsperaAsync(loop)
+                if primeira:
+                    self._fila.append(espera)
+                else:
+                    self._fila.appendleft(espera)
+                self._publicar()
+            primeira = False
+
+            restante = prazo - loop.time()
+            try:
+                if restante <= 0:
+                    raise asyncio.TimeoutError()
+                await asyncio.wait_for(espera.futuro, restante)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if not self._remover_da_fila(espera):
+                    self._acordar_proximo()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise self._rejeitar("timeout") from None
+
+    def release(self) -> None:
+        with self._lock:
+            self._em_andamento = max(0, self._em_andamento - 1)
+            self._publicar()
+        self._acordar_proximo()
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, timeout: Optional[float] = None):
+        await self.acquire_async(timeout)
+        try:
+            yield
+        finally:
+            self.release()
@@ -0,0 +1,173 @@
+"""Métricas em memória (contadores, gauges e histogramas) do processo.
+
+Implementação mínima e thread-safe para instrumentar os serviços sem
+depender de bibliotecas externas. Cada métrica é registrada uma única vez
+no `registry` global pelo nome; chamadas repetidas a `counter()`,
+`gauge()` ou `histogram()` com o mesmo nome devolvem a mesma instância.
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: dict) -> LabelKey:
+    """Normaliza os labels para uma tupla ordenada (usada como chave)."""
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    """Contador monotônico, opcionalmente separado por labels."""
+
+    def __init__(self, name: str, descricao: str = "") -> None:
+        self.name = name
+        self.descricao = descricao
+        self._lock = threading.Lock()
+        self._valores: Dict[LabelKey, float] = {}
+
+    def inc(self, valor: float = 1, **labels) -> None:
+        chave = _label_key(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._valores.get(_label_key(labels), 0)
+
+    def snapshot(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._valores)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._valores.clear()
+
+
+class Gauge(Counter):
+    """Valor instantâneo que pode subir ou descer."""
+
+    def set(self, valor: float, **labels) -> None:
+        chave = _label_key(labels)
+        with self._lock:
+            self._valores[chave] = valor
+
+    def dec(self, valor: float = 1, **labels) -> None:
+        self.inc(-valor, **labels)
+
+
+# Buckets padrão em segundos (pensados para chamadas de rede/LLM)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Histograma cumulativo com buckets fixos, separado por labels."""
+
+    def __init__(self, name: str, descricao: str = "", buckets: Optional[tuple] = None) -> None:
+        self.name = name
+        self.descricao = descricao
+        self.buckets = tuple(sorted(buckets or DEFAULT_BUCKETS))
+        self._lock = threading.Lock()
+        self._series: Dict[LabelKey, dict] = {}
+
+    def observe(self, valor: float, **labels) -> None:
+        chave = _label_key(labels)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[chave] = serie
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie["counts"][i] += 1
+            serie["sum"] += valor
+            serie["count"] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            serie = self._series.get(_label_key(labels))
+            return serie["count"] if serie else 0
+
+    def snapshot(self) -> Dict[LabelKey, dict]:
+        with self._lock:
+            return {
+                k: {"counts": list(v["counts"]), "sum": v["sum"], "count": v["count"]}
+                for k, v in self._series.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    """Registro global de métricas, indexado pelo nome."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metricas: Dict[str, object] = {}
+
+    def _obter(self, cls, name: str, descricao: str, **kwargs):
+        with self._lock:
+            metrica = self._metricas.get(name)
+            if metrica is None:
+                metrica = cls(name, descricao, **kwargs)
+                self._metricas[name] = metrica
+            elif type(metrica) is not cls:
+                raise ValueError(f"Métrica '{name}' já registrada com outro tipo")
+            return metrica
+
+    def counter(self, name: str, descricao: str = "") -> Counter:
+        return self._obter(Counter, name, descricao)
+
+    def gauge(self, name: str, descricao: str = "") -> Gauge:
+        return self._obter(Gauge, name, descricao)
+
+    def histogram(self, name: str, descricao: str = "", buckets: Optional[tuple] = None) -> Histogram:
+        return self._obter(Histogram, name, descricao, buckets=buckets)
+
+    def all(self) -> Dict[str, object]:
+        with self._lock:
+            return dict(self._metricas)
+
+    def reset(self) -> None:
+        """Zera todas as métricas (útil em testes)."""
+        for metrica in self.all().values():
+            metrica.reset()
+
+    def render_prometheus(self) -> str:
+        """Exporta todas as métricas no formato texto do Prometheus."""
+        linhas = []
+        for nome, metrica in sorted(self.all().items()):
+            tipo = {Histogram: "histogram", Gauge: "gauge"}.get(type(metrica), "counter")
+            if metrica.descricao:
+                linhas.append(f"# HELP {nome} {metrica.descricao}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            if isinstance(metrica, Histogram):
+                for chave, serie in sorted(metrica.snapshot().items()):
+                    for limite, acumulado in zip(metrica.buckets, serie["counts"]):
+                        linhas.append(f"{nome}_bucket{_formatar_labels(chave, le=_numero(limite))} {acumulado}")
+                    linhas.append(f'{nome}_bucket{_formatar_labels(chave, le="+Inf")} {serie["count"]}')
+                    linhas.append(f"{nome}_sum{_formatar_labels(chave)} {_numero(serie['sum'])}")
+                    linhas.append(f"{nome}_count{_formatar_labels(chave)} {serie['count']}")
+            else:
+                for chave, valor in sorted(metrica.snapshot().items()):
+                    linhas.append(f"{nome}{_formatar_labels(chave)} {_numero(valor)}")
+        return "\n".join(linhas) + "\n"
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_labels(chave: LabelKey, **extras) -> str:
+    pares = list(chave) + list(extras.items())
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,64 @@
+"""Retentativas com backoff exponencial e jitter ("full jitter").
+
+A espera antes da tentativa `n` (começando em 0) é um valor aleatório
+entre 0 e `min(maximo, base * 2**n)`, o que espalha as retentativas de
+vários clientes em vez de sincronizá-las contra um backend sobrecarregado.
+"""
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from utils.metrics import Counter
+
+T = TypeVar("T")
+
+
+def calcular_espera(tentativa: int, base: float, maximo: float) -> float:
+    """Espera (segundos) antes da retentativa `tentativa` (0 = primeira)."""
+    return random.uniform(0, min(maximo, base * (2 ** tentativa)))
+
+
+def executar_com_retry(
+    funcao: Callable[[], T],
+    retentavel: Callable[[BaseException], bool],
+    max_retries: int = 3,
+    base: float = 0.5,
+    maximo: float = 8.0,
+    contador: Optional[Counter] = None,
+    dormir: Callable[[float], None] = time.sleep,
+) -> T:
+    """Executa `funcao`, repetindo em erros retentáveis (SÍNCRONO)."""
+    tentativa = 0
+    while True:
+        try:
+            return funcao()
+        except Exception as e:
+            if tentativa >= max_retries or not retentavel(e):
+                raise
+            if contador is not None:
+                contador.inc(erro=type(e).__name__)
+            dormir(calcular_espera(tentativa, base, maximo))
+            tentativa += 1
+
+
+async def executar_com_retry_async(
+    fabrica: Callable[[], Awaitable[T]],
+    retentavel: Callable[[BaseException], bool],
+    max_retries: int = 3,
+    base: float = 0.5,
+    maximo: float = 8.0,
+    contador: Optional[Counter] = None,
+) -> T:
+    """Versão assíncrona de `executar_com_retry` (a espera não bloqueia o loop)."""
+    tentativa = 0
+    while True:
+        try:
+            return await fabrica()
+        except Exception as e:
+            if tentativa >= max_retries or not retentavel(e):
+                raise
+            if contador is not None:
+                contador.inc(erro=type(e).__name__)
+            await asyncio.sleep(calcular_espera(tentativa, base, maximo))
+            tentativa += 1
@@ -0,0 +1,98 @@
+"""Coalescência de chamadas idênticas concorrentes ("single-flight").
+
+Enquanto uma chamada para uma chave está em andamento, chamadas
+posteriores com a mesma chave aguardam o mesmo resultado em vez de
+repetir o trabalho. Há uma versão para threads (`SingleFlight`) e outra
+para corrotinas (`AsyncSingleFlight`).
+"""
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+
+from utils.metrics import Counter
+
+
+class _Chamada:
+    __slots__ = ("evento", "resultado", "erro")
+
+    def __init__(self) -> None:
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Single-flight para código síncrono (threads)."""
+
+    def __init__(self, coalescidas: Optional[Counter] = None, **labels) -> None:
+        self._lock = threading.Lock()
+        self._chamadas: Dict[str, _Chamada] = {}
+        self._coalescidas = coalescidas
+        self._labels = labels
+
+    def do(self, chave: str, funcao: Callable[[], object]):
+        """Executa `funcao` uma única vez por chave entre chamadas concorrentes."""
+        with self._lock:
+            chamada = self._chamadas.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = _Chamada()
+                self._chamadas[chave] = chamada
+
+        if not lider:
+            if self._coalescidas is not None:
+                self._coalescidas.inc(**self._labels)
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = funcao()
+            return chamada.resultado
+        except BaseException as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                self._chamadas.pop(chave, None)
+            chamada.evento.set()
+
+    def em_andamento(self) -> int:
+        with self._lock:
+            return len(self._chamadas)
+
+
+class AsyncSingleFlight:
+    """Single-flight para corrotinas.
+
+    O trabalho roda numa task compartilhada e cada chamador aguarda uma
+    cópia protegida (`asyncio.shield`), então o cancelamento de um cliente
+    (ex: desconexão) não cancela o resultado esperado pelos demais.
+    """
+
+    def __init__(self, coalescidas: Optional[Counter] = None, **labels) -> None:
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._coalescidas = coalescidas
+        self._labels = labels
+
+    async def do(self, chave: str, fabrica: Callable[[], Awaitable[object]]):
+        """Aguarda a corrotina criada por `fabrica`, compartilhada por chave."""
+        task = self._tasks.get(chave)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(fabrica())
+            self._tasks[chave] = task
+            task.add_done_callback(lambda t, c=chave: self._remover(c, t))
+        elif self._coalescidas is not None:
+            self._coalescidas.inc(**self._labels)
+        return await asyncio.shield(task)
+
+    def _remover(self, chave: str, task: asyncio.Task) -> None:
+        if self._tasks.get(chave) is task:
+            del self._tasks[chave]
+        # Evita o aviso "exception was never retrieved" se ninguém aguardava
+        if not task.cancelled():
+            task.exception()
+
+    def em_andamento(self) -> int:
+        return len(self._tasks)
@@ -0,0 +1,145 @@
+"""
+Testes para o cache de respostas do Gemini (cache_service.py)
+"""
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from services.cache_service import (
+    CompletionCache,
+    MemoryCacheBackend,
+    MongoCacheBackend,
+    cache_hits,
+    cache_misses,
+    gerar_chave,
+)
+from config.settings import settings
+from models.schemas import MensagemChat
+
+
+class TestCacheService:
+    """Testes para chave, backends e contadores do cache"""
+
+    @pytest.fixture(autouse=True)
+    def zerar_contadores(self):
+        cache_hits.reset()
+        cache_misses.reset()
+
+    def test_chave_normaliza_espacos(self):
+        """Prompts que diferem apenas em espaços geram a mesma chave"""
+        a = gerar_chave("modelo", "sistema", "quero  um treino\n")
+        b = gerar_chave("modelo", "sistema", " quero um treino")
+        assert a == b
+        assert a != gerar_chave("outro-modelo", "sistema", "quero um treino")
+
+    def test_memory_lru_evicta_mais_antigo(self):
+        """Ao passar do limite, a entrada menos usada é descartada"""
+        backend = MemoryCacheBackend(max_entries=2, ttl_seconds=60)
+        backend.set("a", "1")
+        backend.set("b", "2")
+        backend.get("a")  # 'a' passa a ser a mais recente
+        backend.set("c", "3")
+
+        assert backend.get("a") == "1"
+        assert backend.get("b") is None
+        assert backend.get("c") == "3"
+
+    def test_memory_ttl_expira(self):
+        """Entradas vencidas não são devolvidas"""
+        backend = MemoryCacheBackend(max_entries=10, ttl_seconds=10)
+        with patch("services.cache_service.time.monotonic", return_value=100.0):
+            backend.set("a", "1")
+        with patch("services.cache_service.time.monotonic", return_value=111.0):
+            assert backend.get("a") is None
+
+    def test_contadores_hit_miss(self):
+        """Hits e misses são contabilizados"""
+        cache = CompletionCache(MemoryCacheBackend())
+        assert cache.get("m", "s", "p") is None
+        cache.set("m", "s", "p", "resposta")
+        assert cache.get("m", "s", "p") == "resposta"
+
+        stats = cache.estatisticas()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_erro_no_backend_conta_como_miss(self):
+        """Falha do backend não propaga"""
+        backend = MagicMock()
+        backend.get.side_effect = Exception("Mongo fora do ar")
+        cache = CompletionCache(backend)
+
+        assert cache.get("m", "s", "p") is None
+        assert cache_misses.value() == 1
+
+    def test_mongo_backend_grava_com_upsert(self):
+        """O backend Mongo grava com upsert (o índice TTL fica no registro de índices)"""
+        from database.indices import INDICES
+
+        collection = MagicMock()
+        backend = MongoCacheBackend(collection=collection, ttl_seconds=60)
+
+        backend.set("chave", "resposta")
+
+        collection.create_index.assert_not_called()
+        ttl = INDICES[settings.GEMINI_CACHE_COLLECTION][0].document
+        assert ttl["key"] == {"expira_em": 1} and ttl["expireAfterSeconds"] == 0
+        filtro, update = collection.update_one.call_args.args
+        assert filtro == {"_id": "chave"}
+        assert update["$set"]["resposta"] == "resposta"
+        assert collection.update_one.call_args.kwargs["upsert"] is True
+
+
+class TestGeminiComCache:
+    """Integração do cache com gerar_plano_de_treino"""
+
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    def test_segunda_chamada_usa_cache(self, mock_settings, mock_genai):
+        """Prompts idênticos chamam o Gemini uma única vez"""
+        from services import gemini_service
+
+        mock_settings.GEMINI_API_KEY = 'test_key'
+        mock_settings.GEMINI_MODEL = 'gemini-2.5-flash-lite'
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = MagicMock(text="Plano em cache")
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        data = MensagemChat(mensagem_usuario="Quero um treino")
+        with patch.object(gemini_service, "completion_cache", CompletionCache(MemoryCacheBackend())):
+            primeiro = gemini_service.gerar_plano_de_treino(data)
+            segundo = gemini_service.gerar_plano_de_treino(data)
+
+        assert primeiro == segundo == "Plano em cache"
+        mock_model.generate_content.assert_called_once()
+
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    def test_erro_nao_e_cacheado(self, mock_settings, mock_genai):
+        """Mensagens de erro não entram no cache"""
+        from services import gemini_service
+
+        mock_settings.GEMINI_API_KEY = 'test_key'
+        mock_settings.GEMINI_MODEL = 'gemini-2.5-flash-lite'
+        mock_genai.GenerativeModel.side_effect = Exception("Erro na API")
+        mock_genai.list_models.return_value = []
+
+        backend = MemoryCacheBackend()
+        with patch.object(gemini_service, "completion_cache", CompletionCache(backend)):
+            gemini_service.gerar_plano_de_treino(MensagemChat(mensagem_usuario="Quero um treino"))
+
+        assert len(backend) == 0
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes do cache do Gemini...")
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,139 @@
+"""
+Testes para o circuit breaker (utils/circuit_breaker.py) e seu uso no gemini_service
+"""
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from utils.circuit_breaker import ABERTO, FECHADO, SEMI_ABERTO, CircuitBreaker, CircuitoAberto
+from utils.metrics import Counter
+from models.schemas import MensagemChat
+
+
+class InternalServerError(Exception):
+    """Imita google.api_core.exceptions.InternalServerError (HTTP 500)"""
+    code = 500
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+class TestCircuitBreaker:
+    """Testes das transições de estado"""
+
+    def test_abre_apos_falhas_consecutivas(self):
+        transicoes = Counter("teste_transicoes")
+        breaker = CircuitBreaker(limite_falhas=3, transicoes=transicoes)
+
+        breaker.falha()
+        breaker.falha()
+        breaker.sucesso()  # zera a contagem
+        breaker.falha()
+        breaker.falha()
+        assert breaker.estado == FECHADO
+
+        breaker.falha()
+        assert breaker.estado == ABERTO
+        assert transicoes.value(de=FECHADO, para=ABERTO) == 1
+        with pytest.raises(CircuitoAberto):
+            breaker.permitir()
+
+    def test_semi_aberto_fecha_com_sucesso_da_sonda(self):
+        relogio = Relogio()
+        breaker = CircuitBreaker(limite_falhas=1, tempo_aberto=30, relogio=relogio)
+        breaker.falha()
+
+        relogio.agora = 31
+        breaker.permitir()
+        assert breaker.estado == SEMI_ABERTO
+        with pytest.raises(CircuitoAberto):
+            breaker.permitir()  # só uma sonda por vez
+
+        breaker.sucesso()
+        assert breaker.estado == FECHADO
+
+    def test_falha_da_sonda_reabre(self):
+        relogio = Relogio()
+        breaker = CircuitBreaker(limite_falhas=1, tempo_aberto=30, relogio=relogio)
+        breaker.falha()
+        relogio.agora = 31
+        breaker.permitir()
+
+        breaker.falha()
+
+        assert breaker.estado == ABERTO
+        with pytest.raises(CircuitoAberto) as exc:
+            breaker.permitir()
+        assert exc.value.restante == pytest.approx(30)
+
+    def test_cancelar_libera_sonda(self):
+        relogio = Relogio()
+        breaker = CircuitBreaker(limite_falhas=1, tempo_aberto=30, relogio=relogio)
+        breaker.falha()
+        relogio.agora = 31
+        breaker.permitir()
+
+        breaker.cancelar()
+        breaker.permitir()  # não levanta
+
+
+class TestGeminiComBreaker:
+    """Integração com o gemini_service"""
+
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    def test_circuito_aberto_nao_chama_o_gemini(self, mock_settings, mock_genai):
+        from services import gemini_service
+
+        mock_settings.GEMINI_API_KEY = 'test_key'
+        mock_settings.GEMINI_MODEL = 'gemini-2.5-flash-lite'
+        mock_model = MagicMock()
+        mock_model.generate_content.side_effect = InternalServerError("boom")
+        mock_genai.GenerativeModel.return_value = mock_model
+        breaker = CircuitBreaker(limite_falhas=2, tempo_aberto=60)
+
+        with patch.object(gemini_service, "gemini_breaker", breaker), \
+             patch.dict(gemini_service._RETRY, {"max_retries": 3, "base": 0}):
+            primeiro = gemini_service.gerar_plano_de_treino(MensagemChat(mensagem_usuario="Como fazer prancha?"))
+            chamadas = mock_model.generate_content.call_count
+            segundo = gemini_service.gerar_plano_de_treino(MensagemChat(mensagem_usuario="Como fazer supino?"))
+
+        # a retentativa parou quando o circuito abriu
+        assert "Circuito aberto" in primeiro
+        assert chamadas == 2
+        assert "Circuito aberto" in segundo
+        assert mock_model.generate_content.call_count == chamadas
+
+    @patch('services.gemini_service.genai')
+    def test_lista_de_modelos_em_cache_e_atualizada_em_segundo_plano(self, mock_genai):
+        from services.gemini_service import ListaDeModelos
+
+        mock_genai.list_models.return_value = [{"name": "models/gemini-2.5-flash"}]
+        lista = ListaDeModelos(ttl_seconds=3600)
+
+        with patch('services.gemini_service.threading.Thread') as mock_thread:
+            assert lista.obter() == []  # não bloqueia no caminho de erro
+            mock_thread.return_value.start.assert_called_once()
+
+        assert lista.atualizar(mock_genai) == ["models/gemini-2.5-flash"]
+        assert lista.obter() == ["models/gemini-2.5-flash"]
+        assert mock_genai.list_models.call_count == 1
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes do circuit breaker...")
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,251 @@
+"""
+Testes para o cache de contexto das instruções de sistema (contexto_cache_service.py)
+"""
+import asyncio
+import pytest
+import sys
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from services.contexto_cache_service import ContextoCache
+from models.schemas import MensagemChat
+
+
+class NotFound(Exception):
+    """Imita google.api_core.exceptions.NotFound (HTTP 404)"""
+    code = 404
+
+
+class FakeCachedContent:
+    """Stand-in local da API `genai.caching.CachedContent`"""
+
+    criados = []
+    falhar = False
+
+    def __init__(self, model, system_instruction, ttl):
+        self.name = f"cachedContents/{len(FakeCachedContent.criados)}"
+        self.model = model
+        self.system_instruction = system_instruction
+        self.ttl = ttl
+        self.renovacoes = 0
+        self.apagado = False
+
+    @classmethod
+    def create(cls, model, display_name=None, system_instruction=None, ttl=None):
+        if cls.falhar:
+            raise ValueError("Cached content is too small")
+        handle = cls(model, system_instruction, ttl)
+        cls.criados.append(handle)
+        return handle
+
+    def update(self, ttl=None):
+        self.ttl = ttl
+        self.renovacoes += 1
+
+    def delete(self):
+        self.apagado = True
+
+
+@pytest.fixture
+def fake_genai():
+    FakeCachedContent.criados = []
+    FakeCachedContent.falhar = False
+    return SimpleNamespace(caching=SimpleNamespace(CachedContent=FakeCachedContent))
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+class TestContextoCache:
+    """Testes do ciclo de vida do handle"""
+
+    def test_reutiliza_handle_dentro_do_ttl(self, fake_genai):
+        cache = ContextoCache(ttl_seconds=3600, margem_seconds=300)
+
+        primeiro = cache.obter(fake_genai, "gemini-2.5-flash", "instrução longa")
+        segundo = cache.obter(fake_genai, "gemini-2.5-flash", "instrução longa")
+
+        assert primeiro is segundo
+        assert len(FakeCachedContent.criados) == 1
+        assert primeiro.ttl.total_seconds() == 3600
+
+    def test_renova_antes_de_expirar(self, fake_genai):
+        relogio = Relogio()
+        cache = ContextoCache(ttl_seconds=3600, margem_seconds=300, relogio=relogio)
+        handle = cache.obter(fake_genai, "m", "instr")
+
+        relogio.agora = 3400  # dentro da margem de renovação
+        assert cache.obter(fake_genai, "m", "instr") is handle
+        assert handle.renovacoes == 1
+
+        relogio.agora = 3500  # renovado: válido por mais um TTL
+        cache.obter(fake_genai, "m", "instr")
+        assert handle.renovacoes == 1
+        assert len(FakeCachedContent.criados) == 1
+
+    def test_falha_usa_instrucao_inline_e_espera(self, fake_genai):
+        relogio = Relogio()
+        cache = ContextoCache(espera_falha_seconds=600, relogio=relogio)
+        FakeCachedContent.falhar = True
+
+        assert cache.obter(fake_genai, "m", "curta") is None
+        FakeCachedContent.falhar = False
+        assert cache.obter(fake_genai, "m", "curta") is None  # ainda na espera
+
+        relogio.agora = 601
+        assert cache.obter(fake_genai, "m", "curta") is not None
+
+    def test_sdk_sem_caching(self):
+        assert ContextoCache().obter(SimpleNamespace(), "m", "instr") is None
+
+    def test_descartar_e_limpar(self, fake_genai):
+        cache = ContextoCache()
+        handle = cache.obter(fake_genai, "m", "instr")
+
+        assert cache.descartar("m", "instr") is True
+        assert cache.descartar("m", "instr") is False
+
+        novo = cache.obter(fake_genai, "m", "instr")
+        assert novo is not handle
+        cache.limpar()
+        assert novo.apagado
+
+    def test_criacao_fora_do_lock_sem_duplicar(self, fake_genai):
+        cache = ContextoCache()
+        liberar = threading.Event()
+        criar = FakeCachedContent.create.__func__
+
+        def criar_devagar(cls, *args, **kwargs):
+            # O lock está livre durante a chamada remota
+            assert cache._lock.acquire(blocking=False)
+            cache._lock.release()
+            liberar.wait(1)
+            return criar(cls, *args, **kwargs)
+
+        with patch.object(FakeCachedContent, "create", classmethod(criar_devagar)):
+            thread = threading.Thread(target=cache.obter, args=(fake_genai, "m", "instr"))
+            thread.start()
+            # Enquanto a primeira cria, as outras usam a instrução inline sem esperar
+            while not cache._em_andamento:
+                pass
+            assert cache.obter(fake_genai, "m", "instr") is None
+            liberar.set()
+            thread.join()
+
+        assert len(FakeCachedContent.criados) == 1
+        assert cache.obter(fake_genai, "m", "instr") is FakeCachedContent.criados[0]
+
+    def test_handle_criado_durante_limpar_e_apagado(self, fake_genai):
+        cache = ContextoCache()
+        criar = FakeCachedContent.create.__func__
+
+        def criar_e_limpar(cls, *args, **kwargs):
+            handle = criar(cls, *args, **kwargs)
+            cache.limpar()
+            return handle
+
+        with patch.object(FakeCachedContent, "create", classmethod(criar_e_limpar)):
+            assert cache.obter(fake_genai, "m", "instr") is None
+
+        assert FakeCachedContent.criados[0].apagado
+
+    @pytest.mark.asyncio
+    async def test_obter_async_cria_numa_thread(self, fake_genai):
+        cache = ContextoCache()
+        threads = []
+        criar = FakeCachedContent.create.__func__
+
+        def criar_registrando(cls, *args, **kwargs):
+            threads.append(threading.current_thread())
+            return criar(cls, *args, **kwargs)
+
+        with patch.object(FakeCachedContent, "create", classmethod(criar_registrando)):
+            handle = await cache.obter_async(fake_genai, "m", "instr")
+            assert await cache.obter_async(fake_genai, "m", "instr") is handle
+
+        assert threads and threads[0] is not threading.main_thread()
+        assert len(FakeCachedContent.criados) == 1
+
+
+class TestGeminiComContexto:
+    """Integração com o ModelRegistry do gemini_service"""
+
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    def test_modelo_criado_a_partir_do_handle(self, mock_settings, mock_genai, fake_genai):
+        from services.gemini_service import ModelRegistry
+
+        mock_settings.GEMINI_API_KEY = 'test_key'
+        mock_genai.caching = fake_genai.caching
+        registry = ModelRegistry(contexto=ContextoCache())
+
+        model = registry.obter("gemini-2.5-flash", "instr")
+
+        assert registry.obter("gemini-2.5-flash", "instr") is model
+        mock_genai.GenerativeModel.from_cached_content.assert_called_once_with(FakeCachedContent.criados[0])
+        mock_genai.GenerativeModel.assert_not_called()
+
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    def test_handle_perdido_e_recriado(self, mock_settings, mock_genai, fake_genai):
+        from services import gemini_service
+
+        mock_settings.GEMINI_API_KEY = 'test_key'
+        mock_settings.GEMINI_MODEL = 'gemini-2.5-flash'
+        mock_genai.caching = fake_genai.caching
+        expirado = MagicMock()
+        expirado.generate_content.side_effect = NotFound("CachedContent not found")
+        valido = MagicMock()
+        valido.generate_content.return_value = MagicMock(text="Resposta")
+        mock_genai.GenerativeModel.from_cached_content.side_effect = [expirado, valido]
+
+        with patch.object(gemini_service, "model_registry", gemini_service.ModelRegistry(contexto=ContextoCache())):
+            resultado = gemini_service.gerar_plano_de_treino(
+                MensagemChat(mensagem_usuario="Como fazer agachamento corretamente?")
+            )
+
+        assert resultado == "Resposta"
+        assert len(FakeCachedContent.criados) == 2
+
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    def test_troca_de_chave_limpa_fora_do_lock(self, mock_settings, mock_genai, fake_genai):
+        from services.gemini_service import ModelRegistry
+
+        mock_settings.GEMINI_API_KEY = 'chave_1'
+        mock_genai.caching = fake_genai.caching
+        registry = ModelRegistry(contexto=ContextoCache())
+        registry.obter("m", "instr")
+        antigo = FakeCachedContent.criados[0]
+
+        def apagar():
+            assert registry._lock.acquire(blocking=False)
+            registry._lock.release()
+            antigo.apagado = True
+
+        antigo.delete = apagar
+        mock_settings.GEMINI_API_KEY = 'chave_2'
+        registry.obter("m", "instr")
+
+        assert antigo.apagado
+        assert len(FakeCachedContent.criados) == 2
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes do cache de contexto...")
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,91 @@
+"""
+Testes para o contexto do usuário aquecido no login (contexto_usuario_service.py)
+"""
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from services import contexto_usuario_service, gemini_service
+from services.cache_service import MemoryCacheBackend
+
+USUARIO = {"_id": "u1", "email": "login@example.com", "idade": 30, "objetivo": "hipertrofia"}
+
+
+@pytest.fixture
+def cache():
+    cache = MemoryCacheBackend(max_entries=10, ttl_seconds=60)
+    with patch.object(contexto_usuario_service, "contextos", cache):
+        yield cache
+
+
+class TestContextoUsuario:
+    """Testes do cache de perfil + histórico"""
+
+    @patch('services.historico_service.obter_resumo_historico', return_value="- 2025-01-01: Full Body")
+    @patch('services.auth_service.get_user_by_email', return_value=USUARIO)
+    def test_aquecido_no_login_evita_o_banco(self, mock_user, mock_historico, cache):
+        contexto_usuario_service.aquecer("login@example.com")
+        contexto = contexto_usuario_service.obter("login@example.com")
+
+        assert mock_user.call_count == 1
+        assert mock_historico.call_count == 1
+        assert contexto["historico"] == "- 2025-01-01: Full Body"
+        assert "Objetivo do usuário: hipertrofia" in contexto["bloco"]
+
+    @patch('services.historico_service.obter_resumo_historico', return_value="")
+    @patch('services.auth_service.get_user_by_email', return_value=USUARIO)
+    def test_invalidar_recarrega_do_banco(self, mock_user, mock_historico, cache):
+        contexto_usuario_service.obter("login@example.com")
+        contexto_usuario_service.invalidar("login@example.com")
+        contexto_usuario_service.obter("login@example.com")
+
+        assert mock_user.call_count == 2
+
+    @patch('services.historico_service.obter_resumo_historico', side_effect=RuntimeError("timeout"))
+    @patch('services.auth_service.get_user_by_email', return_value=USUARIO)
+    def test_falha_no_historico_nao_e_guardada(self, mock_user, mock_historico, cache):
+        contexto = contexto_usuario_service.obter("login@example.com")
+
+        assert contexto["historico"] == ""
+        assert cache.get("login@example.com") is None
+
+    @patch('services.auth_service.get_user_by_email', return_value=None)
+    def test_usuario_inexistente(self, mock_user, cache):
+        assert contexto_usuario_service.obter("nao@existe.com") is None
+
+
+class TestRegistrarContextoUsuario:
+    """Testes da task agendada no login"""
+
+    def test_aquece_pelo_email_do_usuario_logado(self):
+        with patch.object(contexto_usuario_service, "aquecer") as mock_aquecer:
+            # Mesmo formato de UserResponse.model_dump() usado no login
+            gemini_service.registrar_contexto_usuario({"id": "u1", "email": "login@example.com"})
+
+        mock_aquecer.assert_called_once_with("login@example.com")
+
+    def test_erro_nao_propaga(self):
+        with patch.object(contexto_usuario_service, "aquecer", side_effect=RuntimeError("db")):
+            gemini_service.registrar_contexto_usuario({"email": "login@example.com"})
+
+    def test_login_nao_chama_o_gemini(self):
+        contexto = {"user": dict(USUARIO), "historico": ""}
+        with patch.object(contexto_usuario_service, "aquecer", return_value=contexto), \
+             patch.object(gemini_service, "gerar_plano_de_treino") as mock_gerar:
+            gemini_service.registrar_contexto_usuario({"email": "login@example.com"})
+
+        mock_gerar.assert_not_called()
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes do contexto do usuário...")
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,131 @@
+"""
+Testes para o backend fake do Gemini (gemini_fake.py)
+"""
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from services.gemini_fake import FakeGemini, PerfilFake
+from services.contexto_cache_service import ContextoCache
+from models.schemas import MensagemChat
+
+
+class TestPerfilFake:
+    """Testes das distribuições de latência e erros"""
+
+    def test_latencia_respeita_mediana_e_p99(self):
+        perfil = PerfilFake(latencia_mediana_ms=500, latencia_p99_ms=2000, seed=42)
+        amostras = sorted(perfil.latencia() for _ in range(5000))
+
+        assert 0.45 < amostras[2500] < 0.55
+        assert 1.6 < amostras[4950] < 2.5
+
+    def test_taxas_de_erro(self):
+        perfil = PerfilFake(taxa_429=0.2, taxa_500=0.1, seed=1)
+        erros = [perfil.sortear_erro() for _ in range(5000)]
+
+        assert 0.17 < erros.count(429) / 5000 < 0.23
+        assert 0.08 < erros.count(500) / 5000 < 0.12
+
+
+class TestFakeGemini:
+    """Testes da interface imitada do SDK"""
+
+    def test_plano_pronto_com_usage_metadata(self):
+        fake = FakeGemini()
+        model = fake.GenerativeModel(model_name="gemini-2.5-flash", system_instruction="Plano de Treino: [Nome]")
+
+        response = model.generate_content("Quero um plano de treino")
+
+        assert response.text.startswith("Plano de Treino:")
+        assert response.usage_metadata.candidates_token_count > 0
+        assert model.generate_content("Quero um plano de treino").text == response.text
+
+    def test_erro_429_usa_excecao_do_google(self):
+        fake = FakeGemini(PerfilFake(latencia_mediana_ms=0, taxa_429=1.0))
+        model = fake.GenerativeModel(model_name="gemini-2.5-flash")
+
+        with pytest.raises(Exception) as exc:
+            model.generate_content("oi")
+        assert exc.value.code == 429
+
+    @pytest.mark.asyncio
+    async def test_stream_async_em_trechos(self):
+        fake = FakeGemini()
+        model = fake.GenerativeModel(system_instruction="Plano de Treino: [Nome]")
+
+        response = await model.generate_content_async("Quero um plano", stream=True)
+        trechos = [chunk.text async for chunk in response]
+
+        assert len(trechos) > 1
+        assert "".join(trechos).startswith("Plano de Treino:")
+
+    def test_cache_de_contexto_conta_tokens_em_cache(self):
+        fake = FakeGemini()
+        handle = fake.caching.CachedContent.create(model="gemini-2.5-flash", system_instruction="x" * 4000)
+        model = fake.GenerativeModel.from_cached_content(handle)
+
+        assert model.generate_content("dúvida").usage_metadata.cached_content_token_count == 1000
+
+        handle.delete()
+        with pytest.raises(Exception) as exc:
+            model.generate_content("dúvida")
+        assert exc.value.code == 404
+
+    def test_list_models(self):
+        nomes = [m.name for m in FakeGemini().list_models()]
+        assert "models/gemini-2.5-flash-lite" in nomes
+
+
+class TestGeminiServiceComFake:
+    """O gemini_service funciona de ponta a ponta com o backend fake"""
+
+    @patch('services.gemini_service.settings')
+    def test_retentativa_apos_429(self, mock_settings):
+        from services import gemini_service
+
+        mock_settings.GEMINI_API_KEY = 'fake'
+        mock_settings.GEMINI_MODEL = 'gemini-2.5-flash-lite'
+        fake = FakeGemini(PerfilFake(latencia_mediana_ms=0, tokens_por_segundo=0, taxa_429=0.5, seed=3))
+
+        with patch.object(gemini_service, "genai", fake), \
+             patch.dict(gemini_service._RETRY, {"max_retries": 10, "base": 0}):
+            resultado = gemini_service.gerar_plano_de_treino(
+                MensagemChat(mensagem_usuario="Monte um plano de treino de 3 dias para iniciante")
+            )
+
+        assert resultado.startswith("Plano de Treino:")
+        assert fake.chamadas["generate_content"] >= 1
+
+    @pytest.mark.asyncio
+    @patch('services.gemini_service.settings')
+    async def test_async_com_cache_de_contexto(self, mock_settings):
+        from services import gemini_service
+
+        mock_settings.GEMINI_API_KEY = 'fake'
+        mock_settings.GEMINI_MODEL = 'gemini-2.5-flash-lite'
+        fake = FakeGemini()
+        registry = gemini_service.ModelRegistry(contexto=ContextoCache())
+
+        with patch.object(gemini_service, "genai", fake), \
+             patch.object(gemini_service, "model_registry", registry):
+            resultado = await gemini_service.gerar_plano_de_treino_async(
+                MensagemChat(mensagem_usuario="Como fazer agachamento corretamente?")
+            )
+
+        assert "**" in resultado
+        assert len(fake.caching._handles) == 1
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes do backend fake do Gemini...")
+    pytest.main([__file__, "-v"])
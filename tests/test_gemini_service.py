@@ -5,7 +5,7 @@ import pytest
 import os
 import sys
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 # Configuração de path para execução individual
 if __name__ == "__main__":
@@ -14,7 +14,12 @@ if __name__ == "__main__":
     sys.path.insert(0, str(project_root))
     sys.path.insert(0, str(src_path))
 
-from services.gemini_service import gerar_plano_de_treino
+from services.gemini_service import (
+    ErroNoStream,
+    gerar_plano_de_treino,
+    gerar_plano_de_treino_async,
+    gerar_plano_de_treino_stream,
+)
 from models.schemas import MensagemChat
 
 
@@ -92,6 +97,144 @@ class TestGeminiService:
         assert "Ocorreu um erro ao se comunicar com a API do Gemini" in resultado
         assert "Erro na API" in resultado
 
+    @pytest.mark.asyncio
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    async def test_gerar_plano_de_treino_async_sucesso(self, mock_settings, mock_genai):
+        """Testa a versão assíncrona usando generate_content_async"""
+        mock_settings.GEMINI_API_KEY = 'test_key'
+        mock_settings.GEMINI_MODEL = 'gemini-2.5-flash-lite'
+
+        mock_model = MagicMock()
+        mock_response = MagicMock()
+        mock_response.text = "Plano assíncrono"
+        mock_model.generate_content_async = AsyncMock(return_value=mock_response)
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        data = MensagemChat(mensagem_usuario="Quero um treino para casa")
+
+        resultado = await gerar_plano_de_treino_async(data)
+
+        assert resultado == "Plano assíncrono"
+        mock_model.generate_content_async.assert_awaited_once()
+        mock_model.generate_content.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    async def test_gerar_plano_de_treino_async_erro_api(self, mock_settings, mock_genai):
+        """Testa a mensagem de erro na versão assíncrona"""
+        mock_settings.GEMINI_API_KEY = 'test_key'
+        mock_genai.GenerativeModel.side_effect = Exception("Erro na API")
+        mock_genai.list_models.return_value = []
+
+        data = MensagemChat(mensagem_usuario="Quero um treino para casa")
+
+        resultado = await gerar_plano_de_treino_async(data)
+
+        assert "Ocorreu um erro ao se comunicar com a API do Gemini" in resultado
+        assert "Erro na API" in resultado
+
+    @pytest.mark.asyncio
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    async def test_gerar_plano_de_treino_stream(self, mock_settings, mock_genai):
+        """Testa que a versão em streaming repassa os trechos na ordem"""
+        mock_settings.GEMINI_API_KEY = 'test_key'
+
+        async def fake_response():
+            for texto in ["Plano ", "de ", "Treino"]:
+                yield MagicMock(text=texto)
+
+        mock_model = MagicMock()
+        mock_model.generate_content_async = AsyncMock(return_value=fake_response())
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        data = MensagemChat(mensagem_usuario="Quero um treino para casa")
+
+        partes = [texto async for texto in gerar_plano_de_treino_stream(data)]
+
+        assert partes == ["Plano ", "de ", "Treino"]
+        assert mock_model.generate_content_async.call_args.kwargs["stream"] is True
+
+    @pytest.mark.asyncio
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    async def test_stream_falha_no_meio_levanta_erro(self, mock_settings, mock_genai):
+        """A falha chega como ErroNoStream, não como um trecho do plano"""
+        mock_settings.GEMINI_API_KEY = 'test_key'
+
+        async def fake_response():
+            yield MagicMock(text="Plano ")
+            raise ValueError("conexão perdida")
+
+        mock_model = MagicMock()
+        mock_model.generate_content_async = AsyncMock(return_value=fake_response())
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        partes = []
+        with pytest.raises(ErroNoStream) as erro:
+            async for texto in gerar_plano_de_treino_stream(MensagemChat(mensagem_usuario="Quero um treino para casa")):
+                partes.append(texto)
+
+        assert partes == ["Plano "]
+        assert "conexão perdida" in str(erro.value)
+
+    @pytest.mark.asyncio
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    async def test_stream_cliente_desconectado_libera_breaker(self, mock_settings, mock_genai):
+        """Fechar o gerador no meio (cliente saiu) cancela a vaga de sonda do breaker"""
+        from services import gemini_service
+
+        mock_settings.GEMINI_API_KEY = 'test_key'
+
+        async def fake_response():
+            for texto in ["Plano ", "de ", "Treino"]:
+                yield MagicMock(text=texto)
+
+        mock_model = MagicMock()
+        mock_model.generate_content_async = AsyncMock(return_value=fake_response())
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        with patch.object(gemini_service.gemini_breaker, "cancelar") as mock_cancelar, \
+             patch.object(gemini_service.gemini_breaker, "sucesso") as mock_sucesso:
+            stream = gerar_plano_de_treino_stream(MensagemChat(mensagem_usuario="Quero um treino para casa"))
+            assert await stream.__anext__() == "Plano "
+            await stream.aclose()
+
+        mock_cancelar.assert_called_once()
+        mock_sucesso.assert_not_called()
+
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    def test_model_registry_reutiliza_instancias(self, mock_settings, mock_genai):
+        """O SDK é configurado uma vez e cada (modelo, instrução) vira um único objeto"""
+        from services.gemini_service import ModelRegistry, SYSTEM_INSTRUCTION_BASE, SYSTEM_INSTRUCTION_PLANO
+
+        mock_settings.GEMINI_API_KEY = 'test_key'
+        mock_genai.GenerativeModel.side_effect = lambda **kwargs: MagicMock(**kwargs)
+        registry = ModelRegistry()
+
+        base_1 = registry.obter('gemini-2.5-flash-lite', SYSTEM_INSTRUCTION_BASE)
+        base_2 = registry.obter('gemini-2.5-flash-lite', SYSTEM_INSTRUCTION_BASE)
+        plano = registry.obter('gemini-2.5-flash-lite', SYSTEM_INSTRUCTION_PLANO)
+
+        assert base_1 is base_2
+        assert plano is not base_1
+        mock_genai.configure.assert_called_once_with(api_key='test_key')
+        assert mock_genai.GenerativeModel.call_count == 2
+
+        # Troca de chave reconfigura e recria os modelos
+        mock_settings.GEMINI_API_KEY = 'outra_key'
+        base_3 = registry.obter('gemini-2.5-flash-lite', SYSTEM_INSTRUCTION_BASE)
+        assert base_3 is not base_1
+        mock_genai.configure.assert_called_with(api_key='outra_key')
+
+        registry.refresh()
+        registry.obter('gemini-2.5-flash-lite', SYSTEM_INSTRUCTION_BASE)
+        assert mock_genai.configure.call_count == 3
+
 
 if __name__ == "__main__":
     """Permite execução individual do arquivo de teste"""
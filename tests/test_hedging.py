@@ -0,0 +1,181 @@
+"""
+Testes para as requisições hedged (utils/hedging.py e gemini_service)
+"""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from utils.hedging import Hedge, JanelaDeLatencias, PRINCIPAL, RESERVA
+from utils.metrics import MetricsRegistry
+
+
+def _hedge(**kwargs):
+    registry = MetricsRegistry()
+    kwargs.setdefault("atraso_min", 0.01)
+    kwargs.setdefault("atraso_max", 0.02)
+    return Hedge(disparos=registry.counter("hedges"), vitorias=registry.counter("vitorias"), **kwargs), registry
+
+
+def _chamada(segundos, resultado=None, erro=None, registro=None):
+    async def chamar():
+        try:
+            await asyncio.sleep(segundos)
+        except asyncio.CancelledError:
+            if registro is not None:
+                registro.append("cancelada")
+            raise
+        if erro is not None:
+            raise erro
+        return resultado
+    return chamar
+
+
+class TestAtraso:
+    """Testes do percentil usado como atraso"""
+
+    def test_percentil_da_janela(self):
+        janela = JanelaDeLatencias(tamanho=100)
+        for i in range(1, 101):
+            janela.observar(i / 100)
+
+        assert janela.percentil(95) == 0.95
+        assert janela.percentil(50) == 0.5
+
+    def test_atraso_maximo_ate_ter_amostras(self):
+        hedge, _ = _hedge(atraso_min=0.1, atraso_max=5, amostras_min=3)
+        hedge.observar(0.2)
+        assert hedge.atraso() == 5
+
+        hedge.observar(0.3)
+        hedge.observar(0.01)
+        assert hedge.atraso() == 0.3
+
+    def test_atraso_respeita_o_minimo(self):
+        hedge, _ = _hedge(atraso_min=0.5, atraso_max=5, amostras_min=1)
+        hedge.observar(0.01)
+        assert hedge.atraso() == 0.5
+
+
+class TestExecutar:
+    """Testes da disputa entre a chamada principal e a reserva"""
+
+    @pytest.mark.asyncio
+    async def test_principal_rapida_nao_dispara_reserva(self):
+        hedge, registry = _hedge()
+        reservas = []
+
+        async def reserva():
+            reservas.append(1)
+            return "reserva"
+
+        assert await hedge.executar(_chamada(0, "principal"), reserva) == "principal"
+        assert reservas == []
+        assert registry.counter("hedges").value() == 0
+
+    @pytest.mark.asyncio
+    async def test_reserva_vence_e_principal_e_cancelada(self):
+        hedge, registry = _hedge()
+        registro = []
+
+        resultado = await hedge.executar(
+            _chamada(5, "principal", registro=registro), _chamada(0, "reserva"), modo="plano"
+        )
+        await asyncio.sleep(0.01)  # deixa o cancelamento da principal concluir
+
+        assert resultado == "reserva"
+        assert registro == ["cancelada"]
+        assert registry.counter("hedges").value(modo="plano") == 1
+        assert registry.counter("vitorias").value(vencedor=RESERVA, modo="plano") == 1
+        # A principal cancelada entra na janela com o tempo decorrido
+        assert len(hedge.latencias) == 1
+
+    @pytest.mark.asyncio
+    async def test_principal_lenta_ainda_pode_vencer(self):
+        hedge, registry = _hedge()
+
+        resultado = await hedge.executar(_chamada(0.05, "principal"), _chamada(5, "reserva"))
+
+        assert resultado == "principal"
+        assert registry.counter("vitorias").value(vencedor=PRINCIPAL) == 1
+
+    @pytest.mark.asyncio
+    async def test_falha_da_reserva_espera_a_principal(self):
+        hedge, _ = _hedge()
+
+        resultado = await hedge.executar(_chamada(0.05, "principal"), _chamada(0, erro=RuntimeError("500")))
+
+        assert resultado == "principal"
+
+    @pytest.mark.asyncio
+    async def test_as_duas_falham_propaga_o_erro_da_principal(self):
+        hedge, _ = _hedge()
+
+        with pytest.raises(ValueError):
+            await hedge.executar(_chamada(0.05, erro=ValueError("principal")), _chamada(0, erro=RuntimeError("reserva")))
+
+    @pytest.mark.asyncio
+    async def test_reserva_bloqueada(self):
+        hedge, registry = _hedge()
+
+        resultado = await hedge.executar(
+            _chamada(0.05, "principal"), _chamada(0, "reserva"), permitir_reserva=lambda: False
+        )
+
+        assert resultado == "principal"
+        assert registry.counter("hedges").value() == 0
+
+
+class TestHedgeNoGemini:
+    """Hedge aplicado à geração assíncrona do gemini_service"""
+
+    @pytest.mark.asyncio
+    async def test_reserva_vai_para_o_modelo_de_fallback(self):
+        from services import gemini_service
+
+        chamados = []
+
+        async def fake_gerar(model_name, system_instruction, prompt_usuario):
+            chamados.append(model_name)
+            await asyncio.sleep(5 if model_name == "modelo-lento" else 0)
+            return f"plano de {model_name}", None
+
+        hedge, _ = _hedge()
+        with patch.object(gemini_service, "_HEDGE_ATIVO", True), \
+             patch.object(gemini_service, "_HEDGE_MODELO", "modelo-rapido"), \
+             patch.object(gemini_service, "gemini_hedge", hedge), \
+             patch.object(gemini_service, "_gerar_async", fake_gerar):
+            resultado = await gemini_service._gerar_com_hedge("modelo-lento", "instr", "prompt")
+
+        assert resultado == ("plano de modelo-rapido", None)
+        assert chamados == ["modelo-lento", "modelo-rapido"]
+
+    @pytest.mark.asyncio
+    async def test_desativado_faz_uma_chamada(self):
+        from services import gemini_service
+
+        chamados = []
+
+        async def fake_gerar(model_name, system_instruction, prompt_usuario):
+            chamados.append(model_name)
+            return "plano", None
+
+        with patch.object(gemini_service, "_HEDGE_ATIVO", False), \
+             patch.object(gemini_service, "_gerar_async", fake_gerar):
+            assert await gemini_service._gerar_com_hedge("modelo", "instr", "prompt") == ("plano", None)
+
+        assert chamados == ["modelo"]
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes do hedge...")
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,149 @@
+"""
+Testes para o resumo incremental do histórico (historico_service.py)
+"""
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+from datetime import datetime
+from bson import ObjectId
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from services.historico_service import (
+    atualizar_resumo,
+    estimar_tokens,
+    obter_resumo_historico,
+    registrar_treino_no_resumo,
+    resumir_plano,
+)
+
+PLANO = """Plano de Treino: Full Body Iniciante
+
+1. Agachamento Livre
+Foco: Pernas e glúteos
+Execução: 3 séries de 12 repetições
+
+### 2. Flexão de Braço
+Foco: Peito e tríceps
+
+3. **Prancha**
+Foco: Abdômen
+"""
+
+
+class TestHistoricoService:
+    """Testes do resumo do histórico"""
+
+    def test_resumir_plano_extrai_titulo_e_exercicios(self):
+        resumo = resumir_plano(PLANO)
+        assert resumo.startswith("Full Body Iniciante")
+        assert "Agachamento Livre" in resumo
+        assert "Flexão de Braço" in resumo
+        assert "Prancha" in resumo
+        assert "Foco" not in resumo
+
+    def test_resumir_resposta_de_chat(self):
+        """Respostas sem formato de plano viram o começo do texto"""
+        resumo = resumir_plano("O **agachamento** trabalha pernas. " * 20)
+        assert len(resumo) <= 123
+        assert resumo.endswith("...")
+
+    def test_resumo_respeita_orcamento(self):
+        """O tamanho do resumo não cresce com o número de treinos"""
+        resumo = ""
+        tamanhos = []
+        for i in range(50):
+            resumo = atualizar_resumo(resumo, PLANO.replace("Iniciante", f"Semana {i}"), max_tokens=60)
+            tamanhos.append(estimar_tokens(resumo))
+
+        assert max(tamanhos) <= 60
+        # mantém as entradas mais recentes
+        assert "Semana 49" in resumo
+        assert "Semana 0 " not in resumo
+
+    @patch('database.mongodb.usuarios_collection')
+    def test_registrar_treino_atualiza_usuario(self, mock_collection):
+        usuario_id = str(ObjectId())
+        mock_collection.find_one.return_value = {"_id": ObjectId(usuario_id), "resumo_historico": "- 2025-01-01: Antigo"}
+        mock_collection.update_one.return_value = SimpleNamespace(matched_count=1)
+
+        resumo = registrar_treino_no_resumo(usuario_id, PLANO, datetime(2025, 1, 8))
+
+        assert resumo.splitlines()[0] == "- 2025-01-01: Antigo"
+        assert resumo.splitlines()[1].startswith("- 2025-01-08: Full Body Iniciante")
+        filtro, update = mock_collection.update_one.call_args.args
+        # Compare-and-set: só grava se o resumo ainda é o que foi lido
+        assert filtro == {"_id": ObjectId(usuario_id), "resumo_historico": "- 2025-01-01: Antigo"}
+        assert update == {"$set": {"resumo_historico": resumo}}
+
+    @patch('database.mongodb.usuarios_collection')
+    def test_registrar_treino_concorrente_rele_e_nao_perde_linhas(self, mock_collection):
+        usuario_id = str(ObjectId())
+        # Outro save gravou "Concorrente" entre a primeira leitura e a escrita
+        mock_collection.find_one.side_effect = [
+            {"_id": ObjectId(usuario_id), "resumo_historico": "- 2025-01-01: Antigo"},
+            {"_id": ObjectId(usuario_id), "resumo_historico": "- 2025-01-01: Antigo\n- 2025-01-08: Concorrente"},
+        ]
+        mock_collection.update_one.side_effect = [SimpleNamespace(matched_count=0), SimpleNamespace(matched_count=1)]
+
+        resumo = registrar_treino_no_resumo(usuario_id, PLANO, datetime(2025, 1, 8))
+
+        linhas = resumo.splitlines()
+        assert linhas[:2] == ["- 2025-01-01: Antigo", "- 2025-01-08: Concorrente"]
+        assert linhas[2].startswith("- 2025-01-08: Full Body Iniciante")
+        assert mock_collection.update_one.call_count == 2
+
+    @patch('database.mongodb.usuarios_collection')
+    def test_registrar_treino_sem_resumo_constroi_com_os_treinos_salvos(self, mock_collection):
+        usuario_id = str(ObjectId())
+        mock_collection.find_one.return_value = {"_id": ObjectId(usuario_id)}
+        mock_collection.update_one.return_value = SimpleNamespace(matched_count=1)
+        treinos = [
+            {"plano_gerado": PLANO.replace("Iniciante", "Novo"), "criado_em": datetime(2025, 2, 1)},
+            {"plano_gerado": PLANO, "criado_em": datetime(2025, 1, 1)},
+        ]
+
+        with patch('services.treino_service.listar_treinos_por_usuario', return_value=treinos) as mock_listar:
+            resumo = registrar_treino_no_resumo(usuario_id, treinos[0]["plano_gerado"], datetime(2025, 2, 1))
+
+        mock_listar.assert_called_once_with(usuario_id)
+        linhas = resumo.splitlines()
+        # Os treinos antigos entram no resumo, não só o novo
+        assert "Full Body Iniciante" in linhas[0]
+        assert "Full Body Novo" in linhas[1]
+        filtro = mock_collection.update_one.call_args.args[0]
+        assert filtro["resumo_historico"] == {"$exists": False}
+
+    @patch('database.mongodb.usuarios_collection', None)
+    def test_obter_resumo_existente_nao_consulta_treinos(self):
+        with patch('services.treino_service.listar_treinos_por_usuario') as mock_listar:
+            resumo = obter_resumo_historico({"_id": str(ObjectId()), "resumo_historico": "- resumo"})
+
+        assert resumo == "- resumo"
+        mock_listar.assert_not_called()
+
+    @patch('database.mongodb.usuarios_collection', None)
+    def test_obter_resumo_ausente_constroi_a_partir_dos_treinos(self):
+        treinos = [
+            {"plano_gerado": PLANO.replace("Iniciante", "Recente"), "criado_em": datetime(2025, 2, 1)},
+            {"plano_gerado": PLANO, "criado_em": datetime(2025, 1, 1)},
+        ]
+        with patch('services.treino_service.listar_treinos_por_usuario', return_value=treinos):
+            resumo = obter_resumo_historico({"_id": str(ObjectId())})
+
+        linhas = resumo.splitlines()
+        assert "Full Body Iniciante" in linhas[0]
+        assert "Full Body Recente" in linhas[1]
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes do resumo de histórico...")
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,195 @@
+"""
+Testes para o registro declarativo de índices (database/indices.py)
+
+Os testes de plano de execução rodam `explain()` nas consultas dos serviços
+contra um mongod local (MONGO_TEST_URI, padrão mongodb://localhost:27017) e
+falham se o plano vencedor tiver COLLSCAN ou SORT em memória. Sem mongod
+disponível, eles são pulados.
+"""
+import os
+import pytest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from bson import ObjectId
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from database.indices import INDICES, sincronizar_collection, sincronizar_indices
+
+
+class FakeCollection:
+    """Collection em memória que só entende índices"""
+
+    def __init__(self, indices=None):
+        self.indices = {"_id_": {"key": [("_id", 1)]}}
+        self.indices.update(indices or {})
+        self.criados = []
+
+    def index_information(self):
+        return {nome: dict(info) for nome, info in self.indices.items()}
+
+    def create_index(self, chaves, name, **opcoes):
+        self.indices[name] = {"key": list(chaves), **opcoes}
+        self.criados.append(name)
+        return name
+
+    def drop_index(self, nome):
+        del self.indices[nome]
+
+
+class TestSincronizacao:
+    """Testes da sincronização idempotente"""
+
+    def test_cria_os_que_faltam_e_e_idempotente(self):
+        treinos = FakeCollection()
+
+        primeira = sincronizar_indices({"treinos": treinos})
+        segunda = sincronizar_indices({"treinos": treinos})
+
+        assert primeira["treinos"]["criados"] == ["usuario_id_1_criado_em_-1__id_-1", "job_id_1"]
+        assert segunda["treinos"]["criados"] == []
+        assert treinos.criados == ["usuario_id_1_criado_em_-1__id_-1", "job_id_1"]
+
+    def test_recria_quando_as_opcoes_mudam(self):
+        uso = FakeCollection({"expira_em_1": {"key": [("expira_em", 1)], "expireAfterSeconds": 3600}})
+
+        relatorio = sincronizar_collection(uso, INDICES["uso_tokens"])
+
+        assert relatorio["recriados"] == ["expira_em_1"]
+        assert uso.indices["expira_em_1"]["expireAfterSeconds"] == 0
+
+    def test_obsoletos_so_sao_removidos_quando_pedido(self):
+        treinos = FakeCollection({"usuario_id_1": {"key": [("usuario_id", 1)]}})
+
+        relatorio = sincronizar_collection(treinos, INDICES["treinos"])
+        assert relatorio["obsoletos"] == ["usuario_id_1"]
+        assert "usuario_id_1" in treinos.indices
+
+        relatorio = sincronizar_collection(treinos, INDICES["treinos"], remover_obsoletos=True)
+        assert relatorio["removidos"] == ["usuario_id_1"]
+        assert "usuario_id_1" not in treinos.indices
+
+    def test_collection_ausente_e_ignorada(self):
+        assert sincronizar_indices({"treinos": None}) == {}
+
+
+# --- Planos de execução (mongod local) ---------------------------------------
+
+def _banco_local():
+    try:
+        from pymongo import MongoClient
+
+        client = MongoClient(
+            os.getenv("MONGO_TEST_URI", "mongodb://localhost:27017"), serverSelectionTimeoutMS=500
+        )
+        client.admin.command("ping")
+    except Exception:
+        return None
+    return client
+
+
+_client = _banco_local()
+
+
+@pytest.fixture(scope="module")
+def banco():
+    db = _client["personalai_test_indices"]
+    for nome in INDICES:
+        db[nome].drop()
+    sincronizar_indices({nome: db[nome] for nome in INDICES})
+
+    usuario_id = ObjectId()
+    agora = datetime.utcnow()
+    db["usuarios"].insert_many([
+        {"email": f"u{i}@example.com", "ativo": True, "resumo_historico": "- treino"} for i in range(50)
+    ])
+    db["treinos"].insert_many([
+        {"usuario_id": ObjectId() if i % 2 else usuario_id, "criado_em": agora - timedelta(hours=i),
+         "plano_gerado": f"Plano {i}", "lote_pregeracao": "2025-W06"}
+        for i in range(200)
+    ])
+    db["jobs"].insert_many([
+        {"status": ("pendente", "processando", "concluido")[i % 3], "criado_em": agora - timedelta(minutes=i),
+         "lease_ate": agora}
+        for i in range(90)
+    ])
+    db["uso_tokens"].insert_many([
+        {"usuario_id": str(usuario_id), "dia": f"2025-02-{d:02d}", "expira_em": agora + timedelta(days=90)}
+        for d in range(1, 28)
+    ])
+    yield db, usuario_id, agora
+    _client.drop_database("personalai_test_indices")
+
+
+def _estagios(plano):
+    """Todos os estágios (stage) de uma árvore de plano do explain."""
+    if isinstance(plano, dict):
+        if "stage" in plano:
+            yield plano["stage"]
+        for valor in plano.values():
+            yield from _estagios(valor)
+    elif isinstance(plano, list):
+        for item in plano:
+            yield from _estagios(item)
+
+
+def _consultas(db, usuario_id, agora):
+    """As consultas dos serviços, na mesma forma usada no código."""
+    return {
+        # auth_service.get_user_by_email
+        "usuarios.email": db["usuarios"].find({"email": "u1@example.com"}).limit(1),
+        # pregeracao_service._buscar_pagina
+        "usuarios.ativos": db["usuarios"].find(
+            {"ativo": {"$ne": False}, "resumo_historico": {"$nin": [None, ""]}, "_id": {"$gt": ObjectId("0" * 24)}}
+        ).sort("_id", 1).limit(100),
+        # treino_service.listar_treinos_por_usuario
+        "treinos.listar": db["treinos"].find({"usuario_id": usuario_id}).sort("criado_em", -1),
+        # treino_service.listar_treinos_paginado (página seguinte)
+        "treinos.pagina": db["treinos"].find({
+            "usuario_id": usuario_id,
+            "$or": [
+                {"criado_em": {"$lt": agora}},
+                {"criado_em": agora, "_id": {"$lt": ObjectId()}},
+            ],
+        }).sort([("criado_em", -1), ("_id", -1)]).limit(21),
+        # pregeracao_service._ja_pregerado
+        "treinos.pregerado": db["treinos"].find({"usuario_id": usuario_id, "lote_pregeracao": "2025-W06"}).limit(1),
+        # job_service.reivindicar_job
+        "jobs.reivindicar": db["jobs"].find({"$or": [
+            {"status": "pendente"},
+            {"status": "processando", "lease_ate": {"$lt": agora}},
+        ]}).sort([("criado_em", 1)]).limit(1),
+        # uso_service.obter_uso
+        "uso_tokens.periodo": db["uso_tokens"].find({"usuario_id": str(usuario_id), "dia": {"$gte": "2025-02-01"}}),
+    }
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(_client is None, reason="mongod local indisponível (MONGO_TEST_URI)")
+class TestPlanosDeExecucao:
+    """Nenhuma consulta dos serviços pode varrer a collection ou ordenar em memória"""
+
+    @pytest.mark.parametrize("consulta", [
+        "usuarios.email", "usuarios.ativos", "treinos.listar", "treinos.pagina",
+        "treinos.pregerado", "jobs.reivindicar", "uso_tokens.periodo",
+    ])
+    def test_sem_collscan_nem_sort_em_memoria(self, banco, consulta):
+        cursor = _consultas(*banco)[consulta]
+
+        plano = cursor.explain()["queryPlanner"]["winningPlan"]
+        estagios = set(_estagios(plano))
+
+        assert "COLLSCAN" not in estagios, f"{consulta}: {estagios}"
+        assert "SORT" not in estagios, f"{consulta}: {estagios}"
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes dos índices...")
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,90 @@
+"""
+Testes para o roteador local de intenção (intent_router.py)
+"""
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from services import intent_router
+from services.intent_router import DUVIDA, FORA_DO_TEMA, PLANO, SAUDACAO, classificar
+from models.schemas import MensagemChat
+
+
+class TestIntentRouter:
+    """Testes da classificação de intenção"""
+
+    @pytest.mark.parametrize("mensagem", ["oi", "Olá!", "bom dia", "Boa noite, tudo bem?", ""])
+    def test_saudacoes(self, mensagem):
+        assert classificar(mensagem) == SAUDACAO
+
+    @pytest.mark.parametrize("mensagem", [
+        "me passa uma receita de bolo",
+        "qual o melhor filme do ano?",
+        "oi, me conta uma piada",
+    ])
+    def test_fora_do_tema(self, mensagem):
+        assert classificar(mensagem) == FORA_DO_TEMA
+
+    def test_pedido_de_plano(self):
+        assert classificar("Monte um plano de treino de 4 dias para hipertrofia") == PLANO
+
+    def test_plano_curto_ou_com_duvida_vira_duvida(self):
+        """Mantém a regra antiga: pedidos curtos ou com dúvida usam o modo chat"""
+        assert classificar("quero um treino") == DUVIDA
+        assert classificar("qual alternativa de treino para quem tem pouco tempo livre") == DUVIDA
+
+    def test_fronteira_de_palavra(self):
+        """'oi' não casa dentro de 'foi' / 'depois'"""
+        assert classificar("foi difícil o treino de ontem, depois quero outro plano completo") == PLANO
+
+    def test_acentos_sao_ignorados(self):
+        assert classificar("Como é a execução do agachamento?") == DUVIDA
+        assert classificar("como e a execucao do agachamento?") == DUVIDA
+
+    def test_vocabulario_de_treino_impede_recusa(self):
+        """Mensagens sobre treino/saúde nunca são recusadas localmente"""
+        assert classificar("sinto dor no joelho") == DUVIDA
+        assert classificar("música boa para ouvir na academia") == DUVIDA
+
+
+class TestGeminiComRoteador:
+    """Respostas locais não chamam o Gemini"""
+
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    def test_saudacao_respondida_localmente(self, mock_settings, mock_genai):
+        from services.gemini_service import gerar_plano_de_treino
+
+        mock_settings.GEMINI_API_KEY = 'test_key'
+
+        resultado = gerar_plano_de_treino(MensagemChat(mensagem_usuario="oi"))
+
+        assert resultado == intent_router.RESPOSTA_SAUDACAO
+        mock_genai.GenerativeModel.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    async def test_fora_do_tema_respondido_localmente_async(self, mock_settings, mock_genai):
+        from services.gemini_service import gerar_plano_de_treino_async
+
+        mock_settings.GEMINI_API_KEY = 'test_key'
+
+        resultado = await gerar_plano_de_treino_async(MensagemChat(mensagem_usuario="me passa uma receita de bolo"))
+
+        assert resultado == intent_router.RESPOSTA_FORA_DO_TEMA
+        mock_genai.GenerativeModel.assert_not_called()
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes do roteador de intenção...")
+    pytest.main([__file__, "-v"])
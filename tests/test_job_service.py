@@ -0,0 +1,241 @@
+"""
+Testes para a fila durável de geração de planos (job_service.py)
+"""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock, AsyncMock
+from bson import ObjectId
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from services import job_service
+from models.schemas import MensagemChat
+
+
+class TestJobService:
+    """Testes do ciclo de vida dos jobs"""
+
+    @patch('services.job_service.mongodb')
+    def test_criar_job_pendente(self, mock_mongodb):
+        job_id = ObjectId()
+        mock_mongodb.jobs_collection.insert_one.return_value = MagicMock(inserted_id=job_id)
+
+        job = job_service.criar_job("u1", "a@b.com", MensagemChat(mensagem_usuario="Quero um treino"))
+
+        assert job["_id"] == str(job_id)
+        assert job["status"] == job_service.PENDENTE
+        assert job["tentativas"] == 0
+        doc = mock_mongodb.jobs_collection.insert_one.call_args.args[0]
+        assert doc["mensagem"]["mensagem_usuario"] == "Quero um treino"
+
+    @patch('services.job_service.mongodb')
+    def test_criar_job_sem_banco(self, mock_mongodb):
+        mock_mongodb.jobs_collection = None
+
+        with pytest.raises(RuntimeError):
+            job_service.criar_job("u1", "a@b.com", MensagemChat(mensagem_usuario="x"))
+
+    @patch('services.job_service.mongodb')
+    def test_reivindicar_inclui_leases_vencidos(self, mock_mongodb):
+        job_service.reivindicar_job("w1", lease_seconds=30)
+
+        filtro, update = mock_mongodb.jobs_collection.find_one_and_update.call_args.args
+        status = [c["status"] for c in filtro["$or"]]
+        assert status == [job_service.PENDENTE, job_service.PROCESSANDO]
+        assert update["$set"]["worker_id"] == "w1"
+        assert update["$inc"] == {"tentativas": 1}
+
+    @patch('services.job_service.mongodb')
+    def test_lease_vencido_respeita_max_tentativas(self, mock_mongodb):
+        job_service.reivindicar_job("w1", lease_seconds=30)
+
+        filtro = mock_mongodb.jobs_collection.find_one_and_update.call_args.args[0]
+        assert filtro["$or"][1]["$expr"] == {"$lt": ["$tentativas", "$max_tentativas"]}
+
+        # Os vencidos que esgotaram as tentativas viram erro
+        filtro, update = mock_mongodb.jobs_collection.update_many.call_args.args
+        assert filtro["status"] == job_service.PROCESSANDO
+        assert filtro["$expr"] == {"$gte": ["$tentativas", "$max_tentativas"]}
+        assert update["$set"]["status"] == job_service.ERRO
+
+    @patch('services.job_service.mongodb')
+    def test_falhar_job_volta_para_fila_ate_max_tentativas(self, mock_mongodb):
+        job = {"_id": ObjectId(), "tentativas": 1, "max_tentativas": 2}
+        assert job_service.falhar_job(job, "w1", "boom") == job_service.PENDENTE
+
+        job["tentativas"] = 2
+        assert job_service.falhar_job(job, "w1", "boom") == job_service.ERRO
+
+    @pytest.mark.asyncio
+    @patch('services.job_service.mongodb')
+    async def test_processar_job_salva_e_conclui(self, mock_mongodb):
+        mock_mongodb.jobs_collection.update_one.return_value = MagicMock(modified_count=1)
+        usuario = {"_id": ObjectId(), "email": "a@b.com"}
+        job = {
+            "_id": ObjectId(), "email": "a@b.com", "tentativas": 1,
+            "mensagem": {"mensagem_usuario": "Quero um plano de treino completo hoje"},
+        }
+
+        with patch('services.auth_service.get_user_by_email', return_value=usuario), \
+             patch('services.historico_service.obter_resumo_historico', return_value=""), \
+             patch('services.gemini_service.gerar_plano_de_treino_async', AsyncMock(return_value="Plano")), \
+             patch('services.treino_service.salvar_treino', return_value={"_id": "t1"}) as mock_salvar:
+            status = await job_service.processar_job(job, "w1")
+
+        assert status == job_service.CONCLUIDO
+        assert mock_salvar.call_args.kwargs["plano_gerado"] == "Plano"
+        assert mock_salvar.call_args.kwargs["user_context"]["job_id"] == str(job["_id"])
+        update = mock_mongodb.jobs_collection.update_one.call_args.args[1]
+        assert update["$set"]["resultado"]["treino_id"] == "t1"
+
+    @pytest.mark.asyncio
+    @patch('services.job_service.mongodb')
+    async def test_reprocessamento_reaproveita_treino_do_job(self, mock_mongodb):
+        mock_mongodb.jobs_collection.update_one.return_value = MagicMock(modified_count=1)
+        usuario = {"_id": ObjectId(), "email": "a@b.com"}
+        job = {
+            "_id": ObjectId(), "email": "a@b.com", "tentativas": 2,
+            "mensagem": {"mensagem_usuario": "Quero um plano de treino completo hoje"},
+        }
+
+        with patch('services.auth_service.get_user_by_email', return_value=usuario), \
+             patch('services.historico_service.obter_resumo_historico', return_value=""), \
+             patch('services.gemini_service.gerar_plano_de_treino_async', AsyncMock(return_value="Plano")), \
+             patch('services.treino_service.buscar_treino_do_job', return_value={"_id": "t_salvo"}) as mock_buscar, \
+             patch('services.treino_service.salvar_treino') as mock_salvar:
+            status = await job_service.processar_job(job, "w1")
+
+        assert status == job_service.CONCLUIDO
+        mock_buscar.assert_called_once_with(job["_id"])
+        mock_salvar.assert_not_called()
+        update = mock_mongodb.jobs_collection.update_one.call_args.args[1]
+        assert update["$set"]["resultado"]["treino_id"] == "t_salvo"
+
+    @patch('services.job_service.mongodb')
+    def test_concluir_e_renovar_exigem_lease_vigente(self, mock_mongodb):
+        mock_mongodb.jobs_collection.update_one.return_value = MagicMock(modified_count=0)
+        job_id = ObjectId()
+
+        assert job_service.renovar_lease(job_id, "w1", lease_seconds=30) is False
+        filtro = mock_mongodb.jobs_collection.update_one.call_args.args[0]
+        assert filtro["worker_id"] == "w1" and "$gt" in filtro["lease_ate"]
+
+        assert job_service.concluir_job(job_id, "w1", {}) is False
+        filtro = mock_mongodb.jobs_collection.update_one.call_args.args[0]
+        assert filtro["worker_id"] == "w1" and "$gt" in filtro["lease_ate"]
+
+    @pytest.mark.asyncio
+    @patch('services.job_service.mongodb')
+    async def test_processar_job_resposta_de_erro_falha_sem_salvar(self, mock_mongodb):
+        mock_mongodb.jobs_collection.update_one.return_value = MagicMock(modified_count=1)
+        usuario = {"_id": ObjectId(), "email": "a@b.com"}
+        job = {
+            "_id": ObjectId(), "email": "a@b.com", "tentativas": 1, "max_tentativas": 3,
+            "mensagem": {"mensagem_usuario": "Quero um plano de treino completo hoje"},
+        }
+        erro = "Ocorreu um erro ao se comunicar com a API do Gemini: 503"
+
+        with patch('services.auth_service.get_user_by_email', return_value=usuario), \
+             patch('services.historico_service.obter_resumo_historico', return_value=""), \
+             patch('services.gemini_service.gerar_plano_de_treino_async', AsyncMock(return_value=erro)), \
+             patch('services.treino_service.salvar_treino') as mock_salvar:
+            status = await job_service.processar_job(job, "w1")
+
+        assert status == job_service.PENDENTE
+        mock_salvar.assert_not_called()
+        update = mock_mongodb.jobs_collection.update_one.call_args.args[1]
+        assert update["$set"]["erro"] == erro
+
+    @pytest.mark.asyncio
+    @patch('services.job_service.mongodb')
+    async def test_processar_job_lease_perdido_descarta(self, mock_mongodb):
+        mock_mongodb.jobs_collection.update_one.return_value = MagicMock(modified_count=0)
+        usuario = {"_id": ObjectId(), "email": "a@b.com"}
+        job = {
+            "_id": ObjectId(), "email": "a@b.com", "tentativas": 1,
+            "mensagem": {"mensagem_usuario": "Quero um plano de treino completo hoje"},
+        }
+
+        with patch('services.auth_service.get_user_by_email', return_value=usuario), \
+             patch('services.historico_service.obter_resumo_historico', return_value=""), \
+             patch('services.gemini_service.gerar_plano_de_treino_async', AsyncMock(return_value="Plano")), \
+             patch('services.treino_service.salvar_treino') as mock_salvar:
+            status = await job_service.processar_job(job, "w1")
+
+        assert status == job_service.LEASE_PERDIDO
+        mock_salvar.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('services.job_service.mongodb')
+    async def test_heartbeat_renova_o_lease(self, mock_mongodb):
+        mock_mongodb.jobs_collection.update_one.return_value = MagicMock(modified_count=1)
+        job_id = ObjectId()
+
+        async def gerar_devagar(*args, **kwargs):
+            await asyncio.sleep(0.1)
+            return "Plano"
+
+        usuario = {"_id": ObjectId(), "email": "a@b.com"}
+        job = {
+            "_id": job_id, "email": "a@b.com", "tentativas": 1,
+            "mensagem": {"mensagem_usuario": "Quero um plano de treino completo hoje"},
+        }
+        with patch.object(job_service.settings, "JOBS_LEASE_SECONDS", 0.06), \
+             patch('services.auth_service.get_user_by_email', return_value=usuario), \
+             patch('services.historico_service.obter_resumo_historico', return_value=""), \
+             patch('services.gemini_service.gerar_plano_de_treino_async', gerar_devagar), \
+             patch('services.treino_service.salvar_treino', return_value={"_id": "t1"}):
+            status = await job_service.processar_job(job, "w1")
+
+        assert status == job_service.CONCLUIDO
+        renovacoes = [
+            c for c in mock_mongodb.jobs_collection.update_one.call_args_list
+            if set(c.args[1]["$set"]) == {"lease_ate", "atualizado_em"}
+        ]
+        # Heartbeat durante a geração + renovação antes de salvar
+        assert len(renovacoes) >= 3
+
+    @pytest.mark.asyncio
+    @patch('services.job_service.mongodb')
+    async def test_worker_para_quando_sinalizado(self, mock_mongodb):
+        mock_mongodb.jobs_collection.find_one_and_update.return_value = None
+        parar = asyncio.Event()
+
+        with patch.object(job_service.settings, "JOBS_POLL_SECONDS", 0.01):
+            worker = asyncio.create_task(job_service.executar_worker(parar, "w1"))
+            await asyncio.sleep(0.05)
+            parar.set()
+            await asyncio.wait_for(worker, timeout=1)
+
+        assert mock_mongodb.jobs_collection.find_one_and_update.called
+
+    @pytest.mark.asyncio
+    @patch('services.job_service.mongodb')
+    async def test_worker_sobrevive_a_erro_no_processamento(self, mock_mongodb):
+        mock_mongodb.jobs_collection.find_one_and_update.return_value = {"_id": ObjectId()}
+        parar = asyncio.Event()
+        chamadas = []
+
+        async def processar_com_erro(job, worker_id):
+            chamadas.append(job)
+            if len(chamadas) >= 2:
+                parar.set()
+            raise RuntimeError("banco fora")
+
+        with patch.object(job_service, "processar_job", processar_com_erro):
+            await asyncio.wait_for(job_service.executar_worker(parar, "w1"), timeout=1)
+
+        assert len(chamadas) == 2
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes da fila de jobs...")
+    pytest.main([__file__, "-v"])
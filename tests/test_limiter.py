@@ -0,0 +1,184 @@
+"""
+Testes para o limitador adaptativo e as retentativas (utils/limiter.py, utils/retry.py)
+"""
+import asyncio
+import threading
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from utils.limiter import AdaptiveLimiter, LimiteExcedido
+from utils.metrics import Counter
+from utils.retry import calcular_espera, executar_com_retry, executar_com_retry_async
+from models.schemas import MensagemChat
+
+
+class ResourceExhausted(Exception):
+    """Imita google.api_core.exceptions.ResourceExhausted (HTTP 429)"""
+    code = 429
+
+
+class TestAdaptiveLimiter:
+    """Testes do limite AIMD e da fila"""
+
+    def test_aumento_aditivo_e_reducao_multiplicativa(self):
+        limiter = AdaptiveLimiter(limite_inicial=4, limite_min=1, limite_max=10)
+        # +1/limite a cada sucesso: ~uma janela inteira para subir uma vaga
+        for _ in range(5):
+            limiter.sucesso()
+        assert limiter.limite == 5
+
+        limiter.sobrecarga()
+        assert limiter.limite == 2
+        limiter.sobrecarga()
+        limiter.sobrecarga()
+        assert limiter.limite == 1  # nunca abaixo do mínimo
+
+    def test_fila_cheia_recusa_imediatamente(self):
+        rejeicoes = Counter("teste_rejeicoes")
+        limiter = AdaptiveLimiter(limite_inicial=1, fila_max=0, rejeicoes=rejeicoes)
+        limiter.acquire()
+
+        with pytest.raises(LimiteExcedido) as exc:
+            limiter.acquire(timeout=1)
+
+        assert exc.value.motivo == "fila_cheia"
+        assert rejeicoes.value(motivo="fila_cheia") == 1
+
+    def test_timeout_na_fila(self):
+        limiter = AdaptiveLimiter(limite_inicial=1, fila_max=5)
+        limiter.acquire()
+
+        with pytest.raises(LimiteExcedido) as exc:
+            limiter.acquire(timeout=0.01)
+
+        assert exc.value.motivo == "timeout"
+        assert limiter.fila == 0
+
+    def test_release_libera_thread_na_fila(self):
+        limiter = AdaptiveLimiter(limite_inicial=1, fila_max=5)
+        limiter.acquire()
+        obtida = threading.Event()
+
+        def esperar():
+            limiter.acquire(timeout=5)
+            obtida.set()
+
+        t = threading.Thread(target=esperar)
+        t.start()
+        while limiter.fila == 0:
+            pass
+        limiter.release()
+        t.join(timeout=5)
+
+        assert obtida.is_set()
+        assert limiter.em_andamento == 1
+
+    @pytest.mark.asyncio
+    async def test_corrotinas_respeitam_o_limite(self):
+        limiter = AdaptiveLimiter(limite_inicial=2, limite_max=2, fila_max=10)
+        simultaneas = []
+        pico = []
+
+        async def tarefa():
+            async with limiter.slot_async(timeout=5):
+                simultaneas.append(1)
+                pico.append(len(simultaneas))
+                await asyncio.sleep(0.01)
+                simultaneas.pop()
+
+        await asyncio.gather(*[tarefa() for _ in range(6)])
+
+        assert max(pico) == 2
+        assert limiter.em_andamento == 0
+
+
+class TestRetry:
+    """Testes do backoff exponencial com jitter"""
+
+    def test_espera_limitada_pelo_maximo(self):
+        for tentativa in range(10):
+            assert 0 <= calcular_espera(tentativa, base=0.5, maximo=2) <= 2
+
+    def test_repete_erros_retentaveis(self):
+        funcao = MagicMock(side_effect=[ResourceExhausted(), ResourceExhausted(), "ok"])
+        contador = Counter("teste_retries")
+        esperas = []
+
+        resultado = executar_com_retry(
+            funcao, lambda e: isinstance(e, ResourceExhausted), max_retries=3,
+            contador=contador, dormir=esperas.append,
+        )
+
+        assert resultado == "ok"
+        assert funcao.call_count == 3
+        assert len(esperas) == 2
+        assert contador.value(erro="ResourceExhausted") == 2
+
+    def test_nao_repete_erro_definitivo(self):
+        funcao = MagicMock(side_effect=ValueError("erro"))
+
+        with pytest.raises(ValueError):
+            executar_com_retry(funcao, lambda e: False, dormir=lambda s: None)
+        assert funcao.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_desiste_apos_max_retries_async(self):
+        tentativas = []
+
+        async def falha():
+            tentativas.append(1)
+            raise ResourceExhausted()
+
+        with pytest.raises(ResourceExhausted):
+            await executar_com_retry_async(falha, lambda e: True, max_retries=2, base=0)
+
+        assert len(tentativas) == 3
+
+
+class TestGeminiComLimiter:
+    """Integração com o gemini_service"""
+
+    @patch('services.gemini_service.executar_com_retry')
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    def test_429_reduz_limite(self, mock_settings, mock_genai, mock_retry):
+        from services import gemini_service
+
+        mock_settings.GEMINI_API_KEY = 'test_key'
+        mock_settings.GEMINI_MODEL = 'gemini-2.5-flash-lite'
+        mock_model = MagicMock()
+        mock_model.generate_content.side_effect = ResourceExhausted("quota")
+        mock_genai.GenerativeModel.return_value = mock_model
+        mock_genai.list_models.return_value = []
+        # executa uma única tentativa (sem esperas)
+        mock_retry.side_effect = lambda funcao, *a, **k: funcao()
+
+        limiter = AdaptiveLimiter(limite_inicial=8)
+        with patch.object(gemini_service, "gemini_limiter", limiter):
+            resultado = gemini_service.gerar_plano_de_treino(MensagemChat(mensagem_usuario="Quero um treino"))
+
+        assert "Ocorreu um erro ao se comunicar com a API do Gemini" in resultado
+        assert limiter.limite == 4
+        assert limiter.em_andamento == 0
+
+    def test_classificacao_de_erros(self):
+        from services.gemini_service import _erro_de_sobrecarga, _erro_retentavel
+
+        assert _erro_de_sobrecarga(ResourceExhausted())
+        assert _erro_retentavel(ResourceExhausted())
+        assert not _erro_retentavel(ValueError("prompt inválido"))
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes do limitador...")
+    pytest.main([__file__, "-v"])
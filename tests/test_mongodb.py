@@ -99,6 +99,217 @@ class TestMongoDBClient:
         assert client is not None
 
 
+class TestSondagemEstrategias:
+    """Sondagem paralela das estratégias de TLS e estratégia lembrada"""
+
+    @staticmethod
+    def _clientes(atrasos):
+        """MongoClient falso: o ping de cada estratégia demora/falha conforme `atrasos`"""
+        import time
+
+        criados = {}
+
+        def fabrica(uri, **opcoes):
+            nome = "minima" if opcoes.get("ssl") else ("certifi" if "tlsCAFile" in opcoes else "padrao")
+            atraso = atrasos[nome]
+
+            def ping(_):
+                if atraso is None:
+                    raise ConnectionFailure(nome)
+                time.sleep(atraso)
+                return {"ok": 1}
+
+            criados[nome] = MagicMock(admin=MagicMock(command=MagicMock(side_effect=ping)))
+            return criados[nome]
+        return fabrica, criados
+
+    def test_estrategia_lenta_nao_segura_as_demais(self, tmp_path):
+        """Com a primeira pendurada, a segunda começa após o atraso e vence"""
+        import time
+        from database import mongodb
+
+        fabrica, criados = self._clientes({"padrao": 1.0, "certifi": 0, "minima": None})
+        with patch.object(mongodb, "MongoClient", side_effect=fabrica), \
+             patch.object(mongodb.settings, "MONGO_SONDA_ATRASO_MS", 50), \
+             patch.object(mongodb, "arquivo_estrategia", str(tmp_path / "estrategia.json")):
+            inicio = time.monotonic()
+            client, _ = mongodb.create_mongodb_client()
+            decorrido = time.monotonic() - inicio
+
+            assert client is criados["certifi"]
+            assert decorrido < 0.8
+            assert "minima" not in criados
+            # A vencedora é tentada primeiro no próximo start
+            assert mongodb.ordem_estrategias()[0] == "certifi"
+
+        time.sleep(1.1)  # a sonda perdedora termina e seu cliente é fechado
+        criados["padrao"].close.assert_called_once()
+
+    def test_arquivo_invalido_usa_ordem_padrao(self, tmp_path):
+        from database import mongodb
+
+        arquivo = tmp_path / "estrategia.json"
+        arquivo.write_text("{lixo")
+        with patch.object(mongodb, "arquivo_estrategia", str(arquivo)):
+            assert mongodb.ordem_estrategias() == list(mongodb.ESTRATEGIAS)
+
+
+class TestPoolDeConexoes:
+    """Opções de pool/compressão e métricas dos eventos do pool"""
+
+    def test_opcoes_vem_das_settings(self):
+        from database import mongodb
+
+        with patch.object(mongodb.settings, "MONGO_MAX_POOL_SIZE", 20), \
+             patch.object(mongodb.settings, "MONGO_MIN_POOL_SIZE", 2), \
+             patch.object(mongodb.settings, "MONGO_MAX_IDLE_TIME_MS", 0), \
+             patch.object(mongodb.settings, "MONGO_WAIT_QUEUE_TIMEOUT_MS", 500), \
+             patch.object(mongodb.settings, "MONGO_COMPRESSORES", "zlib"):
+            opcoes = mongodb.opcoes_pool()
+
+        assert opcoes == {"maxPoolSize": 20, "minPoolSize": 2, "waitQueueTimeoutMS": 500, "compressors": ["zlib"]}
+
+    def test_compressores_sem_pacote_sao_ignorados(self):
+        from database import mongodb
+
+        with patch('database.mongodb.importlib.util.find_spec', return_value=None):
+            assert mongodb.compressores_disponiveis("zstd, snappy,zlib,lz4,zlib") == ["zlib"]
+
+    def test_eventos_do_pool_viram_metricas(self):
+        from pymongo import monitoring
+        from database import monitoramento
+
+        monitor = monitoramento.MonitorPool("teste")
+        endereco = ("localhost", 27017)
+        conexoes = monitoramento.pool_conexoes.value(cliente="teste")
+        esperas = monitoramento.pool_espera.count(cliente="teste")
+
+        monitor.connection_created(monitoring.ConnectionCreatedEvent(endereco, 1))
+        monitor.connection_checked_out(monitoring.ConnectionCheckedOutEvent(endereco, 1, 0.002))
+        assert monitoramento.pool_em_uso.value(cliente="teste") == 1
+        monitor.connection_checked_in(monitoring.ConnectionCheckedInEvent(endereco, 1))
+        monitor.connection_check_out_failed(
+            monitoring.ConnectionCheckOutFailedEvent(endereco, monitoring.ConnectionCheckOutFailedReason.TIMEOUT, 0.5)
+        )
+
+        assert monitoramento.pool_conexoes.value(cliente="teste") == conexoes + 1
+        assert monitoramento.pool_em_uso.value(cliente="teste") == 0
+        assert monitoramento.pool_espera.count(cliente="teste") == esperas + 2
+        assert monitoramento.pool_falhas.value(cliente="teste", motivo="timeout") >= 1
+
+
+class TestMonitorComandos:
+    """Latência por comando/collection e log de consultas lentas"""
+
+    @staticmethod
+    def _executar(monitor, comando, resposta, micros, request_id=1):
+        from datetime import timedelta
+        from pymongo import monitoring
+
+        endereco = ("localhost", 27017)
+        nome = next(iter(comando))
+        monitor.started(monitoring.CommandStartedEvent(comando, "personalai_db", request_id, endereco, request_id))
+        monitor.succeeded(monitoring.CommandSucceededEvent(
+            timedelta(microseconds=micros), resposta, nome, request_id, endereco, request_id
+        ))
+
+    def test_forma_do_filtro_oculta_literais(self):
+        from database.monitoramento import forma_do_filtro
+
+        filtro = {"usuario_id": "abc", "$or": [{"criado_em": {"$lt": 1}}, {"criado_em": 2, "_id": {"$lt": 3}}],
+                  "status": {"$in": ["a", "b", "c"]}}
+
+        assert forma_do_filtro(filtro) == {
+            "usuario_id": "?",
+            "$or": [{"criado_em": {"$lt": "?"}}, {"criado_em": "?", "_id": {"$lt": "?"}}],
+            "status": {"$in": ["?"]},
+        }
+
+    def test_registra_latencia_documentos_e_bytes(self):
+        from database import monitoramento
+
+        monitor = monitoramento.MonitorComandos("teste-cmd")
+        labels = {"cliente": "teste-cmd", "comando": "find", "collection": "treinos"}
+        resposta = {"cursor": {"firstBatch": [{"_id": 1}, {"_id": 2}], "id": 0, "ns": "db.treinos"}, "ok": 1}
+
+        with patch.object(monitoramento.settings, "MONGO_LENTO_MS", 0), \
+             patch.object(monitoramento.settings, "MONGO_CONTAR_BYTES", True):
+            self._executar(monitor, {"find": "treinos", "filter": {"usuario_id": 1}}, resposta, 2000)
+
+        assert monitoramento.comando_duracao.count(**labels) == 1
+        assert monitoramento.comando_documentos.value(**labels) == 2
+        assert monitoramento.comando_bytes.value(cliente="teste-cmd", direcao="recebido") > 0
+        assert monitor._em_andamento == {}
+
+    def test_bytes_so_com_contagem_ligada(self):
+        from database import monitoramento
+
+        monitor = monitoramento.MonitorComandos("teste-sem-bytes")
+        with patch.object(monitoramento.settings, "MONGO_CONTAR_BYTES", False), \
+             patch.object(monitoramento, "_tamanho_bson") as mock_tamanho:
+            self._executar(monitor, {"find": "treinos", "filter": {}}, {"ok": 1}, 100)
+
+        mock_tamanho.assert_not_called()
+        assert monitoramento.comando_bytes.value(cliente="teste-sem-bytes", direcao="enviado") == 0
+
+    def test_comando_lento_vai_para_o_log_sem_valores(self, capsys):
+        from database import monitoramento
+
+        monitor = monitoramento.MonitorComandos("teste-lento")
+        comando = {"update": "usuarios", "updates": [{"q": {"email": "segredo@example.com"}, "u": {"$set": {"x": 1}}}]}
+
+        with patch.object(monitoramento.settings, "MONGO_LENTO_MS", 100):
+            self._executar(monitor, comando, {"n": 1, "ok": 1}, 50_000, request_id=1)
+            self._executar(monitor, comando, {"n": 1, "ok": 1}, 250_000, request_id=2)
+
+        saida = capsys.readouterr().out
+        assert saida.count("MongoDB lento") == 1
+        assert '{"email": "?"}' in saida
+        assert "segredo" not in saida
+        assert monitoramento.comandos_lentos.value(cliente="teste-lento", comando="update", collection="usuarios") == 1
+
+    def test_ignora_comandos_de_conexao(self):
+        from database import monitoramento
+
+        monitor = monitoramento.MonitorComandos("teste-ping")
+        self._executar(monitor, {"ping": 1}, {"ok": 1}, 100)
+
+        assert monitoramento.comandos_total.value(cliente="teste-ping", comando="ping", collection="-", status="ok") == 0
+
+
+class TestConexaoSobDemanda:
+    """A conexão só acontece no primeiro acesso (nunca no import)"""
+
+    def test_primeiro_acesso_conecta_uma_vez(self):
+        from database import mongodb
+
+        fake_db = MagicMock(name="db")
+        fake_client = MagicMock()
+        fake_client.__getitem__.return_value = fake_db
+        with patch.object(mongodb, "_conexao_resolvida", False), \
+             patch.dict(mongodb._conexao, dict.fromkeys(mongodb._conexao)), \
+             patch.object(mongodb, "is_testing", False), \
+             patch.object(mongodb, "uri", "mongodb://exemplo"), \
+             patch.object(mongodb, "create_mongodb_client", return_value=(fake_client, "personalai_db")) as mock_criar:
+            mock_criar.assert_not_called()
+
+            assert mongodb.treinos_collection is fake_db["treinos"]
+            assert mongodb.db is fake_db
+            mock_criar.assert_called_once()
+
+    def test_falha_na_conexao_deixa_collections_none(self):
+        from database import mongodb
+
+        with patch.object(mongodb, "_conexao_resolvida", False), \
+             patch.dict(mongodb._conexao, dict.fromkeys(mongodb._conexao)), \
+             patch.object(mongodb, "is_testing", False), \
+             patch.object(mongodb, "uri", "mongodb://exemplo"), \
+             patch.object(mongodb, "create_mongodb_client", side_effect=ConnectionError("sem rede")):
+            assert mongodb.conectar() is None
+            assert mongodb.usuarios_collection is None
+            assert mongodb.conexao_resolvida() is True
+
+
 class TestMongoDBSetup:
     """Testes para a configuração do MongoDB"""
 
@@ -123,7 +334,7 @@ class TestMongoDBSetup:
 
         # Verifica que índices foram criados
         mock_usuarios.create_index.assert_called_once()
-        mock_treinos.create_index.assert_called_once()
+        assert mock_treinos.create_index.call_count == 2  # listagem e job_id
         mock_historico.create_index.assert_called_once()
 
     @patch('database.mongodb.db', None)
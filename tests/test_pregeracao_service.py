@@ -0,0 +1,228 @@
+"""
+Testes para a pré-geração em lote dos planos semanais (pregeracao_service.py)
+"""
+import asyncio
+import pytest
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch, MagicMock, AsyncMock
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from services import intent_router, pregeracao_service
+from services.pregeracao_service import FALHA, FALHAS_IDS, GERADO, PULADO
+
+
+def _usuarios(n):
+    return [{"_id": i, "email": f"u{i}@example.com", "equipamentos": "halteres, elástico"} for i in range(1, n + 1)]
+
+
+class FakeBanco:
+    """Usuários paginados por _id e checkpoints em memória"""
+
+    def __init__(self, usuarios):
+        self.usuarios = usuarios
+        self.checkpoints = {}
+        self.paginas = 0
+
+    def buscar_pagina(self, ultimo_id, tamanho):
+        self.paginas += 1
+        restantes = [u for u in self.usuarios if ultimo_id is None or u["_id"] > ultimo_id]
+        return restantes[:tamanho]
+
+    def carregar(self, lote):
+        return dict(self.checkpoints.get(lote) or {"_id": f"pregeracao:{lote}", "ultimo_id": None})
+
+    def salvar(self, checkpoint):
+        self.checkpoints[checkpoint["_id"].split(":", 1)[1]] = dict(checkpoint)
+
+
+@pytest.fixture
+def banco():
+    banco = FakeBanco(_usuarios(5))
+    with patch.object(pregeracao_service, "_buscar_pagina", banco.buscar_pagina), \
+         patch.object(pregeracao_service, "carregar_checkpoint", banco.carregar), \
+         patch.object(pregeracao_service, "salvar_checkpoint", banco.salvar), \
+         patch.object(pregeracao_service.mongodb, "usuarios_collection", MagicMock()):
+        yield banco
+
+
+class TestPregeracao:
+    """Testes da paginação, paralelismo e checkpoints"""
+
+    def test_lote_da_semana_seguinte(self):
+        assert pregeracao_service.lote_da_semana(datetime(2025, 2, 2)) == "2025-W06"
+
+    def test_mensagem_semanal_e_pedido_de_plano(self):
+        data = pregeracao_service.montar_mensagem_semanal({"equipamentos": "halteres, elástico", "nivel": "avançado"})
+
+        assert intent_router.classificar(data.mensagem_usuario) == intent_router.PLANO
+        assert data.equipamentos == ["halteres", "elástico"]
+        assert data.nivel == "avançado"
+
+    @pytest.mark.asyncio
+    async def test_paginas_com_paralelismo_limitado(self, banco):
+        simultaneos = []
+        pico = []
+
+        async def fake_pregerar(user, lote):
+            simultaneos.append(1)
+            pico.append(len(simultaneos))
+            await asyncio.sleep(0.01)
+            simultaneos.pop()
+            return GERADO
+
+        with patch.object(pregeracao_service, "pregerar_usuario", fake_pregerar):
+            checkpoint = await pregeracao_service.pregerar_planos(lote="L1", paralelismo=2, tamanho_pagina=2)
+
+        assert checkpoint["concluido"] is True
+        assert checkpoint[GERADO] == 5
+        assert max(pico) == 2
+        assert banco.paginas == 4  # 2 + 2 + 1 + página vazia
+
+    @pytest.mark.asyncio
+    async def test_retoma_do_checkpoint(self, banco):
+        processados = []
+
+        async def fake_pregerar(user, lote):
+            processados.append(user["_id"])
+            return GERADO
+
+        with patch.object(pregeracao_service, "pregerar_usuario", fake_pregerar):
+            parcial = await pregeracao_service.pregerar_planos(lote="L2", tamanho_pagina=2, limite=3)
+            assert not parcial.get("concluido")
+            final = await pregeracao_service.pregerar_planos(lote="L2", tamanho_pagina=2)
+
+        assert processados == [1, 2, 3, 4, 5]
+        assert final[GERADO] == 5
+        assert final["concluido"] is True
+
+    @pytest.mark.asyncio
+    async def test_falhas_sao_tentadas_de_novo(self, banco):
+        tentativas = []
+
+        async def fake_pregerar(user, lote):
+            tentativas.append(user["_id"])
+            # O usuário 2 falha só na primeira tentativa
+            return FALHA if tentativas.count(2) == 1 and user["_id"] == 2 else GERADO
+
+        buscar = MagicMock(side_effect=lambda ids: [u for u in banco.usuarios if u["_id"] in ids])
+        with patch.object(pregeracao_service, "pregerar_usuario", fake_pregerar), \
+             patch.object(pregeracao_service, "_buscar_usuarios", buscar):
+            primeira = await pregeracao_service.pregerar_planos(lote="L4", tamanho_pagina=2)
+            assert not primeira.get("concluido")
+            assert primeira[FALHAS_IDS] == [2]
+
+            segunda = await pregeracao_service.pregerar_planos(lote="L4", tamanho_pagina=2)
+
+        buscar.assert_called_once_with([2])
+        assert tentativas == [1, 2, 3, 4, 5, 2]
+        assert segunda[FALHAS_IDS] == []
+        assert segunda["concluido"] is True
+
+    @pytest.mark.asyncio
+    async def test_para_com_breaker_aberto(self, banco):
+        chamadas = []
+
+        async def fake_pregerar(user, lote):
+            chamadas.append(user["_id"])
+            return GERADO
+
+        with patch.object(pregeracao_service, "pregerar_usuario", fake_pregerar), \
+             patch.object(pregeracao_service, "_breaker_aberto", return_value=True):
+            checkpoint = await pregeracao_service.pregerar_planos(lote="L5", tamanho_pagina=2)
+
+        assert chamadas == []
+        assert not checkpoint.get("concluido")
+        assert checkpoint["ultimo_id"] is None
+
+
+class TestPregerarUsuario:
+    """Testes do processamento de um usuário"""
+
+    @pytest.mark.asyncio
+    async def test_salva_com_flag_de_pregerado(self):
+        user = _usuarios(1)[0]
+        with patch('services.pregeracao_service._ja_pregerado', return_value=False), \
+             patch('services.historico_service.obter_resumo_historico', return_value=""), \
+             patch('services.gemini_service.gerar_plano_de_treino_async', AsyncMock(return_value="Plano de Treino: A")), \
+             patch('services.treino_service.salvar_treino') as mock_salvar:
+            status = await pregeracao_service.pregerar_usuario(user, "L3")
+
+        assert status == GERADO
+        contexto = mock_salvar.call_args.kwargs["user_context"]
+        assert contexto["pregerado"] is True
+        assert contexto["lote_pregeracao"] == "L3"
+
+    @pytest.mark.asyncio
+    async def test_erro_do_gemini_nao_e_salvo(self):
+        erro = "Ocorreu um erro ao se comunicar com a API do Gemini: Circuito aberto"
+        with patch('services.pregeracao_service._ja_pregerado', return_value=False), \
+             patch('services.historico_service.obter_resumo_historico', return_value=""), \
+             patch('services.gemini_service.gerar_plano_de_treino_async', AsyncMock(return_value=erro)), \
+             patch('services.treino_service.salvar_treino') as mock_salvar:
+            status = await pregeracao_service.pregerar_usuario(_usuarios(1)[0], "L3")
+
+        assert status == FALHA
+        mock_salvar.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_usuario_ja_pregerado_e_pulado(self):
+        with patch('services.pregeracao_service._ja_pregerado', return_value=True), \
+             patch('services.gemini_service.gerar_plano_de_treino_async', AsyncMock()) as mock_gerar:
+            status = await pregeracao_service.pregerar_usuario(_usuarios(1)[0], "L3")
+
+        assert status == PULADO
+        mock_gerar.assert_not_called()
+
+
+class TestServirPregerado:
+    """Testes da entrega do plano pré-gerado no pico"""
+
+    USER = {"_id": "64b000000000000000000001", "equipamentos": "halteres, elástico", "nivel": "avançado"}
+
+    def test_lote_atual_e_o_gerado_na_semana_anterior(self):
+        agora = datetime(2025, 2, 5)
+        assert pregeracao_service.lote_atual(agora) == pregeracao_service.lote_da_semana(datetime(2025, 1, 29))
+        assert pregeracao_service.lote_atual(agora) == "2025-W06"
+
+    def test_pedido_semanal_exige_os_parametros_do_perfil(self):
+        padrao = pregeracao_service.montar_mensagem_semanal(self.USER)
+        outro = pregeracao_service.montar_mensagem_semanal({**self.USER, "objetivo": "hipertrofia"})
+
+        assert pregeracao_service.pedido_semanal(self.USER, padrao) is True
+        assert pregeracao_service.pedido_semanal(self.USER, outro) is False
+
+    @pytest.mark.asyncio
+    async def test_serve_o_plano_do_lote_uma_vez(self):
+        doc = {"_id": "t1", "usuario_id": self.USER["_id"], "plano_gerado": "Plano de Treino: A", "lote_pregeracao": "L"}
+        data = pregeracao_service.montar_mensagem_semanal(self.USER)
+        with patch('repositories.treino_repository.treino_repo.find_one_and_update', AsyncMock(return_value=doc)) as mock_fou, \
+             patch.object(pregeracao_service, "lote_atual", return_value="L"):
+            treino = await pregeracao_service.servir_pregerado(self.USER, data)
+
+        assert treino["plano_gerado"] == "Plano de Treino: A"
+        filtro, atualizacao = mock_fou.call_args.args
+        assert filtro["lote_pregeracao"] == "L"
+        assert filtro["servido_em"] == {"$exists": False}
+        assert "servido_em" in atualizacao["$set"]
+
+    @pytest.mark.asyncio
+    async def test_pedido_diferente_nao_consulta_o_banco(self):
+        data = pregeracao_service.montar_mensagem_semanal(self.USER)
+        data.mensagem_usuario = "oi"
+        with patch('repositories.treino_repository.treino_repo.find_one_and_update', AsyncMock()) as mock_fou:
+            assert await pregeracao_service.servir_pregerado(self.USER, data) is None
+        mock_fou.assert_not_called()
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes da pré-geração...")
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,316 @@
+"""
+Testes para os repositórios assíncronos (repositories/) e as versões
+assíncronas dos serviços que os usam
+
+O teste de preferência de leitura com replica set roda contra um replica
+set local com pelo menos um secundário (MONGO_TEST_RS_URI, padrão
+mongodb://localhost:27017/?replicaSet=rs0); sem ele, é pulado.
+"""
+import os
+import pytest
+import sys
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+from bson import ObjectId
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from repositories.treino_repository import ORDEM_PAGINA, treino_repo
+from repositories.usuario_repository import usuario_repo
+
+
+class FakeCursor:
+    """Cursor do Motor: registra sort/limit e devolve os documentos em to_list"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.ordem = None
+        self.limite = 0
+
+    def sort(self, ordem):
+        self.ordem = ordem
+        return self
+
+    def limit(self, limite):
+        self.limite = limite
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs[: self.limite or None]
+
+
+class FakeMotorCollection:
+    """Collection assíncrona em memória (filtros só por igualdade)"""
+
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+        self.filtros = []
+        self.cursores = []
+        self.preferencias = []
+
+    def with_options(self, read_preference=None):
+        self.preferencias.append(read_preference)
+        return self
+
+    def _casa(self, doc, filtro):
+        def casa_campo(k, v):
+            if isinstance(v, dict) and "$exists" in v:
+                return (k in doc) == v["$exists"]
+            return doc.get(k) == v
+
+        return all(casa_campo(k, v) for k, v in filtro.items() if not k.startswith("$"))
+
+    async def find_one(self, filtro, projecao=None):
+        self.filtros.append(filtro)
+        return next((dict(d) for d in self.docs if self._casa(d, filtro)), None)
+
+    def find(self, filtro, projecao=None):
+        self.filtros.append(filtro)
+        cursor = FakeCursor([dict(d) for d in self.docs if self._casa(d, filtro)])
+        self.cursores.append(cursor)
+        return cursor
+
+    async def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(dict(doc))
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def update_one(self, filtro, atualizacao, upsert=False):
+        for doc in self.docs:
+            if self._casa(doc, filtro):
+                doc.update(atualizacao.get("$set", {}))
+                for campo in atualizacao.get("$unset", {}):
+                    doc.pop(campo, None)
+                return SimpleNamespace(modified_count=1)
+        return SimpleNamespace(modified_count=0)
+
+
+@pytest.fixture
+def collections():
+    """Substitui o cliente Motor por collections em memória"""
+    banco = {"usuarios": FakeMotorCollection(), "treinos": FakeMotorCollection()}
+    with patch('database.mongodb_async.obter_collection', side_effect=banco.get):
+        yield banco
+
+
+class TestRepositorios:
+    """Testes das operações básicas dos repositórios"""
+
+    @pytest.mark.asyncio
+    async def test_sem_banco_leituras_vazias(self):
+        with patch('database.mongodb_async.obter_collection', return_value=None):
+            assert await usuario_repo.disponivel() is False
+            assert await usuario_repo.buscar_por_email("a@b.com") is None
+            assert await treino_repo.listar_por_usuario(ObjectId()) == []
+            assert await usuario_repo.atualizar_por_email("a@b.com", {"$set": {"x": 1}}) == 0
+
+    @pytest.mark.asyncio
+    async def test_insere_e_busca_usuario(self, collections):
+        _id = await usuario_repo.insert_one({"email": "a@b.com", "token": "t1"})
+
+        assert (await usuario_repo.buscar_por_id(str(_id)))["email"] == "a@b.com"
+        assert await usuario_repo.existe_com_token("a@b.com", "t1") is True
+        assert await usuario_repo.existe_com_token("a@b.com", "outro") is False
+
+    @pytest.mark.asyncio
+    async def test_listar_pagina_usa_ordem_e_limite(self, collections):
+        usuario_id = ObjectId()
+        collections["treinos"].docs = [{"_id": ObjectId(), "usuario_id": usuario_id} for _ in range(5)]
+
+        docs = await treino_repo.listar_pagina(usuario_id, 3, (datetime(2025, 1, 1), ObjectId()))
+
+        assert len(docs) == 3
+        cursor = collections["treinos"].cursores[-1]
+        assert cursor.ordem == ORDEM_PAGINA
+        assert "$or" in collections["treinos"].filtros[-1]
+
+
+class TestPreferenciaDeLeitura:
+    """Leituras de histórico/detalhe em secundários, exceto logo após uma escrita"""
+
+    def test_configuracao_sobrescreve_o_padrao(self):
+        from repositories import leitura
+
+        modos = leitura.carregar_modos("treinos.listar_pagina=primary, usuarios.buscar_por_email=nearest,x=lixo")
+
+        assert modos["treinos.listar_pagina"] == "primary"
+        assert modos["usuarios.buscar_por_email"] == "nearest"
+        assert modos["treinos.listar_por_usuario"] == "secondaryPreferred"
+        assert "x" not in modos
+
+    @pytest.mark.asyncio
+    async def test_historico_le_de_secundario_com_staleness(self, collections):
+        usuario_id = ObjectId()
+
+        await treino_repo.listar_pagina(usuario_id, 10)
+
+        preferencia = collections["treinos"].preferencias[-1]
+        assert preferencia.mongos_mode == "secondaryPreferred"
+        assert preferencia.max_staleness == 90
+
+    @pytest.mark.asyncio
+    async def test_usuarios_ficam_no_primario(self, collections):
+        await usuario_repo.buscar_por_email("a@b.com")
+
+        assert collections["usuarios"].preferencias == []
+
+    def test_staleness_abaixo_do_minimo(self):
+        from repositories import leitura
+
+        assert leitura.carregar_staleness(30) == leitura.STALENESS_MINIMO
+        assert leitura.carregar_staleness(120) == 120
+
+    def test_escrito_recentemente_pelo_campo_do_usuario(self):
+        from repositories import leitura
+        from services import treino_service
+
+        assert treino_service.ler_do_primario({leitura.CAMPO_ESCRITA: datetime.utcnow()}) is True
+        assert treino_service.ler_do_primario({leitura.CAMPO_ESCRITA: datetime(2020, 1, 1)}) is False
+        assert treino_service.ler_do_primario({}) is False
+
+    @pytest.mark.asyncio
+    async def test_primario_ignora_a_preferencia(self, collections):
+        await treino_repo.listar_pagina(ObjectId(), 10, primario=True)
+        await treino_repo.listar_por_usuario(ObjectId(), primario=True)
+
+        assert collections["treinos"].preferencias == []
+
+    @pytest.mark.asyncio
+    async def test_busca_por_id_ausente_no_secundario_refaz_no_primario(self, collections):
+        await treino_repo.buscar_por_id(ObjectId())
+
+        # Uma leitura com preferência (secundário) e a repetição sem ela (primário)
+        assert len(collections["treinos"].preferencias) == 1
+        assert len(collections["treinos"].filtros) == 2
+
+    @pytest.mark.asyncio
+    async def test_salvar_marca_escrita_no_usuario(self, collections):
+        from repositories import leitura
+        from services import treino_service
+
+        usuario_id = ObjectId()
+        collections["usuarios"].docs = [{"_id": usuario_id, "email": "a@b.com"}]
+
+        salvo = await treino_service.salvar_treino_async(str(usuario_id), "Plano de Treino: Full Body")
+
+        assert collections["usuarios"].docs[0][leitura.CAMPO_ESCRITA] == salvo["criado_em"]
+
+
+class TestServicosAssincronos:
+    """Versões assíncronas do auth_service e do treino_service"""
+
+    @pytest.mark.asyncio
+    async def test_cria_e_autentica_usuario(self, collections):
+        from models.user import UserCreate
+        from services import auth_service
+
+        dados = UserCreate.model_construct(email="novo@example.com", senha="SenhaSegura123!", nome="Novo")
+        criado = await auth_service.create_user_async(dados)
+
+        assert "hashed_password" not in criado
+        assert await auth_service.authenticate_async("novo@example.com", "SenhaSegura123!") is not None
+        assert await auth_service.authenticate_async("novo@example.com", "errada") is None
+
+        with pytest.raises(Exception) as erro:
+            await auth_service.create_user_async(dados)
+        assert erro.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_sem_banco_retorna_503(self):
+        from services import auth_service
+
+        with patch('database.mongodb_async.obter_collection', return_value=None):
+            with pytest.raises(Exception) as erro:
+                await auth_service.get_user_by_email_async("a@b.com")
+        assert erro.value.status_code == 503
+
+    @pytest.mark.asyncio
+    async def test_salvar_e_listar_treino(self, collections):
+        from services import treino_service
+
+        usuario_id = ObjectId()
+        collections["usuarios"].docs = [{"_id": usuario_id, "email": "a@b.com"}]
+
+        salvo = await treino_service.salvar_treino_async(str(usuario_id), "Plano de Treino: Full Body")
+        pagina = await treino_service.listar_treinos_paginado_async(str(usuario_id), limit=10)
+
+        assert salvo["usuario_id"] == str(usuario_id)
+        assert [t["_id"] for t in pagina["itens"]] == [salvo["_id"]]
+        assert pagina["next_cursor"] is None
+        assert "Full Body" in collections["usuarios"].docs[0]["resumo_historico"]
+
+
+# --- Replica set local ----------------------------------------------------------
+
+def _replica_set_local():
+    uri = os.getenv("MONGO_TEST_RS_URI", "mongodb://localhost:27017/?replicaSet=rs0")
+    try:
+        from pymongo import MongoClient
+
+        client = MongoClient(uri, serverSelectionTimeoutMS=500)
+        if len(client.admin.command("hello").get("hosts", [])) < 2:
+            return None
+    except Exception:
+        return None
+    client.close()
+    return uri
+
+
+_rs_uri = _replica_set_local()
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(_rs_uri is None, reason="replica set local indisponível (MONGO_TEST_RS_URI)")
+class TestReplicaSet:
+    """Roteamento real das leituras num replica set com secundários"""
+
+    @pytest.mark.asyncio
+    async def test_historico_no_secundario_e_leitura_propria_no_primario(self):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from pymongo import monitoring
+
+        class Enderecos(monitoring.CommandListener):
+            def __init__(self):
+                self.finds = []
+
+            def started(self, event):
+                if event.command_name == "find":
+                    self.finds.append(event.connection_id)
+
+            def succeeded(self, event):
+                pass
+
+            def failed(self, event):
+                pass
+
+        enderecos = Enderecos()
+        client = AsyncIOMotorClient(_rs_uri, event_listeners=[enderecos])
+        db = client["personalai_test_leitura"]
+        try:
+            usuario_id = ObjectId()
+            await db["treinos"].insert_one({"usuario_id": usuario_id, "criado_em": datetime.utcnow()})
+            primario = await client.primary
+            with patch('database.mongodb_async.obter_collection', side_effect=lambda nome: db[nome]):
+                await treino_repo.listar_pagina(usuario_id, 10)
+                treino_id = await treino_repo.insert_one({"usuario_id": usuario_id, "criado_em": datetime.utcnow()})
+                pagina = await treino_repo.listar_pagina(usuario_id, 10, primario=True)
+
+            assert enderecos.finds[0] != primario
+            assert enderecos.finds[-1] == primario
+            assert treino_id in [t["_id"] for t in pagina]
+        finally:
+            await client.drop_database("personalai_test_leitura")
+            client.close()
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes dos repositórios...")
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,136 @@
+"""
+Testes para a coalescência de chamadas idênticas (utils/singleflight.py)
+"""
+import asyncio
+import threading
+import time
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock, AsyncMock
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from utils.metrics import Counter
+from utils.singleflight import AsyncSingleFlight, SingleFlight
+from models.schemas import MensagemChat
+
+
+class TestSingleFlight:
+    """Testes da versão síncrona (threads)"""
+
+    def test_chamadas_concorrentes_executam_uma_vez(self):
+        """Threads com a mesma chave compartilham uma execução"""
+        coalescidas = Counter("teste_coalescidas")
+        flight = SingleFlight(coalescidas, modo="sync")
+        liberar = threading.Event()
+        execucoes = []
+
+        def trabalho():
+            execucoes.append(1)
+            liberar.wait(timeout=5)
+            return "resultado"
+
+        resultados = []
+        threads = [
+            threading.Thread(target=lambda: resultados.append(flight.do("k", trabalho)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        # espera todas as seguidoras estarem aguardando
+        prazo = time.monotonic() + 5
+        while coalescidas.value(modo="sync") < 4 and time.monotonic() < prazo:
+            time.sleep(0.001)
+        liberar.set()
+        for t in threads:
+            t.join(timeout=5)
+
+        assert resultados == ["resultado"] * 5
+        assert len(execucoes) == 1
+        assert flight.em_andamento() == 0
+
+    def test_erro_propaga_e_libera_chave(self):
+        """Erro do líder chega ao chamador e a chave é liberada"""
+        flight = SingleFlight()
+
+        def falha():
+            raise ValueError("falhou")
+
+        with pytest.raises(ValueError):
+            flight.do("k", falha)
+        assert flight.do("k", lambda: "ok") == "ok"
+
+
+class TestAsyncSingleFlight:
+    """Testes da versão assíncrona"""
+
+    @pytest.mark.asyncio
+    async def test_corrotinas_concorrentes_executam_uma_vez(self):
+        """Corrotinas com a mesma chave aguardam a mesma task"""
+        coalescidas = Counter("teste_coalescidas_async")
+        flight = AsyncSingleFlight(coalescidas, modo="async")
+        execucoes = []
+
+        async def trabalho():
+            execucoes.append(1)
+            await asyncio.sleep(0.01)
+            return "resultado"
+
+        resultados = await asyncio.gather(*[flight.do("k", trabalho) for _ in range(10)])
+
+        assert resultados == ["resultado"] * 10
+        assert len(execucoes) == 1
+        assert coalescidas.value(modo="async") == 9
+        assert flight.em_andamento() == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelar_um_chamador_nao_cancela_os_outros(self):
+        """Cancelar um chamador não interrompe o trabalho compartilhado"""
+        flight = AsyncSingleFlight()
+
+        async def trabalho():
+            await asyncio.sleep(0.02)
+            return "ok"
+
+        primeiro = asyncio.ensure_future(flight.do("k", trabalho))
+        segundo = asyncio.ensure_future(flight.do("k", trabalho))
+        await asyncio.sleep(0)
+        primeiro.cancel()
+
+        assert await segundo == "ok"
+
+    @pytest.mark.asyncio
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    async def test_gemini_async_coalesce_prompts_identicos(self, mock_settings, mock_genai):
+        """Pedidos idênticos simultâneos geram uma única chamada ao Gemini"""
+        from services.gemini_service import gerar_plano_de_treino_async
+
+        mock_settings.GEMINI_API_KEY = 'test_key'
+        mock_settings.GEMINI_MODEL = 'gemini-2.5-flash-lite'
+
+        async def resposta_lenta(prompt):
+            await asyncio.sleep(0.01)
+            return MagicMock(text="Plano compartilhado")
+
+        mock_model = MagicMock()
+        mock_model.generate_content_async = AsyncMock(side_effect=resposta_lenta)
+        mock_genai.GenerativeModel.return_value = mock_model
+
+        data = MensagemChat(mensagem_usuario="Quero um treino")
+        resultados = await asyncio.gather(*[gerar_plano_de_treino_async(data) for _ in range(5)])
+
+        assert resultados == ["Plano compartilhado"] * 5
+        assert mock_model.generate_content_async.await_count == 1
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes de single-flight...")
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,141 @@
+"""
+Testes para a telemetria das chamadas ao Gemini (métricas, /metrics e uso_service.py)
+"""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+
+# Configuração de path para execução individual
+if __name__ == "__main__":
+    project_root = Path(__file__).parent.parent
+    src_path = project_root / "src"
+    sys.path.insert(0, str(project_root))
+    sys.path.insert(0, str(src_path))
+
+from main import app
+from services import uso_service
+from services.gemini_fake import FakeGemini
+from utils.metrics import MetricsRegistry
+from models.schemas import MensagemChat
+
+
+class TestPrometheus:
+    """Testes da exportação no formato do Prometheus"""
+
+    def test_render_contador_e_histograma(self):
+        registry = MetricsRegistry()
+        registry.counter("chamadas_total", "Chamadas").inc(2, modo="plano")
+        registry.histogram("latencia_seconds", buckets=(0.1, 1)).observe(0.5, modo="chat")
+
+        texto = registry.render_prometheus()
+
+        assert "# TYPE chamadas_total counter" in texto
+        assert 'chamadas_total{modo="plano"} 2' in texto
+        assert 'latencia_seconds_bucket{modo="chat",le="0.1"} 0' in texto
+        assert 'latencia_seconds_bucket{modo="chat",le="1"} 1' in texto
+        assert 'latencia_seconds_bucket{modo="chat",le="+Inf"} 1' in texto
+        assert 'latencia_seconds_count{modo="chat"} 1' in texto
+
+    def test_endpoint_metrics(self):
+        response = TestClient(app).get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "gemini_limiter_limit" in response.text
+
+
+class TestTelemetriaGemini:
+    """Métricas registradas a cada chamada ao Gemini"""
+
+    @patch('services.gemini_service.uso_service.registrar')
+    @patch('services.gemini_service.settings')
+    def test_tokens_e_latencia_por_modelo_e_modo(self, mock_settings, mock_registrar):
+        from services import gemini_service
+
+        mock_settings.GEMINI_API_KEY = 'fake'
+        mock_settings.GEMINI_MODEL = 'modelo-telemetria'
+        rotulos = {"modelo": "modelo-telemetria", "modo": "plano"}
+        tokens_antes = gemini_service.gemini_tokens.value(tipo="resposta", **rotulos)
+
+        with patch.object(gemini_service, "genai", FakeGemini()):
+            gemini_service.gerar_plano_de_treino(
+                MensagemChat(mensagem_usuario="Monte um plano de treino de 4 dias para hipertrofia"),
+                user={"_id": "u1"},
+            )
+
+        assert gemini_service.gemini_tokens.value(tipo="resposta", **rotulos) > tokens_antes
+        assert gemini_service.gemini_latencia.count(status="ok", **rotulos) >= 1
+        assert gemini_service.gemini_espera_fila.count(**rotulos) >= 1
+        assert gemini_service.gemini_latencia_total.count(**rotulos) >= 1
+        usuario_id, modo, prompt, resposta, cache = mock_registrar.call_args.args
+        assert (usuario_id, modo) == ("u1", "plano")
+        assert prompt > 0 and resposta > 0
+
+    @pytest.mark.asyncio
+    @patch('services.gemini_service.uso_service.registrar')
+    @patch('services.gemini_service.genai')
+    @patch('services.gemini_service.settings')
+    async def test_uso_creditado_a_cada_chamador_coalescido(self, mock_settings, mock_genai, mock_registrar):
+        from services.gemini_service import gerar_plano_de_treino_async
+
+        mock_settings.GEMINI_API_KEY = 'fake'
+        mock_settings.GEMINI_MODEL = 'modelo-coalescido'
+        uso = SimpleNamespace(prompt_token_count=100, candidates_token_count=50, cached_content_token_count=0)
+
+        async def resposta_lenta(prompt):
+            await asyncio.sleep(0.01)
+            return SimpleNamespace(text="Plano compartilhado", usage_metadata=uso)
+
+        mock_genai.GenerativeModel.return_value.generate_content_async = AsyncMock(side_effect=resposta_lenta)
+
+        data = MensagemChat(mensagem_usuario="Monte um plano de treino de 4 dias para hipertrofia")
+        await asyncio.gather(*[gerar_plano_de_treino_async(data, user={"_id": u}) for u in ("u1", "u2")])
+
+        assert mock_genai.GenerativeModel.return_value.generate_content_async.await_count == 1
+        creditados = sorted(c.args for c in mock_registrar.call_args_list)
+        assert creditados == [("u1", "plano", 100, 50, 0), ("u2", "plano", 100, 50, 0)]
+
+
+class TestUsoService:
+    """Testes da contabilidade de tokens por usuário"""
+
+    @patch('services.uso_service.mongodb')
+    def test_agrega_em_memoria_e_grava_em_lote(self, mock_mongodb):
+        with patch.object(uso_service.settings, "USO_TOKENS_FLUSH_SECONDS", 3600):
+            uso_service.descarregar()  # esvazia o que outros testes acumularam
+            uso_service.registrar("u1", "plano", 1000, 500, 200)
+            uso_service.registrar("u1", "plano", 800, 400)
+            uso_service.registrar("u2", "chat", 100, 50)
+            uso_service.registrar(None, "chat", 100, 50)  # sem usuário: ignorado
+
+            assert not mock_mongodb.uso_tokens_collection.bulk_write.called
+            assert uso_service.descarregar() == 2
+
+        operacoes = mock_mongodb.uso_tokens_collection.bulk_write.call_args.args[0]
+        u1 = next(op for op in operacoes if op._filter["usuario_id"] == "u1")
+        assert u1._doc["$inc"]["tokens_prompt"] == 1800
+        assert u1._doc["$inc"]["por_modo.plano.chamadas"] == 2
+        assert "expira_em" in u1._doc["$set"]
+
+    @patch('services.uso_service.mongodb')
+    def test_obter_uso_soma_os_dias(self, mock_mongodb):
+        mock_mongodb.uso_tokens_collection.find.return_value = [
+            {"chamadas": 2, "tokens_prompt": 100, "tokens_resposta": 50},
+            {"chamadas": 1, "tokens_prompt": 30, "tokens_resposta": 20, "tokens_cache": 10},
+        ]
+
+        uso = uso_service.obter_uso("u1", dias=7)
+
+        assert uso["chamadas"] == 3
+        assert uso["tokens_prompt"] == 130
+        assert uso["tokens_cache"] == 10
+
+
+if __name__ == "__main__":
+    """Permite execução individual do arquivo de teste"""
+    print("🧪 Executando testes de telemetria...")
+    pytest.main([__file__, "-v"])
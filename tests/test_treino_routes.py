@@ -3,8 +3,9 @@ Testes completos para as rotas de treino (treino_routes.py)
 """
 import pytest
 import sys
+from datetime import datetime
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock
 from fastapi.testclient import TestClient
 from bson import ObjectId
 
@@ -16,7 +17,6 @@ if __name__ == "__main__":
     sys.path.insert(0, str(src_path))
 
 from main import app
-from schemas import MensagemChat
 
 client = TestClient(app)
 
@@ -158,6 +158,195 @@ class TestTreinoRoutes:
             assert "detail" in response.json()
 
 
+class TestTreinoStreamRoute:
+    """Testes para o endpoint SSE /treinos/stream"""
+
+    def test_criar_treino_stream_envia_chunks_e_id(self):
+        """Os trechos chegam como eventos `chunk` e o evento `fim` traz o id salvo"""
+        from services import security
+
+        usuario = {"_id": str(ObjectId()), "email": "stream@example.com"}
+
+        async def fake_stream(data, user=None, historico=None):
+            for texto in ["Plano de Treino: ", "Full Body"]:
+                yield texto
+
+        app.dependency_overrides[security.get_current_user_email] = lambda: usuario["email"]
+        try:
+            with patch('routes.treino_routes.auth_service.get_user_by_email_async', AsyncMock(return_value=usuario)), \
+                 patch('services.historico_service.obter_resumo_historico_async', AsyncMock(return_value="")), \
+                 patch('routes.treino_routes.gemini_service.gerar_plano_de_treino_stream', fake_stream), \
+                 patch('routes.treino_routes.salvar_treino_async', new_callable=AsyncMock) as mock_salvar:
+                mock_salvar.return_value = {"_id": "treino123", "plano_gerado": "Plano de Treino: Full Body"}
+
+                response = client.post("/treinos/stream", json={"mensagem_usuario": "Quero um treino"})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = response.text
+        assert body.count("event: chunk") == 2
+        assert "event: fim" in body
+        assert '"treino_id": "treino123"' in body
+        assert mock_salvar.call_args.kwargs["plano_gerado"] == "Plano de Treino: Full Body"
+
+    def test_criar_treino_stream_falha_envia_erro_sem_salvar(self):
+        """Uma falha no meio do stream vira o evento `erro` e o plano parcial não é salvo"""
+        from services import gemini_service, security
+
+        usuario = {"_id": str(ObjectId()), "email": "stream@example.com"}
+
+        async def fake_stream(data, user=None, historico=None):
+            yield "Plano de Treino: "
+            raise gemini_service.ErroNoStream("Ocorreu um erro ao se comunicar com a API do Gemini: 503")
+
+        app.dependency_overrides[security.get_current_user_email] = lambda: usuario["email"]
+        try:
+            with patch('routes.treino_routes.auth_service.get_user_by_email_async', AsyncMock(return_value=usuario)), \
+                 patch('services.historico_service.obter_resumo_historico_async', AsyncMock(return_value="")), \
+                 patch('routes.treino_routes.gemini_service.gerar_plano_de_treino_stream', fake_stream), \
+                 patch('routes.treino_routes.salvar_treino_async', new_callable=AsyncMock) as mock_salvar:
+                response = client.post("/treinos/stream", json={"mensagem_usuario": "Quero um treino"})
+        finally:
+            app.dependency_overrides.clear()
+
+        body = response.text
+        assert body.count("event: chunk") == 1
+        assert "event: erro" in body
+        assert "event: fim" not in body
+        mock_salvar.assert_not_called()
+
+
+class TestTreinoPregerado:
+    """O pedido do plano semanal é servido do lote pré-gerado, sem chamar o Gemini"""
+
+    def test_criar_treino_serve_plano_pregerado(self):
+        from services import security
+
+        usuario = {"_id": str(ObjectId()), "email": "semana@example.com"}
+        pregerado = {"_id": "treino_lote", "plano_gerado": "Plano de Treino: Semana"}
+
+        app.dependency_overrides[security.get_current_user_email] = lambda: usuario["email"]
+        try:
+            with patch('routes.treino_routes.auth_service.get_user_by_email_async', AsyncMock(return_value=usuario)), \
+                 patch('services.historico_service.obter_resumo_historico_async', AsyncMock(return_value="")), \
+                 patch('routes.treino_routes.pregeracao_service.servir_pregerado', AsyncMock(return_value=pregerado)), \
+                 patch('routes.treino_routes.gemini_service.gerar_plano_de_treino_async', new_callable=AsyncMock) as mock_gerar, \
+                 patch('routes.treino_routes.salvar_treino_async', new_callable=AsyncMock) as mock_salvar:
+                response = client.post("/treinos/", json={"mensagem_usuario": "Monte meu plano da semana"})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert response.json()["treino"]["_id"] == "treino_lote"
+        mock_gerar.assert_not_called()
+        mock_salvar.assert_not_called()
+
+
+class TestTreinoJobsRoutes:
+    """Testes para a fila de geração (/treinos/jobs)"""
+
+    def test_criar_job_retorna_202(self):
+        from services import security
+
+        usuario = {"_id": str(ObjectId()), "email": "job@example.com"}
+        app.dependency_overrides[security.get_current_user_email] = lambda: usuario["email"]
+        try:
+            with patch('routes.treino_routes.auth_service.get_user_by_email_async', AsyncMock(return_value=usuario)), \
+                 patch('routes.treino_routes.job_service.criar_job') as mock_criar:
+                mock_criar.return_value = {"_id": "job123", "status": "pendente"}
+
+                response = client.post("/treinos/jobs", json={"mensagem_usuario": "Quero um treino"})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 202
+        assert response.json() == {"job_id": "job123", "status": "pendente"}
+        assert mock_criar.call_args.args[:2] == (usuario["_id"], usuario["email"])
+
+    def test_job_de_outro_usuario_retorna_404(self):
+        from services import security
+
+        app.dependency_overrides[security.get_current_user_email] = lambda: "intruso@example.com"
+        try:
+            with patch('routes.treino_routes.job_service.buscar_job') as mock_buscar:
+                mock_buscar.return_value = {"_id": "job123", "email": "dono@example.com", "status": "concluido"}
+
+                response = client.get("/treinos/jobs/job123")
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 404
+
+
+
+class TestTreinosPaginados:
+    """Testes da paginação por cursor do GET /treinos/"""
+
+    def _get(self, url, **patches):
+        from services import security
+
+        usuario = {"_id": str(ObjectId()), "email": "pag@example.com", **patches.get("usuario", {})}
+        app.dependency_overrides[security.get_current_user_email] = lambda: usuario["email"]
+        try:
+            with patch('routes.treino_routes.auth_service.get_user_by_email_async', AsyncMock(return_value=usuario)), \
+                 patch('routes.treino_routes.treino_service.listar_treinos_paginado_async', new_callable=AsyncMock) as mock_paginado, \
+                 patch('routes.treino_routes.treino_service.listar_treinos_por_usuario_async', AsyncMock(return_value=[])) as mock_lista, \
+                 patch('routes.treino_routes.settings.TREINOS_LISTA_COMPLETA', patches.get("lista_completa", False)):
+                mock_paginado.return_value = {"itens": [], "next_cursor": None}
+                if "erro" in patches:
+                    mock_paginado.side_effect = patches["erro"]
+                response = client.get(url)
+        finally:
+            app.dependency_overrides.clear()
+        return response, mock_paginado, mock_lista
+
+    def test_pagina_com_cursor(self):
+        response, mock_paginado, _ = self._get("/treinos/?limit=5&cursor=abc")
+
+        assert response.status_code == 200
+        assert response.json() == {"itens": [], "next_cursor": None}
+        assert mock_paginado.call_args.kwargs == {"limit": 5, "cursor": "abc", "campos": None, "primario": False}
+
+    def test_logo_apos_salvar_le_do_primario(self):
+        response, mock_paginado, _ = self._get(
+            "/treinos/?limit=5", usuario={"treinos_escritos_em": datetime.utcnow()}
+        )
+
+        assert response.status_code == 200
+        assert mock_paginado.call_args.kwargs["primario"] is True
+
+    def test_cursor_invalido_retorna_400(self):
+        response, _, _ = self._get("/treinos/?cursor=lixo", erro=ValueError("Cursor inválido: lixo"))
+
+        assert response.status_code == 400
+
+    def test_limit_acima_do_maximo_retorna_422(self):
+        response, _, _ = self._get("/treinos/?limit=100000")
+
+        assert response.status_code == 422
+
+    def test_view_summary(self):
+        response, mock_paginado, _ = self._get("/treinos/?view=summary")
+
+        assert response.status_code == 200
+        assert mock_paginado.call_args.kwargs["campos"] == ("criado_em", "objetivo", "titulo")
+
+    def test_fields_invalido_retorna_400(self):
+        response, mock_paginado, _ = self._get("/treinos/?fields=titulo,hashed_password")
+
+        assert response.status_code == 400
+        mock_paginado.assert_not_called()
+
+    def test_compatibilidade_lista_completa(self):
+        response, mock_paginado, mock_lista = self._get("/treinos/", lista_completa=True)
+
+        assert response.json() == []
+        mock_lista.assert_called_once()
+        mock_paginado.assert_not_called()
+
+
 if __name__ == "__main__":
     """Permite execução individual do arquivo de teste"""
     print("🧪 Executando testes de treino_routes...")
@@ -15,7 +15,7 @@ if __name__ == "__main__":
     sys.path.insert(0, str(project_root))
     sys.path.insert(0, str(src_path))
 
-from schemas import MensagemChat
+from models.schemas import MensagemChat
 
 
 class TestTreinoService:
@@ -38,7 +38,7 @@ class TestTreinoService:
         return str(ObjectId())
 
     @patch('services.treino_service.gerar_plano_de_treino')
-    @patch('services.treino_service.treinos_collection')
+    @patch('database.mongodb.treinos_collection')
     def test_salvar_treino_com_collection(self, mock_collection, mock_gerar_plano, mensagem_chat, usuario_id):
         """Testa salvamento de treino com collection disponível"""
         from services.treino_service import salvar_treino
@@ -61,7 +61,7 @@ class TestTreinoService:
         mock_gerar_plano.assert_called_once_with(mensagem_chat)
 
     @patch('services.treino_service.gerar_plano_de_treino')
-    @patch('services.treino_service.treinos_collection', None)
+    @patch('database.mongodb.treinos_collection', None)
     def test_salvar_treino_sem_collection(self, mock_gerar_plano, mensagem_chat, usuario_id):
         """Testa salvamento de treino sem collection (modo mock)"""
         from services.treino_service import salvar_treino
@@ -77,7 +77,7 @@ class TestTreinoService:
         assert resultado["plano_gerado"] == mock_plano
 
     @patch('services.treino_service.gerar_plano_de_treino')
-    @patch('services.treino_service.treinos_collection')
+    @patch('database.mongodb.treinos_collection')
     def test_salvar_treino_erro_insert(self, mock_collection, mock_gerar_plano, mensagem_chat, usuario_id):
         """Testa salvamento com erro no insert"""
         from services.treino_service import salvar_treino
@@ -92,7 +92,7 @@ class TestTreinoService:
         assert resultado is not None
         assert resultado["usuario_id"] == usuario_id
 
-    @patch('services.treino_service.treinos_collection')
+    @patch('database.mongodb.treinos_collection')
     def test_listar_treinos_por_usuario_vazio(self, mock_collection, usuario_id):
         """Testa listagem quando não há treinos"""
         from services.treino_service import listar_treinos_por_usuario
@@ -104,7 +104,7 @@ class TestTreinoService:
         assert resultado == []
         mock_collection.find.assert_called_once()
 
-    @patch('services.treino_service.treinos_collection')
+    @patch('database.mongodb.treinos_collection')
     def test_listar_treinos_por_usuario_com_treinos(self, mock_collection, usuario_id):
         """Testa listagem com múltiplos treinos"""
         from services.treino_service import listar_treinos_por_usuario
@@ -142,7 +142,7 @@ class TestTreinoService:
         assert all("_id" in t for t in resultado)
         assert all("usuario_id" in t for t in resultado)
 
-    @patch('services.treino_service.treinos_collection', None)
+    @patch('database.mongodb.treinos_collection', None)
     def test_listar_treinos_sem_collection(self, usuario_id):
         """Testa listagem sem collection (modo mock)"""
         from services.treino_service import listar_treinos_por_usuario
@@ -151,7 +151,7 @@ class TestTreinoService:
 
         assert resultado == []
 
-    @patch('services.treino_service.treinos_collection')
+    @patch('database.mongodb.treinos_collection')
     def test_buscar_treino_por_id_encontrado(self, mock_collection, usuario_id):
         """Testa busca de treino por ID quando encontrado"""
         from services.treino_service import buscar_treino_por_id
@@ -176,7 +176,7 @@ class TestTreinoService:
         assert resultado["usuario_id"] == usuario_id
         mock_collection.find_one.assert_called_once()
 
-    @patch('services.treino_service.treinos_collection')
+    @patch('database.mongodb.treinos_collection')
     def test_buscar_treino_por_id_nao_encontrado(self, mock_collection):
         """Testa busca de treino por ID quando não encontrado"""
         from services.treino_service import buscar_treino_por_id
@@ -189,7 +189,7 @@ class TestTreinoService:
         assert resultado is None
         mock_collection.find_one.assert_called_once()
 
-    @patch('services.treino_service.treinos_collection', None)
+    @patch('database.mongodb.treinos_collection', None)
     def test_buscar_treino_sem_collection(self):
         """Testa busca de treino sem collection (modo mock)"""
         from services.treino_service import buscar_treino_por_id
@@ -199,7 +199,7 @@ class TestTreinoService:
 
         assert resultado is None
 
-    @patch('services.treino_service.treinos_collection')
+    @patch('database.mongodb.treinos_collection')
     def test_listar_treinos_formata_ids(self, mock_collection, usuario_id):
         """Testa se IDs são formatados como strings corretamente"""
         from services.treino_service import listar_treinos_por_usuario
@@ -228,7 +228,7 @@ class TestTreinoService:
         assert resultado[0]["_id"] == str(treino_id)
 
     @patch('services.treino_service.gerar_plano_de_treino')
-    @patch('services.treino_service.treinos_collection')
+    @patch('database.mongodb.treinos_collection')
     def test_salvar_treino_converte_usuario_id_para_objectid(self, mock_collection, mock_gerar_plano, mensagem_chat, usuario_id):
         """Testa se usuario_id é convertido para ObjectId corretamente"""
         from services.treino_service import salvar_treino
@@ -248,6 +248,196 @@ class TestTreinoService:
         # Se treinos_collection é not None, usuario_id deve ser ObjectId
         assert isinstance(called_doc["usuario_id"], ObjectId)
 
+    @patch('services.treino_service.historico_service.registrar_treino_no_resumo')
+    @patch('database.mongodb.treinos_collection')
+    def test_salvar_treino_atualiza_resumo_historico(self, mock_collection, mock_registrar, usuario_id):
+        """Testa se o resumo incremental do usuário é atualizado após salvar"""
+        from services.treino_service import salvar_treino
+
+        mock_collection.insert_one.return_value = MagicMock(inserted_id=ObjectId())
+
+        salvar_treino(usuario_id, "Plano de Treino: Teste", {})
+
+        mock_registrar.assert_called_once()
+        args = mock_registrar.call_args.args
+        assert str(args[0]) == usuario_id
+        assert args[1] == "Plano de Treino: Teste"
+
+
+
+class TestPaginacaoTreinos:
+    """Testes da paginação por keyset (criado_em, _id)"""
+
+    def test_cursor_ida_e_volta(self):
+        from services import treino_service
+
+        doc = {"_id": ObjectId(), "criado_em": datetime(2025, 2, 3, 8, 30)}
+        cursor = treino_service.codificar_cursor(doc)
+
+        assert treino_service.decodificar_cursor(cursor) == (doc["criado_em"], doc["_id"])
+        with pytest.raises(ValueError):
+            treino_service.decodificar_cursor("nao-e-um-cursor")
+
+    @patch('database.mongodb.treinos_collection')
+    def test_pagina_e_proximo_cursor(self, mock_collection):
+        from services import treino_service
+
+        usuario_id = str(ObjectId())
+        docs = [{"_id": ObjectId(), "criado_em": datetime(2025, 2, d), "plano_gerado": f"Plano {d}"} for d in (5, 4, 3)]
+        mock_collection.find.return_value.sort.return_value.limit.return_value = docs
+
+        pagina = treino_service.listar_treinos_paginado(usuario_id, limit=2)
+
+        assert [t["plano_gerado"] for t in pagina["itens"]] == ["Plano 5", "Plano 4"]
+        mock_collection.find.return_value.sort.assert_called_with([("criado_em", -1), ("_id", -1)])
+        mock_collection.find.return_value.sort.return_value.limit.assert_called_with(3)
+
+        # A próxima página começa depois do último item retornado
+        treino_service.listar_treinos_paginado(usuario_id, limit=2, cursor=pagina["next_cursor"])
+        filtro = mock_collection.find.call_args.args[0]
+        assert filtro["$or"] == [
+            {"criado_em": {"$lt": docs[1]["criado_em"]}},
+            {"criado_em": docs[1]["criado_em"], "_id": {"$lt": docs[1]["_id"]}},
+        ]
+
+    @patch('database.mongodb.treinos_collection')
+    def test_ultima_pagina_sem_cursor(self, mock_collection):
+        from services import treino_service
+
+        mock_collection.find.return_value.sort.return_value.limit.return_value = [
+            {"_id": ObjectId(), "criado_em": datetime(2025, 2, 1)}
+        ]
+
+        pagina = treino_service.listar_treinos_paginado(str(ObjectId()), limit=2)
+
+        assert len(pagina["itens"]) == 1
+        assert pagina["next_cursor"] is None
+
+
+class TestResumoTreinos:
+    """Testes do título extraído e da projeção da listagem resumida"""
+
+    def test_extrair_titulo_do_cabecalho(self):
+        from services.treino_service import extrair_titulo
+
+        assert extrair_titulo("**Plano de Treino: Full Body Iniciante**\n\nDia 1...") == "Full Body Iniciante"
+        assert extrair_titulo("## Plano de Treino: Hipertrofia A/B\n- Supino") == "Hipertrofia A/B"
+        assert extrair_titulo("Sem cabeçalho") is None
+
+    @patch('services.treino_service.historico_service.registrar_treino_no_resumo')
+    @patch('database.mongodb.treinos_collection')
+    def test_salvar_persiste_o_titulo(self, mock_collection, mock_registrar):
+        from services.treino_service import salvar_treino
+
+        mock_collection.insert_one.return_value = MagicMock(inserted_id=ObjectId())
+
+        salvar_treino(str(ObjectId()), "Plano de Treino: Costas e Bíceps\n...", {})
+
+        assert mock_collection.insert_one.call_args[0][0]["titulo"] == "Costas e Bíceps"
+
+    @patch('database.mongodb.treinos_collection')
+    def test_resumo_usa_projecao_sem_o_plano(self, mock_collection):
+        from services import treino_service
+
+        doc = {"_id": ObjectId(), "criado_em": datetime(2025, 2, 3), "objetivo": "hipertrofia", "titulo": "Treino A"}
+        mock_collection.find.return_value.sort.return_value = [doc]
+
+        campos = treino_service.resolver_campos(view="summary")
+        resultado = treino_service.listar_treinos_por_usuario(str(ObjectId()), campos=campos)
+
+        projecao = mock_collection.find.call_args.args[1]
+        assert "plano_gerado" not in projecao
+        assert set(projecao) == {"criado_em", "objetivo", "titulo"}
+        assert resultado == [{"_id": str(doc["_id"]), "criado_em": doc["criado_em"], "objetivo": "hipertrofia", "titulo": "Treino A"}]
+
+    def test_fields_com_plano_inclui_a_forma_comprimida(self):
+        from services import treino_service
+
+        projecao = treino_service._projecao(treino_service.resolver_campos(fields="plano_gerado"))
+
+        assert projecao["plano_comprimido"] == 1
+        with pytest.raises(ValueError):
+            treino_service.resolver_campos(fields="hashed_password")
+
+
+class TestCompressaoPlano:
+    """Testes do codec de armazenamento do plano_gerado"""
+
+    PLANO = "Plano de Treino: Hipertrofia\n" + "- Supino reto: 4x10\n" * 200
+
+    def test_plano_pequeno_fica_como_texto(self):
+        from utils import compressao
+
+        assert compressao.campos_do_plano("Plano curto", "zlib", 1024) == {"plano_gerado": "Plano curto"}
+
+    def test_ida_e_volta_zlib(self):
+        from utils import compressao
+
+        campos = compressao.campos_do_plano(self.PLANO, "zlib", 1024)
+
+        assert "plano_gerado" not in campos
+        assert campos["plano_codec"] == "zlib"
+        assert len(campos["plano_comprimido"]) < len(self.PLANO)
+        assert compressao.ler_plano(campos) == self.PLANO
+
+    @patch('services.treino_service.historico_service.registrar_treino_no_resumo')
+    @patch('database.mongodb.treinos_collection')
+    def test_salvar_comprime_e_listar_descomprime(self, mock_collection, mock_registrar):
+        from services import treino_service
+
+        usuario_id = str(ObjectId())
+
+        mock_collection.insert_one.return_value = MagicMock(inserted_id=ObjectId())
+        with patch.object(treino_service.settings, "PLANO_COMPRESSAO", "zlib"), \
+             patch.object(treino_service.settings, "PLANO_COMPRESSAO_MIN_BYTES", 1024):
+            retorno = treino_service.salvar_treino(usuario_id, self.PLANO, {})
+
+        gravado = mock_collection.insert_one.call_args[0][0]
+        assert "plano_gerado" not in gravado
+        assert gravado["plano_codec"] == "zlib"
+        # O retorno para a rota continua com o texto
+        assert retorno["plano_gerado"] == self.PLANO
+
+        gravado["_id"] = ObjectId()
+        mock_collection.find.return_value.sort.return_value = [gravado]
+        mock_collection.find_one.return_value = gravado
+        assert treino_service.listar_treinos_por_usuario(usuario_id)[0]["plano_gerado"] == self.PLANO
+        assert treino_service.buscar_treino_por_id(str(gravado["_id"]))["plano_gerado"] == self.PLANO
+
+    @patch('database.mongodb.treinos_collection')
+    def test_migracao_em_lotes(self, mock_collection):
+        from services import treino_service
+
+        docs = [{"_id": ObjectId(), "plano_gerado": self.PLANO} for _ in range(3)]
+        mock_collection.find.return_value.sort.return_value.limit.side_effect = [docs[:2], docs[2:], []]
+
+        totais = treino_service.migrar_compressao(codec="zlib", min_bytes=1024, tamanho_lote=2)
+
+        assert totais == {"lidos": 3, "convertidos": 3}
+        assert mock_collection.bulk_write.call_count == 2
+        operacao = mock_collection.bulk_write.call_args_list[0].args[0][0]
+        assert operacao._doc["$unset"] == {"plano_gerado": ""}
+        # Segundo lote começa depois do último _id do primeiro
+        assert mock_collection.find.call_args_list[1].args[0]["_id"] == {"$gt": docs[1]["_id"]}
+
+    @patch('database.mongodb.treinos_collection')
+    def test_migracao_recodifica_outro_codec(self, mock_collection):
+        from services import treino_service
+        from utils import compressao
+
+        doc = {"_id": ObjectId(), **compressao.campos_do_plano(self.PLANO, "zlib", 0)}
+        mock_collection.find.return_value.sort.return_value.limit.side_effect = [[doc], []]
+
+        with patch.object(compressao, "resolver_codec", side_effect=lambda c: c if c in compressao.CODECS else None), \
+             patch.object(compressao, "comprimir", side_effect=lambda texto, codec: codec.encode() * 4):
+            totais = treino_service.migrar_compressao(codec="zstd", min_bytes=1024)
+
+        filtro = mock_collection.find.call_args_list[0].args[0]
+        assert {"plano_codec": {"$exists": True, "$ne": "zstd"}} in filtro["$or"]
+        assert totais["convertidos"] == 1
+        operacao = mock_collection.bulk_write.call_args.args[0][0]
+        assert operacao._doc["$set"]["plano_codec"] == "zstd"
+
 
 if __name__ == "__main__":
     """Permite execução individual do arquivo de teste"""
@@ -33,7 +33,7 @@ def test_register_user_no_password_exposed(monkeypatch):
         "hashed_password": "$pbkdf2-sha256$fakehash",
     }
 
-    def fake_create_user(user_data):
+    async def fake_create_user(user_data):
         # O rota espera um dict-like com campos — retornamos o fake_created_user
         return fake_created_user
 
@@ -41,7 +41,7 @@ def test_register_user_no_password_exposed(monkeypatch):
         return "fake.access.token"
 
     # Substitui as funções reais por versões controladas
-    monkeypatch.setattr("services.auth_service.create_user", fake_create_user)
+    monkeypatch.setattr("services.auth_service.create_user_async", fake_create_user)
     monkeypatch.setattr("services.security.create_access_token", fake_create_access_token)
 
     resp = client.post("/auth/register", json=payload)